@@ -5,7 +5,6 @@ import time
 from typing import Optional, List, Union
 
 from retry import retry
-from selenium import webdriver
 from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
 from selenium.common.exceptions import (
     NoSuchWindowException,
@@ -94,8 +93,7 @@ class Activity:
         wait_for_page_load(webdriver_instance)
 
     def open(self, driver, state, target="", targets=None, value=None):
-        if not isinstance(driver, webdriver.Firefox):
-            driver.limiter.delay_access(register=True, count=2)
+        driver.limiter.delay_access(register=True, count=2, url=self.url)
 
         if not driver.authenticated and self.options is not None and self.options != "":
             try:
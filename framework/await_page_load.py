@@ -1,8 +1,15 @@
+import os
 import re
+import threading
+from collections import deque
+from contextlib import contextmanager
 from time import time, sleep
+from typing import Optional
 
 from selenium import webdriver
-from selenium.common.exceptions import TimeoutException, JavascriptException, UnexpectedAlertPresentException
+from selenium.common.exceptions import (
+    TimeoutException, JavascriptException, UnexpectedAlertPresentException, WebDriverException
+)
 from selenium.webdriver.support.expected_conditions import presence_of_element_located
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.common.by import By
@@ -38,9 +45,122 @@ JS_GET_PERFORMANCE_URL_CODES = """
     );
 """
 
+# * Observes the page until network and DOM have been quiet for a window, resolves with what it has seen.
+# * The observers are installed once per document and keep counting between calls.
+JS_AWAIT_QUIET_PAGE = """
+    const [quietWindow, domSettleLimit, longRequest, timeout, done] = arguments;
+    const now = () => performance.now();
+    const started = now();
+
+    let state = window.__pageLoadObserver;
+    if (!state) {
+        state = window.__pageLoadObserver = {
+            pending: new Map(), nextRequest: 0, lastNetwork: now(), lastMutation: now(), resources: 0, mutations: 0
+        };
+        const requestStarted = () => {
+            const id = state.nextRequest++;
+            state.pending.set(id, now());
+            state.lastNetwork = now();
+            return () => { state.pending.delete(id); state.lastNetwork = now(); };
+        };
+
+        new PerformanceObserver((list) => {
+            state.resources += list.getEntries().length;
+            state.lastNetwork = now();
+        }).observe({entryTypes: ["resource"]});
+        new MutationObserver((records) => {
+            state.mutations += records.length;
+            state.lastMutation = now();
+        }).observe(document, {childList: true, subtree: true});
+
+        if (window.fetch) {
+            const originalFetch = window.fetch;
+            window.fetch = function () {
+                const finished = requestStarted();
+                return originalFetch.apply(this, arguments).finally(finished);
+            };
+        }
+        const originalSend = XMLHttpRequest.prototype.send;
+        XMLHttpRequest.prototype.send = function () {
+            this.addEventListener("loadend", requestStarted(), {once: true});
+            return originalSend.apply(this, arguments);
+        };
+    }
+
+    let networkQuietSince = null;
+    const check = () => {
+        const moment = now();
+        // * Long polling and streaming requests never finish, they don't keep the page loading
+        const pending = [...state.pending.values()].filter((requestStart) => moment - requestStart < longRequest);
+        const networkQuiet = document.readyState === "complete" && !pending.length
+            && moment - state.lastNetwork >= quietWindow;
+        networkQuietSince = networkQuiet ? (networkQuietSince || moment) : null;
+        // * Animated pages mutate the DOM forever, it is only waited for a while after the network stopped
+        const domQuiet = moment - state.lastMutation >= quietWindow
+            || (networkQuietSince !== null && moment - networkQuietSince >= domSettleLimit);
+        const timedOut = moment - started >= timeout;
+
+        if ((networkQuiet && domQuiet && document.body) || timedOut) {
+            clearInterval(timer);
+            done({
+                status: timedOut ? "timeout" : "quiet",
+                elapsed: (moment - started) / 1000,
+                resources: state.resources,
+                mutations: state.mutations,
+                pending: pending.length,
+            });
+        }
+    };
+    const timer = setInterval(check, 50);
+    check();
+"""
+
 MAX_BODY_LOAD_TRIES = 3
 MAX_TRIES_BETWEEN_REQUESTS = 3
 TIMEOUT = 30
+# Seconds without network requests and DOM changes after which the page is considered loaded
+QUIET_WINDOW = float(os.environ.get("PAGE_LOAD_QUIET_WINDOW", 0.5))
+# Seconds DOM changes are waited for once the network is quiet
+DOM_SETTLE_LIMIT = float(os.environ.get("PAGE_LOAD_DOM_SETTLE_LIMIT", 3))
+# Requests pending for longer are considered long polling
+LONG_REQUEST = 10
+SCRIPT_TIMEOUT_MARGIN = 5
+# W3C Get Timeouts endpoint, Selenium 3 has no command for it
+GET_TIMEOUTS_COMMAND = "getTimeouts"
+
+
+class LoadWaitTimings:
+    """Time spent waiting for recent page loads, to tune the quiet window"""
+
+    def __init__(self, size=1000):
+        self._lock = threading.Lock()
+        self.entries = deque(maxlen=size)
+
+    def record(self, url: str, seconds: float, status: str) -> None:
+        with self._lock:
+            self.entries.append((url, seconds, status))
+
+    def summary(self) -> dict:
+        with self._lock:
+            entries = list(self.entries)
+        if not entries:
+            return {"pages": 0}
+
+        seconds = sorted(entry[1] for entry in entries)
+        statuses = {}
+        for _, _, status in entries:
+            statuses[status] = statuses.get(status, 0) + 1
+        return {
+            "pages": len(entries),
+            "mean": sum(seconds) / len(seconds),
+            "median": seconds[len(seconds) // 2],
+            "p95": seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))],
+            "max": seconds[-1],
+            "statuses": statuses,
+        }
+
+
+load_wait_timings = LoadWaitTimings()
 
 
 class BodyLoadException(TimeoutException):
@@ -78,6 +198,84 @@ class PageBodyLoadedContent:
 
 
 def wait_for_page_load(webdriver_instance: webdriver.Firefox) -> None:
+    """
+    Waits until the page has loaded and network and DOM have been quiet for QUIET_WINDOW.
+    Polls the performance entries instead when the page can't be observed.
+    """
+    start = time()
+    status = "quiet"
+    try:
+        result = _await_quiet_page(webdriver_instance)
+    except TimeoutException:
+        # * The page could be observed, polling it again would only double the wait
+        print(f"Page load not awaited within {TIMEOUT + SCRIPT_TIMEOUT_MARGIN}s. Continue anyway")
+        status = "timeout"
+    except UnexpectedAlertPresentException:
+        print("Alert present, not waiting for page to load")
+        status = "alert"
+    except WebDriverException as exc:
+        print(f"Page load can't be observed, polling instead: {exc}")
+        _wait_by_polling(webdriver_instance)
+        status = "polled"
+    else:
+        status = result["status"]
+        if status == "timeout":
+            print(f"Page still loading after {TIMEOUT}s, {result['pending']} requests pending. Continue anyway")
+        else:
+            print(f"Page loaded, delayed {time() - start:.3f}s "
+                  f"({result['resources']} resources, {result['mutations']} DOM changes)")
+
+    try:
+        url = webdriver_instance.current_url
+    except WebDriverException:
+        url = ""
+    load_wait_timings.record(url, time() - start, status)
+
+
+def get_script_timeout(webdriver_instance: webdriver.Firefox) -> Optional[float]:
+    """Script timeout of the session in seconds, None when it is unlimited or unknown"""
+    commands = webdriver_instance.command_executor._commands
+    commands.setdefault(GET_TIMEOUTS_COMMAND, ("GET", "/session/$sessionId/timeouts"))
+    try:
+        milliseconds = webdriver_instance.execute(GET_TIMEOUTS_COMMAND)["value"]["script"]
+    except (WebDriverException, KeyError, TypeError):
+        # * Timeouts the session was started with
+        milliseconds = webdriver_instance.capabilities.get("timeouts", {}).get("script")
+    return None if milliseconds is None else milliseconds / 1000
+
+
+@contextmanager
+def script_timeout(webdriver_instance: webdriver.Firefox, seconds: float):
+    """Sets the script timeout for the block and restores the previous one, so later scripts keep theirs"""
+    previous = get_script_timeout(webdriver_instance)
+    webdriver_instance.set_script_timeout(seconds)
+    try:
+        yield
+    finally:
+        if previous is not None:
+            try:
+                webdriver_instance.set_script_timeout(previous)
+            except WebDriverException:
+                pass
+
+
+def _await_quiet_page(webdriver_instance: webdriver.Firefox) -> dict:
+    deadline = time() + TIMEOUT
+
+    with script_timeout(webdriver_instance, TIMEOUT + SCRIPT_TIMEOUT_MARGIN):
+        for attempt in range(MAX_BODY_LOAD_TRIES):
+            try:
+                return webdriver_instance.execute_async_script(
+                    JS_AWAIT_QUIET_PAGE, QUIET_WINDOW * 1000, DOM_SETTLE_LIMIT * 1000, LONG_REQUEST * 1000,
+                    max(deadline - time(), 0) * 1000,
+                )
+            except JavascriptException:
+                # * the document was replaced while waiting, e.g. by a redirect, the new one is observed
+                if attempt == MAX_BODY_LOAD_TRIES - 1 or time() >= deadline:
+                    raise
+
+
+def _wait_by_polling(webdriver_instance: webdriver.Firefox) -> None:
     network_requests_exception, body_missing_exc = None, None
     request_observing_interval = 0.2
     body_wait_timeout = 0.5
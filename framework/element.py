@@ -1,5 +1,5 @@
 import time
-from typing import Optional, Iterable, Callable, Any, List
+from typing import Optional, Iterable, Callable, Any, List, Dict
 from urllib.parse import urlparse
 
 from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
@@ -65,6 +65,80 @@ JS_BUILD_CSS_SELECTOR = (
     '''
 )
 
+# Approximation of the webdriver visibility check: hidden by an ancestor, transparent or without size
+JS_IS_DISPLAYED = (
+    '''
+    function isDisplayed(element) {
+        for (var node = element; node && node.nodeType === Node.ELEMENT_NODE; node = node.parentElement) {
+            var style = window.getComputedStyle(node);
+            if (style.display === "none" || style.opacity === "0")
+                return false;
+        }
+        if (window.getComputedStyle(element).visibility !== "visible")
+            return false;
+        var rect = element.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0;
+    }
+    '''
+)
+
+# Functions collecting everything `Element` needs in the page, see `Element.from_snapshot_entry`
+JS_SNAPSHOT_FUNCTIONS = JS_IS_DISPLAYED + (
+    '''
+    function buildSelector(element) {
+        var path = [];
+        while (element.nodeType === Node.ELEMENT_NODE) {
+            var selector = element.nodeName.toLowerCase();
+            var sib = element, nth = 1;
+            while (sib = sib.previousElementSibling) {
+                if (sib.nodeName.toLowerCase() == selector)
+                   nth++;
+            }
+            if (nth != 1)
+                selector += ":nth-of-type("+nth+")";
+            path.unshift(selector);
+            element = element.parentNode;
+        }
+        return path.join(" > ");
+    }
+    function snapshotEntry(element) {
+        var rect = element.getBoundingClientRect();
+        var attributes = {};
+        for (var attribute of element.attributes)
+            attributes[attribute.name] = attribute.value;
+        return [
+            element,
+            element.tagName.toLowerCase(),
+            element.id,
+            buildSelector(element),
+            element.outerHTML,
+            Math.round(rect.left + window.pageXOffset),
+            Math.round(rect.top + window.pageYOffset),
+            isDisplayed(element),
+            attributes
+        ];
+    }
+    '''
+)
+
+JS_SNAPSHOT = JS_SNAPSHOT_FUNCTIONS + (
+    '''
+    var snapshot = {};
+    for (var tag of arguments[0])
+        snapshot[tag] = Array.from(document.getElementsByTagName(tag), snapshotEntry);
+    return snapshot;
+    '''
+)
+
+JS_DISPLAYED_BY_SELECTOR = JS_IS_DISPLAYED + (
+    '''
+    return arguments[0].map(function (selector) {
+        var element = document.querySelector(selector);
+        return element === null ? null : isDisplayed(element);
+    });
+    '''
+)
+
 
 class Element:
     def __init__(self,
@@ -115,6 +189,12 @@ class Element:
         element_copy.source = self.source
         return element_copy
 
+    def __getstate__(self) -> dict:
+        # WebElements belong to a webdriver session and can not leave the process
+        state = self.__dict__.copy()
+        state['element'] = {}
+        return state
+
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, Element):
             return NotImplemented
@@ -199,8 +279,8 @@ class Element:
         return element
 
     def click(self, webdriver_instance: RemoteWebDriver) -> dict:
-        webdriver_instance.limiter.delay_access(register=False)
         prev_url = webdriver_instance.current_url
+        webdriver_instance.limiter.delay_access(register=False, url=prev_url)
         try:
             result = {
                 'action': 'NONE'
@@ -220,12 +300,12 @@ class Element:
                 }
             if webdriver_instance.current_url != prev_url:
                 if not self.is_same_page(webdriver_instance.current_url, prev_url):
-                    if not self.is_same_site(webdriver_instance.current_url, prev_url):
-                        webdriver_instance.limiter.register_request()
+                    webdriver_instance.limiter.register_request(url=webdriver_instance.current_url)
                     result = {
                         'action': 'PAGECHANGE',
                         'url': webdriver_instance.current_url
                     }
+                    webdriver_instance.limiter.delay_access(url=prev_url)
                     webdriver_instance.get(prev_url)
                     time.sleep(DELAY_AFTER_GET)
             return result
@@ -287,6 +367,41 @@ class Element:
                 pass
         return elements
 
+    @staticmethod
+    def from_snapshot_entry(entry: list, webdriver_instance: RemoteWebDriver) -> 'Element':
+        """Builds an element from a `JS_SNAPSHOT` entry without querying the webdriver"""
+        web_element, tag_name, element_id, selector_no_id, source, x, y, _, attributes = entry
+        element = Element(None, None, selector_no_id=selector_no_id)
+        element.element_id = element_id if element_id != '' else None
+        element.tag_name = tag_name
+        element.source = source
+        element.position = {'x': x, 'y': y}
+        element.cached_attrs = attributes
+        if web_element is not None:
+            element.element[id(webdriver_instance)] = web_element
+        return element
+
+    @staticmethod
+    def snapshot(webdriver_instance: RemoteWebDriver, element_types: Iterable[str]) -> Dict[str, List[tuple]]:
+        """
+        Collects all elements of the given types in a single script call.
+        Returns (element, is_displayed) pairs grouped by element type, in document order.
+        """
+        snapshot = webdriver_instance.execute_script(JS_SNAPSHOT, list(element_types))
+        return {
+            element_type: [
+                (Element.from_snapshot_entry(entry, webdriver_instance), entry[7]) for entry in entries
+            ]
+            for element_type, entries in snapshot.items()
+        }
+
+    @staticmethod
+    def displayed_by_selector(webdriver_instance: RemoteWebDriver, elements: List['Element']) -> List[Optional[bool]]:
+        """Visibility of the elements in a single script call, None for the elements that are no longer on the page"""
+        return webdriver_instance.execute_script(
+            JS_DISPLAYED_BY_SELECTOR, [element.selector_no_id for element in elements]
+        )
+
     def find_by_xpath(self, xpath: str, webdriver_instance: RemoteWebDriver) -> List['Element']:
         try:
             elements = self.get_element(webdriver_instance).find_elements_by_xpath(xpath)
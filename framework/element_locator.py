@@ -1,16 +1,34 @@
+import hashlib
 import itertools
+import json
+import pickle
 import re
+import threading
 import time
-from typing import List, Optional, Set, Dict
+from collections import OrderedDict
+from typing import List, Optional, Set, Dict, Tuple
 
 from selenium import webdriver
-from selenium.common.exceptions import StaleElementReferenceException
 
 from framework.activity import Activity
-from framework.element import Element, ElementLostException
+from framework.element import Element
 
 POTENTIAL_ACTIVATORS = {"a", "button", "input", "div"}
 DEFAULT_TARGET_ELEMENTS = {"a", "button", "input", "img", "div", "select"}
+POPUP_COMMANDS = {"close_popup", "wait_for_popup"}
+LOCATOR_CACHE_SIZE = 64
+
+JS_DOM_FINGERPRINT = (
+    '''
+    var html = document.documentElement.outerHTML;
+    var hash = 0x811c9dc5;
+    for (var i = 0; i < html.length; i++) {
+        hash ^= html.charCodeAt(i);
+        hash = Math.imul(hash, 0x01000193);
+    }
+    return (hash >>> 0).toString(16) + "-" + html.length;
+    '''
+)
 
 
 class _ElementInfo:
@@ -42,43 +60,48 @@ class ElementLocator:
         self.url_regex = re.compile(url_pattern)
         self.href_regex = re.compile(r'''<a [^>]*href="([^#j][^"]*)"''')
 
-    def _initial_scan(self, counter=0, progress_report_callback=None) -> None:
+    def __getstate__(self) -> dict:
+        # The snapshot is attached to a webdriver of the process it is unpickled in
+        state = self.__dict__.copy()
+        state["webdriver_instance"] = None
+        return state
+
+    def _initial_scan(self, snapshot: Dict[str, list], progress_report_callback=None) -> None:
         print("Looking for elements:")
         for element_type in self.target_elements:
             if element_type not in self.known_elements:
                 self.known_elements[element_type] = []
-            new_elements = self.webdriver_instance.find_elements_by_tag_name(element_type)
+            new_elements = snapshot.get(element_type, [])
             if progress_report_callback is not None:
                 progress_report_callback(
                     {"thread_status": {0: f"Element locator adding {len(new_elements)} <{element_type}> elements"}}
                 )
-
-            for element in new_elements:
-                counter += 1
-                print(f"\rAdding <{element_type}> {counter}/{len(new_elements)}", end="", flush=True)
-                try:
-                    self.known_elements[element_type].append(
-                        _ElementInfo(Element(element, self.webdriver_instance), element.is_displayed())
-                    )
-                except StaleElementReferenceException:
-                    print()
-                    print("Element was lost before being added, skipping")
-            counter = 0
-            print("")
+            self.known_elements[element_type].extend(
+                _ElementInfo(element, is_displayed) for element, is_displayed in new_elements
+            )
+            print(f"Added {len(new_elements)} <{element_type}> elements")
         print(f"Found {len(self.known_elements)} elements")
 
     def _update_state_diff(self, activating_element: Element) -> None:
+        # * Attributes were cached from the snapshot taken before the click, which changes them on the activator
+        activating_element.cached_attrs = None
         # Will ignore any new elements
+        hidden_elements = [
+            element_info for element_info in itertools.chain.from_iterable(self.known_elements.values())
+            if not element_info.displayed_from_start
+        ]
         elements_appeared = 0
-        for element_info in itertools.chain.from_iterable(self.known_elements.values()):
-            try:
-                is_displayed_now = element_info.element.get_element(self.webdriver_instance).is_displayed()
-                if is_displayed_now and not element_info.displayed_from_start:
-                    element_info.set_activated_by(activating_element)
-                    elements_appeared += 1
-            except ElementLostException:
+        displayed_now = Element.displayed_by_selector(
+            self.webdriver_instance, [element_info.element for element_info in hidden_elements]
+        )
+        for element_info, is_displayed_now in zip(hidden_elements, displayed_now):
+            if is_displayed_now is None:
                 print()
                 print(f"Element lost! {element_info.element.source}")
+            elif is_displayed_now:
+                element_info.element.cached_attrs = None
+                element_info.set_activated_by(activating_element)
+                elements_appeared += 1
         if elements_appeared:
             print(f" --- {elements_appeared} elements appeared")
 
@@ -87,21 +110,13 @@ class ElementLocator:
         self.activity.get(self.webdriver_instance)
         time.sleep(5)
         self.final_url = self.webdriver_instance.current_url
-        activators = list()
-        for element_type in POTENTIAL_ACTIVATORS:
-            new_elements = self.webdriver_instance.find_elements_by_tag_name(element_type)
-            for element in new_elements:
-                # if element.tag_name == "a":
-                #     href_match = self.href_regex.match(element.get_attribute("outerHTML"))
-                #     if href_match:
-                #         continue
-                try:
-                    activators.append(Element(element, self.webdriver_instance))
-                except StaleElementReferenceException:
-                    print()
-                    print("Element was lost before being added, skipping")
-
-        self._initial_scan(progress_report_callback=progress_report_callback)
+        # Activators and target elements are collected with a single script call
+        snapshot = Element.snapshot(self.webdriver_instance, POTENTIAL_ACTIVATORS | set(self.target_elements))
+        activators = [
+            element for element_type in POTENTIAL_ACTIVATORS for element, _ in snapshot.get(element_type, [])
+        ]
+
+        self._initial_scan(snapshot, progress_report_callback=progress_report_callback)
 
         if not fake and len(self.target_elements) != 0:
             for activator_id, activator in enumerate(activators, 1):
@@ -127,14 +142,9 @@ class ElementLocator:
 
     @staticmethod
     def get_all_of_type(webdriver_instance: webdriver.Firefox, element_types=None) -> List[Element]:
-        elements = []
-        for element_type in element_types:
-            elements.extend(
-                Element.from_webelement_list(
-                    webdriver_instance.find_elements_by_tag_name(element_type), webdriver_instance
-                )
-            )
-        return elements
+        element_types = list(element_types)
+        snapshot = Element.snapshot(webdriver_instance, element_types)
+        return [element for element_type in element_types for element, _ in snapshot[element_type]]
 
     @staticmethod
     def get_all_by_xpath(webdriver_instance, xpath) -> List[Element]:
@@ -178,3 +188,61 @@ class ElementLocator:
     def click(self, element: Element, webdriver_instance: webdriver.Firefox):
         # self.activate_element(element)
         return element.click(webdriver_instance)
+
+
+def locator_key(activity: Activity) -> Tuple:
+    """Activities with equal keys load the same page in the same state and share the locator results"""
+    commands_hash = hashlib.sha1(
+        json.dumps([activity.commands, activity.options], sort_keys=True, default=str).encode()
+    ).hexdigest()
+    popup_mode = next(
+        (command["command"] for command in reversed(activity.commands) if command["command"] in POPUP_COMMANDS), None
+    )
+    return activity.url, commands_hash, activity.page_resolution, popup_mode
+
+
+def dom_fingerprint(webdriver_instance: webdriver.Firefox) -> str:
+    return webdriver_instance.execute_script(JS_DOM_FINGERPRINT)
+
+
+class LocatorCache:
+    """
+    Results of `ElementLocator.analyze()` by locator key, kept while the page DOM stays the same.
+    Locators are stored pickled, so every user gets its own copy without webdriver references.
+    """
+
+    def __init__(self, max_size: int = LOCATOR_CACHE_SIZE):
+        self.lock = threading.Lock()
+        self.max_size = max_size
+        self.entries: OrderedDict = OrderedDict()
+
+    def get(self, key: Tuple, fingerprint: str, webdriver_instance: webdriver.Firefox,
+            activity: Activity) -> Optional[ElementLocator]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != fingerprint:
+                # The page changed, the stored result is invalid
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+        element_locator = pickle.loads(entry[1])
+        element_locator.webdriver_instance = webdriver_instance
+        element_locator.activity = activity
+        return element_locator
+
+    def put(self, key: Tuple, fingerprint: str, element_locator: ElementLocator) -> None:
+        data = pickle.dumps(element_locator)
+        with self.lock:
+            self.entries[key] = (fingerprint, data)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+locator_cache = LocatorCache()
@@ -7,8 +7,8 @@ from selenium.common.exceptions import NoSuchWindowException, NoSuchElementExcep
 
 
 def advanced_link_click(element, webdriver_instance: webdriver.Firefox):
-        webdriver_instance.limiter.delay_access(register=False)
         prev_url = webdriver_instance.current_url
+        webdriver_instance.limiter.delay_access(register=False, url=prev_url)
         body = webdriver_instance.find_element_by_css_selector('body')
         try:
             result = {
@@ -43,8 +43,9 @@ def advanced_link_click(element, webdriver_instance: webdriver.Firefox):
                             "url": webdriver_instance.current_url
                         }
 
-                    if not element.is_same_site(webdriver_instance.current_url, prev_url) and result["action"] != "INTERNALLINK":
-                        webdriver_instance.limiter.register_request()
+                    if result["action"] != "INTERNALLINK":
+                        webdriver_instance.limiter.register_request(url=webdriver_instance.current_url)
+                    webdriver_instance.limiter.delay_access(url=prev_url)
                     webdriver_instance.get(prev_url)
                     time.sleep(DELAY_AFTER_GET)
             return result
@@ -1,5 +1,4 @@
 from selenium.common.exceptions import InvalidSelectorException
-import requests
 from bs4 import BeautifulSoup
 import framework.libs.clean as clean
 
@@ -27,28 +26,21 @@ def get_children(driver, elem):
 
 
 def get_longdesc(driver, image):
-    data = None
     longdesc = driver.execute_script("return arguments[0].longDesc;", image.get_element(driver))
     if longdesc == "":
         return longdesc
 
-    try:
-        data = requests.get(longdesc)
-    except (
-        requests.exceptions.MissingSchema,
-        requests.exceptions.InvalidURL,
-        requests.exceptions.InvalidSchema,
-    ) as exc:
-        print("\nrequests exception of longdesc", exc)
+    target = driver.link_targets.get(longdesc)
+    if target is None:
+        print("\nlongdesc is not available", longdesc)
         return ""
 
-    text = data.text
-    if longdesc.find("#") != -1:
-        id_word = longdesc[longdesc.find["#"] + 1 :]
-        soup = BeautifulSoup(text, "html.parser")
+    _, _, id_word = longdesc.partition("#")
+    if id_word:
+        soup = BeautifulSoup(target.html, "html.parser")
         elem = soup.find(id=id_word)
-        return elem.text
-    return clean.clean_html(text, True, True, True)
+        return elem.text if elem is not None else ""
+    return clean.clean_html(target.html, True, True, True)
 
 
 def get_associated_text(driver, element, body):
@@ -2,6 +2,11 @@ from tempfile import NamedTemporaryFile
 from cv2 import imread, imwrite, resize, IMREAD_UNCHANGED
 import requests
 
+from framework.libs.image_cache import cached_image_analysis
+
+# (connect, read) timeouts in seconds
+DOWNLOAD_TIMEOUT = (5, 20)
+
 
 def save_screen(element, driver):
     file = NamedTemporaryFile(delete=False, suffix=".png")
@@ -23,6 +28,27 @@ def wont_read_or_rgba(image_file):
     return cv_image is None or len(cv_image.shape) == 3 and cv_image.shape[2] == 4
 
 
+def download(src, limiter):
+    """
+    Image content, or None if the server did not return it.
+    Images seen before are revalidated with their ETag and taken from the image analysis cache when unchanged.
+    """
+    cached = cached_image_analysis.get_download(src)
+    headers = {"If-None-Match": cached[0]} if cached is not None else {}
+
+    limiter.delay_access(url=src)
+    r = requests.get(src, allow_redirects=False, headers=headers, timeout=DOWNLOAD_TIMEOUT)
+    if r.status_code == 304 and cached is not None:
+        return cached[1]
+    if r.status_code != 200 or not len(r.content):
+        return None
+
+    etag = r.headers.get("ETag")
+    if etag:
+        cached_image_analysis.put_download(src, etag, r.content)
+    return r.content
+
+
 def get_image_element(driver, element, force_screenshot=False):
     """download this image or cut screen"""
 
@@ -43,10 +69,10 @@ def get_image_element(driver, element, force_screenshot=False):
             return save_screen(element, driver)
 
         try:
-            file = NamedTemporaryFile(delete=False, suffix=".png")
-            r = requests.get(src, stream=True, allow_redirects=False)
-            if r.status_code == 200 and len(r.content):
-                file.write(r.content)
+            content = download(src, driver.limiter)
+            if content:
+                file = NamedTemporaryFile(delete=False, suffix=".png")
+                file.write(content)
                 file.seek(0)
                 return file
         except (
@@ -54,6 +80,7 @@ def get_image_element(driver, element, force_screenshot=False):
             requests.exceptions.InvalidURL,
             requests.exceptions.InvalidSchema,
             requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
         ) as exc:
             print("\nexception", exc)
 
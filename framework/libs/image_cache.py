@@ -0,0 +1,138 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+logger = logging.getLogger("framework.image_cache")
+
+# Kept on the models volume, so the cache outlives the job and is shared by the workers of the host
+IMAGE_CACHE_PATH = Path(os.environ.get("IMAGE_CACHE_PATH", "/models/cache/image_analysis.sqlite3"))
+MAX_DOWNLOADS = int(os.environ.get("IMAGE_CACHE_MAX_DOWNLOADS", 20000))
+MAX_ANALYSES = int(os.environ.get("IMAGE_CACHE_MAX_ANALYSES", 200000))
+PRUNE_EVERY = 256
+
+# Bumped with every change of the tables or their keys, an older database is dropped
+SCHEMA_VERSION = 3
+SCHEMA = '''
+    DROP TABLE IF EXISTS downloads;
+    DROP TABLE IF EXISTS analyses;
+    CREATE TABLE downloads (
+        url TEXT NOT NULL, etag TEXT NOT NULL, content BLOB NOT NULL, stored REAL NOT NULL,
+        PRIMARY KEY (url, etag)
+    );
+    CREATE TABLE analyses (
+        image_hash TEXT NOT NULL, kind TEXT NOT NULL, params TEXT NOT NULL, result TEXT NOT NULL, stored REAL NOT NULL,
+        PRIMARY KEY (image_hash, kind, params)
+    );
+'''
+
+
+class ImageAnalysisCache:
+    """
+    Persistent cache of image downloads and analysis results, shared by jobs and pages.
+
+    Downloads are keyed by URL and ETag, so they are revalidated with the server instead of downloaded again.
+    Analysis results (OCR text, YOLO labels, verdicts) are keyed by the SHA-256 digest of the pixels,
+    the kind of analysis and its parameters, and have to be JSON serializable. The parameters include
+    the version of the analysis code and models, so results of older versions are not served.
+    Both tables are pruned to their most recently stored entries.
+    Caching is best-effort, an unavailable database disables it.
+    """
+
+    def __init__(self, path: Path = IMAGE_CACHE_PATH):
+        self.path = path
+        self.disabled = False
+        self._connections = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_created = False
+        self._downloads_stored = 0
+        self._analyses_stored = 0
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self.disabled:
+            return None
+        connection = getattr(self._connections, "connection", None)
+        if connection is not None:
+            return connection
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            with self._schema_lock:
+                if not self._schema_created:
+                    self._create_schema(connection)
+                    self._schema_created = True
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Image analysis cache is not available: {e}")
+            self.disabled = True
+            return None
+        self._connections.connection = connection
+        return connection
+
+    @staticmethod
+    def _create_schema(connection: sqlite3.Connection) -> None:
+        # * One transaction, so workers starting together don't drop the tables created by each other
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                for statement in filter(str.strip, SCHEMA.split(";")):
+                    connection.execute(statement)
+                connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _execute(self, query: str, params: tuple = ()) -> list:
+        connection = self._connection()
+        if connection is None:
+            return []
+        try:
+            return connection.execute(query, params).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Image analysis cache query failed: {e}")
+            return []
+
+    def get_download(self, url: str) -> Optional[Tuple[str, bytes]]:
+        """ETag and content of the latest stored download of the URL"""
+        rows = self._execute(
+            "SELECT etag, content FROM downloads WHERE url = ? ORDER BY stored DESC LIMIT 1", (url,)
+        )
+        return (rows[0][0], bytes(rows[0][1])) if rows else None
+
+    def put_download(self, url: str, etag: str, content: bytes) -> None:
+        self._execute(
+            "INSERT OR REPLACE INTO downloads (url, etag, content, stored) VALUES (?, ?, ?, ?)",
+            (url, etag, content, time.time())
+        )
+        self._downloads_stored += 1
+        if self._downloads_stored % PRUNE_EVERY == 0:
+            self._prune("downloads", MAX_DOWNLOADS)
+
+    def get(self, image_hash: str, kind: str, params: str = ""):
+        rows = self._execute(
+            "SELECT result FROM analyses WHERE image_hash = ? AND kind = ? AND params = ?", (image_hash, kind, params)
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    def put(self, image_hash: str, kind: str, result, params: str = "") -> None:
+        self._execute(
+            "INSERT OR REPLACE INTO analyses (image_hash, kind, params, result, stored) VALUES (?, ?, ?, ?, ?)",
+            (image_hash, kind, params, json.dumps(result), time.time())
+        )
+        self._analyses_stored += 1
+        if self._analyses_stored % PRUNE_EVERY == 0:
+            self._prune("analyses", MAX_ANALYSES)
+
+    def _prune(self, table: str, max_entries: int) -> None:
+        self._execute(
+            f"DELETE FROM {table} WHERE rowid NOT IN (SELECT rowid FROM {table} ORDER BY stored DESC LIMIT ?)",
+            (max_entries,)
+        )
+
+
+cached_image_analysis = ImageAnalysisCache()
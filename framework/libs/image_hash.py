@@ -0,0 +1,38 @@
+import hashlib
+
+import cv2
+import numpy as np
+
+HASH_SIZE = 8
+# The DCT is taken of a larger image, only its low frequencies make up the hash
+DCT_SIZE = HASH_SIZE * 4
+
+
+def perceptual_hash(image: np.ndarray) -> str:
+    """
+    pHash of a BGR, BGRA or grayscale image as a hex string.
+    Resized, re-encoded or slightly recolored copies of an image get the same hash.
+    """
+    if len(image.shape) == 3:
+        cvt_color = cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+        image = cv2.cvtColor(image, cvt_color)
+
+    image = cv2.resize(image, (DCT_SIZE, DCT_SIZE), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low_frequencies = cv2.dct(image)[:HASH_SIZE, :HASH_SIZE]
+    bits = (low_frequencies > np.median(low_frequencies)).flatten()
+    return np.packbits(bits).tobytes().hex()
+
+
+def hash_distance(first: str, second: str) -> int:
+    """Number of differing bits"""
+    return bin(int(first, 16) ^ int(second, 16)).count("1")
+
+
+def content_digest(image: np.ndarray) -> str:
+    """
+    SHA-256 of the pixels, shape and type of an image as a hex string.
+    Unlike the perceptual hash it only matches the exact same image, so it can key analysis results.
+    """
+    digest = hashlib.sha256(f"{image.shape}{image.dtype}".encode())
+    digest.update(np.ascontiguousarray(image).tobytes())
+    return digest.hexdigest()
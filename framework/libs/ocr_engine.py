@@ -0,0 +1,90 @@
+import json
+import os
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, List, Union
+
+import numpy as np
+import easyocr
+import torch
+from easyocr import Reader
+
+from framework.libs.image_cache import cached_image_analysis
+from framework.libs.image_hash import content_digest
+
+OCR_CACHE_SIZE = int(os.environ.get("OCR_CACHE_SIZE", 1024))
+READER_CONFIG = dict(
+    lang_list=["en"],
+    recog_network="standard",
+    user_network_directory=None,
+    model_storage_directory="/models/easy_ocr",  # !cannot unzip model
+    detector=True,
+    recognizer=True,
+    download_enabled=True,
+)
+# Part of the image analysis cache key, results of other EasyOCR versions or networks are recognized again
+READER_VERSION = f"easyocr-{getattr(easyocr, '__version__', '')}-{READER_CONFIG['recog_network']}"
+
+
+class OcrEngine:
+    """
+    EasyOCR reader shared by all tests of the process.
+
+    The networks are loaded on first use, on the GPU only when one is available.
+    Results can be cached by digest of the image, in memory and in the persistent image analysis cache,
+    so an image repeated across pages and jobs is recognized once.
+    """
+
+    def __init__(self, cache_size: int = OCR_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._reader = None
+        # * The reader is not thread safe, it runs one call at a time
+        self._reader_lock = Lock()
+        self._cache_lock = Lock()
+        self._cache = OrderedDict()
+
+    @property
+    def gpu(self) -> bool:
+        return torch.cuda.is_available()
+
+    def reader(self) -> Reader:
+        with self._reader_lock:
+            if self._reader is None:
+                self._reader = Reader(gpu=self.gpu, **READER_CONFIG)
+            return self._reader
+
+    def readtext(self, images: List[Union[str, np.ndarray]], **settings) -> List[list]:
+        """Recognizes text on a batch of images (file names or arrays of the same size), one result per image"""
+        reader = self.reader()
+        with self._reader_lock:
+            if self.gpu and len(images) > 1 and hasattr(reader, "readtext_batched"):
+                return reader.readtext_batched(images, **settings)
+            return [reader.readtext(image, **settings) for image in images]
+
+    def cached(self, image: np.ndarray, recognize: Callable, *key):
+        """
+        Result of `recognize()` for the image, computed once per digest of the image and `key`,
+        where `key` holds the recognition parameters and the version of the code that change the result.
+        The result has to be JSON serializable.
+        """
+        # * Not the perceptual hash: similar images of other sites, like two banners on the same background, collide
+        image_hash = content_digest(image)
+        cache_key = (image_hash, *key)
+        with self._cache_lock:
+            if cache_key in self._cache:
+                self._cache.move_to_end(cache_key)
+                return self._cache[cache_key]
+
+        params = json.dumps((READER_VERSION, *cache_key[1:]))
+        result = cached_image_analysis.get(image_hash, "ocr", params)
+        if result is None:
+            result = recognize()
+            cached_image_analysis.put(image_hash, "ocr", result, params)
+        with self._cache_lock:
+            self._cache[cache_key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+
+cached_ocr_engine = OcrEngine()
@@ -1,85 +1,191 @@
+import os
+from typing import Optional, Tuple
+
 from selenium import webdriver
-import time
+from selenium.common.exceptions import StaleElementReferenceException, WebDriverException
+from selenium.webdriver.remote.webelement import WebElement
+
+from framework.await_page_load import script_timeout
 from .hide_cookie_popup import _find_accept_button_recurse
-from selenium.common.exceptions import ElementNotInteractableException, ElementClickInterceptedException, StaleElementReferenceException, MoveTargetOutOfBoundsException, WebDriverException
-from selenium.webdriver.common.action_chains import ActionChains
-import random
-import numpy as np
-import scipy.interpolate as si
 
 SCROLL_ITERATIONS = 3
 SUBSCROLL_ITERATIONS = 10
+# Seconds the page is scrolled, hovered and left without a popup appearing before giving up
+POPUP_IDLE_BUDGET = float(os.environ.get("POPUP_IDLE_BUDGET", 15))
+# Seconds between two scroll and hover steps
+TRIGGER_INTERVAL = POPUP_IDLE_BUDGET / (SCROLL_ITERATIONS * 2 * SUBSCROLL_ITERATIONS)
+HOVERS_PER_STEP = 10
+# A newly shown fixed element is an overlay when it is stacked that high or covers that share of the viewport
+MIN_OVERLAY_Z_INDEX = 100
+MIN_OVERLAY_VIEWPORT_SHARE = 0.25
+# Elements checked per batch of DOM changes, large inserted subtrees are only partially checked
+MAX_CHECKED_ELEMENTS = 2000
+SCRIPT_TIMEOUT_MARGIN = 5
 
+JS_IS_SHOWN = """
+    const isShown = (element) => {
+        const style = getComputedStyle(element);
+        if (style.display === "none" || style.visibility === "hidden" || Number(style.opacity) === 0) {
+            return false;
+        }
+        const rect = element.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0;
+    };
+"""
 
-def __get_highest_z_index(webdriver_instance):
-    print("Retrieving elements...")
-    all_elements = webdriver_instance.find_element_by_tag_name("html").find_elements_by_xpath(".//*")
-    print(f"There are {len(all_elements)} elements on the page")
-
-    max_z_index = -99999999999
-    max_z_element = None
-    indices = list()
-    for element_id, element in enumerate(all_elements):
-        print(f"\rChecking for the highest z-index...{element_id}/{len(all_elements)}", end="")
-        if not element.is_displayed():
-            continue
-        z_index = element.value_of_css_property("z-index")
-        if z_index != "auto":
-            try:
-                z_index = int(z_index)
-                if z_index > max_z_index:
-                    max_z_index = z_index
-                    max_z_element = element
-            except ValueError:
-                continue
+# * Resolves with the first overlay shown while the page is scrolled, hovered and left, or with null
+# * when none was shown within the budget. Overlays already shown when it starts, like sticky headers, are ignored.
+JS_WATCH_FOR_POPUP = JS_IS_SHOWN + """
+    const [budget, interval, steps, hoversPerStep, minZIndex, minViewportShare, maxCheckedElements, done] = arguments;
+    const started = performance.now();
+    const initialScroll = window.pageYOffset;
 
-    print()
-    print(f"The max z-index is {max_z_index}")
+    const isOverlay = (element) => {
+        if (!(element instanceof Element) || !element.isConnected || !isShown(element)) {
+            return false;
+        }
+        if (element.tagName === "DIALOG" && element.open) {
+            return true;
+        }
+        const style = getComputedStyle(element);
+        if (style.position !== "fixed") {
+            return false;
+        }
+        const rect = element.getBoundingClientRect();
+        const viewportShare = (rect.width * rect.height) / (window.innerWidth * window.innerHeight);
+        return parseInt(style.zIndex, 10) >= minZIndex || viewportShare >= minViewportShare;
+    };
+    const shownOverlays = new WeakSet([...document.querySelectorAll("body *")].filter(isOverlay));
 
-    return max_z_element, max_z_index
+    let finished = false;
+    const finish = (popup) => {
+        if (finished) {
+            return;
+        }
+        finished = true;
+        clearInterval(timer);
+        observer.disconnect();
+        window.scrollTo(0, initialScroll);
+        done(popup);
+    };
 
+    const observer = new MutationObserver((records) => {
+        const changed = new Set();
+        const add = (element) => {
+            if (element instanceof Element && changed.size < maxCheckedElements) {
+                changed.add(element);
+            }
+        };
+        for (const record of records) {
+            if (record.type === "attributes") {
+                // * The style or class that shows an overlay may be changed on one of its children
+                let element = record.target;
+                for (; element && element !== document.body; element = element.parentElement) {
+                    add(element);
+                }
+            }
+            const nodes = record.type === "attributes" ? [record.target] : record.addedNodes;
+            for (const node of nodes) {
+                add(node);
+                // * Portals and modal roots insert or show a plain wrapper around the fixed overlay
+                if (node instanceof Element) {
+                    const descendants = node.querySelectorAll("*");
+                    for (let index = 0; index < descendants.length && changed.size < maxCheckedElements; index++) {
+                        add(descendants[index]);
+                    }
+                }
+            }
+        }
+        for (const element of changed) {
+            if (!shownOverlays.has(element) && isOverlay(element)) {
+                finish(element);
+                return;
+            }
+        }
+    });
+    observer.observe(document.documentElement, {
+        childList: true, subtree: true, attributes: true, attributeFilter: ["style", "class", "hidden", "open"]
+    });
 
-def wait_for_popup(webdriver_instance):
-    for iteration in range(SCROLL_ITERATIONS):
-        scroll_height = webdriver_instance.execute_script("return document.body.scrollHeight")
-
-        elements_to_hover = list()
-        elements_to_hover.extend(webdriver_instance.find_elements_by_tag_name("a"))
-        elements_to_hover.extend(webdriver_instance.find_elements_by_tag_name("button"))
-
-        dimensions = webdriver_instance.get_window_size(webdriver_instance.current_window_handle)
-        for i in range(SUBSCROLL_ITERATIONS):
-            print(
-                f"\rScrolling back and forth and waiting for the popup, iteration {iteration+1}/{SCROLL_ITERATIONS} {int(i / SUBSCROLL_ITERATIONS * 50)}%", end="")
-            time.sleep(1)
-            target_scroll = int(scroll_height/SUBSCROLL_ITERATIONS*i)
-            webdriver_instance.execute_script("window.scrollTo(0, arguments[0]);", target_scroll)
-            for i in range(10):
-                try:
-                    ac = ActionChains(webdriver_instance)
-                    ac.move_to_element(random.choice(elements_to_hover)).perform()
-                except (MoveTargetOutOfBoundsException, WebDriverException):
-                    pass
-
-        for i in range(SUBSCROLL_ITERATIONS):
-            print(
-                f"\rScrolling back and forth and waiting for the popup, iteration {iteration+1}/{SCROLL_ITERATIONS} {50 + int(i / SUBSCROLL_ITERATIONS * 50)}%", end="")
-            time.sleep(1)
-            target_scroll = int(scroll_height/SUBSCROLL_ITERATIONS*(SUBSCROLL_ITERATIONS-i))
-            webdriver_instance.execute_script("window.scrollTo(0, arguments[0]);", target_scroll)
-            for _ in range(10):
-                try:
-                    ac = ActionChains(webdriver_instance)
-                    ac.move_to_element(random.choice(elements_to_hover)).perform()
-                except (MoveTargetOutOfBoundsException, WebDriverException):
-                    pass
+    const dispatch = (target, type, init) => target.dispatchEvent(
+        new MouseEvent(type, Object.assign({bubbles: true, cancelable: true, view: window}, init))
+    );
+    const hoverTargets = [...document.querySelectorAll("a, button")];
+    let step = 0;
+    const trigger = () => {
+        if (performance.now() - started >= budget) {
+            finish(null);
+            return;
+        }
+        // * Scrolls down and back up in `steps` steps each way
+        const phase = step % (2 * steps);
+        const scrollHeight = document.body ? document.body.scrollHeight : 0;
+        const position = phase < steps ? phase : 2 * steps - phase;
+        window.scrollTo(0, scrollHeight * position / steps);
 
-    print()
+        for (let hover = 0; hover < hoversPerStep && hoverTargets.length; hover++) {
+            const element = hoverTargets[Math.floor(Math.random() * hoverTargets.length)];
+            const rect = element.getBoundingClientRect();
+            const init = {clientX: rect.left + rect.width / 2, clientY: rect.top + rect.height / 2};
+            ["mouseover", "mouseenter", "mousemove"].forEach((type) => dispatch(element, type, init));
+        }
+        // * Exit intent: the mouse leaves the viewport through the top edge
+        if (phase === steps - 1 || phase === 2 * steps - 1) {
+            const exit = {clientX: window.innerWidth / 2, clientY: -1, relatedTarget: null};
+            dispatch(document.documentElement, "mouseout", exit);
+            dispatch(document.documentElement, "mouseleave", exit);
+        }
+        step++;
+    };
+    const timer = setInterval(trigger, interval);
+    trigger();
+"""
+
+# * The shown element with the highest z-index, the first one in document order when several share it
+JS_GET_TOP_OVERLAY = JS_IS_SHOWN + """
+    let topElement = null;
+    let topZIndex = null;
+    for (const element of document.querySelectorAll("body *")) {
+        const zIndex = parseInt(getComputedStyle(element).zIndex, 10);
+        if (isNaN(zIndex) || (topElement !== null && zIndex <= topZIndex) || !isShown(element)) {
+            continue;
+        }
+        topElement = element;
+        topZIndex = zIndex;
+    }
+    return [topElement, topZIndex];
+"""
+
+
+def _get_top_overlay(webdriver_instance) -> Tuple[Optional[WebElement], Optional[int]]:
+    max_z_element, max_z_index = webdriver_instance.execute_script(JS_GET_TOP_OVERLAY)
+    print(f"The max z-index is {max_z_index}")
+    return max_z_element, max_z_index
+
+
+def wait_for_popup(webdriver_instance, idle_budget: float = POPUP_IDLE_BUDGET) -> Optional[WebElement]:
+    """
+    Scrolls the page back and forth, hovers links and buttons and simulates an exit intent from JS,
+    until a popup is shown or `idle_budget` seconds pass. Returns the popup, if one was shown.
+    """
+    print(f"Scrolling back and forth and waiting for the popup up to {idle_budget:.0f}s")
+    try:
+        with script_timeout(webdriver_instance, idle_budget + SCRIPT_TIMEOUT_MARGIN):
+            popup = webdriver_instance.execute_async_script(
+                JS_WATCH_FOR_POPUP, idle_budget * 1000, TRIGGER_INTERVAL * 1000, SUBSCROLL_ITERATIONS, HOVERS_PER_STEP,
+                MIN_OVERLAY_Z_INDEX, MIN_OVERLAY_VIEWPORT_SHARE, MAX_CHECKED_ELEMENTS,
+            )
+    except WebDriverException as e:
+        print(f"Could not watch for the popup: {e}")
+        return None
+    print("Popup shown" if popup is not None else "No popup shown")
+    return popup
 
 
 def detect_popup(webdriver_instance: webdriver.Firefox):
-    wait_for_popup(webdriver_instance)
-    max_z_element, max_z_index = __get_highest_z_index(webdriver_instance)
+    max_z_element = wait_for_popup(webdriver_instance)
+    if max_z_element is None:
+        max_z_element, _ = _get_top_overlay(webdriver_instance)
     if max_z_element is None:
         print("No element is on top of all others, cannot detect a popup")
         return
@@ -1,6 +1,18 @@
+from framework.model_wrapper import batched
+
+
 def create_doc(model_wrapper, text):
     return model_wrapper.run(_do_create_doc, text)
 
 
+def create_docs(model_wrapper, texts):
+    return model_wrapper.run_many(_do_create_doc, [(text,) for text in texts])
+
+
+def _do_create_docs(model, calls):
+    return list(model.pipe([text for (text,), _ in calls]))
+
+
+@batched(_do_create_docs)
 def _do_create_doc(model, text):
     return model(text)
@@ -83,7 +83,6 @@ class SuperTest:
             "dependency": [],
         }
         self.activity.get(self.driver)
-        wait_for_page_load(self.driver)
         super().__init__(**kwargs)
 
     def scroll_to_el(self, element: Element) -> None:
@@ -128,7 +127,6 @@ class SuperTest:
         try:
             self.driver.refresh()
             self.activity.get(self.driver)
-            wait_for_page_load(self.driver)
         except UnexpectedAlertPresentException:
             pass
 
@@ -0,0 +1,136 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Iterable, Optional
+from urllib.parse import urldefrag, urlsplit, urlunsplit
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from framework.libs import clean
+from framework.libs.keywords_getter import KeywordsGetter
+from framework.libs.stop_words import cached_stopwords
+
+logger = logging.getLogger("framework.link_targets")
+
+LINK_TARGET_THREADS = int(os.environ.get("LINK_TARGET_THREADS", 8))
+LINK_TARGET_CACHE_SIZE = int(os.environ.get("LINK_TARGET_CACHE_SIZE", 512))
+# (connect, read) timeouts in seconds
+LINK_TARGET_TIMEOUT = (5, 15)
+FETCHED_SCHEMES = {"http", "https"}
+
+
+def normalize_url(url: str) -> str:
+    """Fragments never reach the server, and the scheme and host are case insensitive"""
+    url, _ = urldefrag(url.strip())
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", parts.query, ""))
+
+
+class LinkTarget:
+    """Parsed page a link refers to, the keywords are extracted on first use"""
+
+    def __init__(self, url: str, html: str):
+        self.url = url
+        self.html = html
+        self.title, self.text = self.__parse(html)
+        self._keywords = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def __parse(html: str) -> (str, str):
+        soup = BeautifulSoup(html, "html.parser")
+        text = soup.html.get_text() if soup.html is not None else soup.get_text()
+        for title in soup.find_all("title"):
+            if "head" in [parent.name for parent in title.find_parents()] and title.get_text():
+                return title.get_text(), text
+        return "", text
+
+    @property
+    def title_words(self) -> set:
+        return set(filter(
+            lambda word: len(word) > 2 and word not in cached_stopwords.get(),
+            clean.clean_html(self.title, True, True, True).split()
+        ))
+
+    @property
+    def keywords(self) -> list:
+        """Scored gensim keywords of the page text"""
+        with self._lock:
+            if self._keywords is None:
+                self._keywords = KeywordsGetter(
+                    clean.clean_html(self.text, False, False, False)
+                ).get_keywords_using_gensim(need_scores=True)
+            return list(self._keywords)
+
+
+class LinkTargetService:
+    """
+    Fetches the pages links refer to for all link tests of a job.
+
+    Requests go through one pooled session with timeouts, at most `max_workers` at a time,
+    and respect the job's `RequestLimiter`. Parsed pages are kept in an LRU cache keyed by the
+    normalized URL, a URL that is being fetched is not requested again.
+    Failed fetches are cached as None, the caller falls back to the browser.
+    """
+
+    def __init__(self, limiter, max_workers: int = LINK_TARGET_THREADS, cache_size: int = LINK_TARGET_CACHE_SIZE,
+                 timeout=LINK_TARGET_TIMEOUT):
+        self.limiter = limiter
+        self.cache_size = cache_size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="LinkTarget")
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def prefetch(self, urls: Iterable[str]) -> None:
+        """Starts fetching the pages in the background"""
+        for url in urls:
+            self._submit(url)
+
+    def get(self, url: Optional[str]) -> Optional[LinkTarget]:
+        if not url:
+            return None
+        return self._submit(url).result()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self._session.close()
+        with self._lock:
+            self._cache.clear()
+
+    def _submit(self, url: str) -> Future:
+        key = normalize_url(url)
+        with self._lock:
+            future = self._cache.get(key)
+            if future is not None:
+                self._cache.move_to_end(key)
+                return future
+
+            future = self._executor.submit(self._fetch, key)
+            self._cache[key] = future
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return future
+
+    def _fetch(self, url: str) -> Optional[LinkTarget]:
+        if urlsplit(url).scheme not in FETCHED_SCHEMES:
+            return None
+
+        self.limiter.delay_access(url=url)
+        try:
+            response = self._session.get(url, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            logger.debug(f"Failed to fetch link target {url}: {e}")
+            return None
+
+        if response.status_code != 200:
+            return None
+        return LinkTarget(url, response.text)
@@ -6,6 +6,7 @@ import logging
 import tempfile
 import uuid
 
+from framework import await_page_load
 from framework import request_limiter
 from framework import activity
 from framework.parallelization import run_tests_in_parallel
@@ -142,9 +143,8 @@ def run_tests(
     else:
         logger.info("Cache restart OK")
 
-    logger.info("Killing old firefox processes")
-    os.system("pkill -9 firefox")
-    os.system("pkill -9 geckodriver")
+    logger.info("Killing orphaned firefox processes")
+    webdriver_manager.kill_orphaned_browsers()
 
     logger.info("Creating WebdriverManager")
     manager = webdriver_manager.WebdriverManager(
@@ -152,6 +152,33 @@ def run_tests(
         enable_caching="enable_caching" not in project_info or project_info["enable_caching"],
         enable_tracker_blocking=project_info["enable_content_blocking"]
     )
+    no_parallel_login = 'no_parallel_login' in project_info and project_info['no_parallel_login']
+    if os.environ.get("RUNNER_MODE", "thread") != "process":
+        # Browsers start in the background while activities are loaded
+        manager.prewarm(1 if no_parallel_login else int(os.environ.get("THREAD_COUNT", 4)))
+
+    try:
+        return _run_tests_with_manager(
+            project_info, tests, manager, time_start, run_axe_tests, progress_report_callback, testing, do_test_merge,
+            cancelled_tests,
+        )
+    finally:
+        manager.close_all()
+        logger.info(f"Request limiter metrics: {manager.limiter.metrics()}")
+        logger.info(f"Page load wait timings: {await_page_load.load_wait_timings.summary()}")
+
+
+def _run_tests_with_manager(
+        project_info,
+        tests: dict,
+        manager: webdriver_manager.WebdriverManager,
+        time_start: float,
+        run_axe_tests=None,
+        progress_report_callback=None,
+        testing: bool = False,
+        do_test_merge=True,
+        cancelled_tests=None,
+):
 
     if not testing:
         logger.info(">Preparing to load activities")
@@ -293,7 +320,8 @@ def run_tests(
         run_axe_tests=run_axe_tests,
         testing=testing,
         do_test_merge=do_test_merge,
-        cancelled_tests=cancelled_tests
+        cancelled_tests=cancelled_tests,
+        use_processes=os.environ.get("RUNNER_MODE", "thread") == "process",
     )
     if do_test_merge:
         tests_values_fixed_order = list(tests.values())
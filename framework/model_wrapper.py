@@ -1,18 +1,75 @@
 import spacy
-from threading import Lock
+import threading
 import billiard
 import multiprocessing
+import numpy as np
 from gensim.models.keyedvectors import KeyedVectors
+from spacy._ml import link_vectors_to_models
 import traceback
 import logging
 import os
+import shutil
 import time
+from pathlib import Path
 from queue import Empty
+from typing import Callable, List, Optional
 
 logger = logging.getLogger("framework.model_wrapper")
 
 model_processes = []
 
+# Calls from different runner threads arriving within the window are sent to the model process together
+BATCH_WINDOW = float(os.environ.get("MODEL_BATCH_WINDOW", 0.005))
+MAX_BATCH_SIZE = int(os.environ.get("MODEL_MAX_BATCH_SIZE", 64))
+# Additional replicas are only started while this much memory stays available for browsers
+MODEL_REPLICAS = int(os.environ.get("MODEL_REPLICAS", 1))
+MODEL_MEMORY_RESERVE_MB = int(os.environ.get("MODEL_MEMORY_RESERVE_MB", 2048))
+RESULT_POLL_TIMEOUT = 10
+# Models converted to formats that are memory-mapped instead of parsed, shared by all model processes of the host
+MODEL_CACHE_DIR = Path(os.environ.get("MODEL_CACHE_DIR", "/models/cache"))
+SPACY_EN_LG_PATH = "/models/spacy/en_core_web_lg/en_core_web_lg/en_core_web_lg-2.2.0"
+WORD2VEC_GOOGLENEWS_PATH = "/models/GoogleNews.bin"
+
+
+def batched(batch_func: Callable) -> Callable:
+    """
+    Gives a model function `func(model, *args, **kwargs)` a batch implementation
+    `batch_func(model, calls)`, where `calls` is a list of (args, kwargs) and one result per call is returned.
+    Calls to such functions that arrive in the same batch are processed together, e.g. with `nlp.pipe`.
+    """
+    def decorator(func):
+        func.batch_implementation = batch_func
+        return func
+    return decorator
+
+
+def _run_batch(model, batch: list) -> list:
+    results = [None] * len(batch)
+    batch_groups = {}
+    for call_id, (func_in, args, kwargs) in enumerate(batch):
+        if hasattr(func_in, "batch_implementation"):
+            batch_groups.setdefault(func_in, []).append(call_id)
+            continue
+        results[call_id] = _run_single(model, func_in, args, kwargs)
+
+    for func_in, call_ids in batch_groups.items():
+        try:
+            data_out = func_in.batch_implementation(model, [batch[call_id][1:] for call_id in call_ids])
+            for call_id, result in zip(call_ids, data_out):
+                results[call_id] = (None, result)
+        except Exception:
+            # Calls are repeated one by one, so only the failing calls get the exception
+            for call_id in call_ids:
+                results[call_id] = _run_single(model, *batch[call_id])
+    return results
+
+
+def _run_single(model, func_in, args, kwargs):
+    try:
+        return None, func_in(model, *args, **kwargs)
+    except Exception as e:
+        return e, traceback.format_exc()
+
 
 def run_model(model_loader, input_queue: multiprocessing.Queue, output_queue: multiprocessing.Queue):
     logger.info("Loading the model...")
@@ -29,13 +86,14 @@ def run_model(model_loader, input_queue: multiprocessing.Queue, output_queue: mu
     while os.getppid() != 1:
         try:
             # Timeout to re-check parent process status
-            func_in, args, kwargs = input_queue.get(timeout=10)
-            data_out = func_in(model, *args, **kwargs)
-            output_queue.put((None, data_out))
+            batch = input_queue.get(timeout=10)
         except Empty:
-            pass
+            continue
+        try:
+            output_queue.put(_run_batch(model, batch))
         except Exception as e:
-            output_queue.put((e, traceback.format_exc()))
+            # Results that can not be pickled
+            output_queue.put([(e, traceback.format_exc())] * len(batch))
 
 
 def model_unload_watcher(model_process):
@@ -46,11 +104,35 @@ def model_unload_watcher(model_process):
     logger.info("Model process terminating - parent terminated")
 
 
-class LockWrapper:
-    def __init__(self, model_loader):
-        self.lock = Lock()
-        # cx = multiprocessing.get_context("fork")
+def _process_memory_mb(pid: int) -> float:
+    """Resident memory not backed by files, memory-mapped models are shared between the replicas"""
+    with open(f"/proc/{pid}/statm") as statm_file:
+        _, resident_pages, shared_pages = map(int, statm_file.read().split()[:3])
+    return (resident_pages - shared_pages) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
 
+def _available_memory_mb() -> float:
+    with open("/proc/meminfo") as meminfo_file:
+        for line in meminfo_file:
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) / 1024
+    return 0
+
+
+class _ModelCall:
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.done = threading.Event()
+        self.error: Optional[Exception] = None
+        self.result = None
+
+
+class _ModelReplica:
+    """A model process, batches of calls are sent to it one at a time"""
+
+    def __init__(self, model_loader):
         self.input_queue = multiprocessing.Queue()
         self.output_queue = multiprocessing.Queue()
         self.process = billiard.context.Process(target=run_model, args=(model_loader, self.input_queue, self.output_queue))
@@ -65,34 +147,173 @@ class LockWrapper:
             logger.info("Model loaded ok, finishing task")
         else:
             logger.error("Exception while loading model!")
+            self.model_unload_watcher.terminate()
             raise process_result[0]
 
+    def run_batch(self, batch: list) -> list:
+        self.input_queue.put(batch)
+        while True:
+            try:
+                return self.output_queue.get(timeout=RESULT_POLL_TIMEOUT)
+            except Empty:
+                if not self.process.is_alive():
+                    raise ValueError("Model process died while processing a batch")
+
+    def memory_mb(self) -> float:
+        return _process_memory_mb(self.process.pid)
+
+    def unload(self):
+        self.process.terminate()
+        self.model_unload_watcher.terminate()
+
+
+class ModelServer:
+    """
+    Serves a model loaded in one or several replica processes.
+
+    Every replica is fed by a dispatcher thread, which collects the calls made by runner threads
+    within `batch_window` into a single batch, so concurrent calls don't wait for each other one by one.
+    """
+
+    def __init__(self, model_loader, replicas: int = MODEL_REPLICAS, batch_window: float = BATCH_WINDOW,
+                 max_batch_size: int = MAX_BATCH_SIZE):
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.pending_calls: List[_ModelCall] = []
+        self.call_available = threading.Condition()
+        self.unloaded = False
+        self.replicas = [_ModelReplica(model_loader)]
+        self.__start_dispatcher(self.replicas[0])
+
+        replica_memory = self.replicas[0].memory_mb()
+        while len(self.replicas) < replicas:
+            if _available_memory_mb() - replica_memory < MODEL_MEMORY_RESERVE_MB:
+                logger.info(f"Not enough memory for another {replica_memory:.0f}MB model replica, "
+                            f"serving with {len(self.replicas)}")
+                break
+            replica = _ModelReplica(model_loader)
+            self.replicas.append(replica)
+            self.__start_dispatcher(replica)
+
     def run(self, func, *args, **kwargs):
-        if not self.process.is_alive():
+        return self.run_many(func, [args], kwargs)[0]
+
+    def run_many(self, func, args_list: List[tuple], kwargs: Optional[dict] = None) -> list:
+        """Calls `func(model, *args, **kwargs)` for every args tuple, the calls are batched together"""
+        if self.unloaded or not any(replica.process.is_alive() for replica in self.replicas):
             raise ValueError("Model process is dead, was the model accessed after unloading?")
-        self.lock.acquire()
-        try:
-            self.input_queue.put((func, args, kwargs))
-            result = self.output_queue.get()
-            if result[0] is not None:
-                print(result[1])
-                raise result[0]
-        finally:
-            self.lock.release()
-        return result[1]
+        calls = [_ModelCall(func, tuple(args), kwargs or {}) for args in args_list]
+        with self.call_available:
+            self.pending_calls.extend(calls)
+            self.call_available.notify_all()
+
+        for call in calls:
+            call.done.wait()
+            if call.error is not None:
+                print(call.result)
+                raise call.error
+        return [call.result for call in calls]
 
     def unload(self):
         logger.info("Unloading model")
-        self.process.terminate()
-        self.model_unload_watcher.terminate()
+        with self.call_available:
+            self.unloaded = True
+            self.call_available.notify_all()
+        for replica in self.replicas:
+            replica.unload()
+
+    def __start_dispatcher(self, replica: _ModelReplica) -> None:
+        threading.Thread(
+            target=self.__dispatch, args=(replica,), name="Model Dispatcher Thread", daemon=True
+        ).start()
+
+    def __take_batch(self) -> Optional[List[_ModelCall]]:
+        with self.call_available:
+            while not self.pending_calls and not self.unloaded:
+                self.call_available.wait()
+            if self.unloaded:
+                return None
+            # Give other runner threads a moment to add their calls to the batch
+            deadline = time.time() + self.batch_window
+            while len(self.pending_calls) < self.max_batch_size and time.time() < deadline:
+                self.call_available.wait(timeout=deadline - time.time())
+            batch = self.pending_calls[:self.max_batch_size]
+            del self.pending_calls[:self.max_batch_size]
+            return batch
+
+    def __dispatch(self, replica: _ModelReplica) -> None:
+        while True:
+            batch = self.__take_batch()
+            if batch is None:
+                break
+            try:
+                results = replica.run_batch([(call.func, call.args, call.kwargs) for call in batch])
+            except Exception as e:
+                results = [(e, traceback.format_exc())] * len(batch)
+            for call, (error, result) in zip(batch, results):
+                call.error, call.result = error, result
+                call.done.set()
+            if not replica.process.is_alive():
+                break
+
+        # Nobody is left to serve the waiting calls
+        with self.call_available:
+            if self.unloaded or not any(replica.process.is_alive() for replica in self.replicas):
+                calls, self.pending_calls = self.pending_calls, []
+            else:
+                calls = []
+        for call in calls:
+            call.error = ValueError("Model process is dead, was the model accessed after unloading?")
+            call.done.set()
+
+
+def _publish_cache(model_name: str, write_cache: Callable[[Path], None]) -> None:
+    """Writes a cache entry to a temporary directory and renames it, so a half-written entry is never loaded"""
+    temp_dir = MODEL_CACHE_DIR / f"{model_name}.tmp{os.getpid()}"
+    try:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        temp_dir.mkdir(parents=True)
+        write_cache(temp_dir)
+        os.rename(temp_dir, MODEL_CACHE_DIR / model_name)
+        logger.info(f"Stored {model_name} in the model cache")
+    except Exception as e:
+        # Caching is best-effort: read-only volume, full disk or another worker published the entry first
+        logger.warning(f"Could not store {model_name} in the model cache: {e}")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def _store_spacy_pipeline(nlp, cache_dir: Path) -> None:
+    nlp.to_disk(cache_dir / "pipeline")
+    np.save(str(cache_dir / "vectors.npy"), nlp.vocab.vectors.data)
+    # Vectors are memory-mapped from vectors.npy, the pipeline is loaded without them
+    (cache_dir / "pipeline" / "vocab" / "vectors").unlink()
 
 
 def load_spacy_en_lg():
-    return spacy.load("/models/spacy/en_core_web_lg/en_core_web_lg/en_core_web_lg-2.2.0")
+    cache_dir = MODEL_CACHE_DIR / "spacy_en_lg"
+    if cache_dir.exists():
+        try:
+            nlp = spacy.load(str(cache_dir / "pipeline"))
+            nlp.vocab.vectors.data = np.load(str(cache_dir / "vectors.npy"), mmap_mode="r")
+            link_vectors_to_models(nlp.vocab)
+            return nlp
+        except Exception as e:
+            logger.warning(f"Failed to load spacy_en_lg from the model cache, loading the original model: {e}")
+
+    nlp = spacy.load(SPACY_EN_LG_PATH)
+    _publish_cache("spacy_en_lg", lambda temp_dir: _store_spacy_pipeline(nlp, temp_dir))
+    return nlp
 
 
 def load_word2vec_googlenews():
-    return KeyedVectors.load_word2vec_format('/models/GoogleNews.bin', binary=True)
+    cache_path = MODEL_CACHE_DIR / "word2vec_googlenews" / "GoogleNews.kv"
+    if cache_path.exists():
+        return KeyedVectors.load(str(cache_path), mmap="r")
+
+    vectors = KeyedVectors.load_word2vec_format(WORD2VEC_GOOGLENEWS_PATH, binary=True)
+    _publish_cache("word2vec_googlenews", lambda temp_dir: vectors.save(str(temp_dir / cache_path.name)))
+    return vectors
 
 
 MODEL_LOADERS = {
@@ -100,6 +321,25 @@ MODEL_LOADERS = {
     'word2vec_googlenews': load_word2vec_googlenews,
 }
 
+# Approximate resident size of a loaded model, used to plan which models can be loaded at the same time
+MODEL_FOOTPRINTS_MB = {
+    "spacy_en_lg": 1200,
+    "word2vec_googlenews": 3700,
+}
+DEFAULT_MODEL_FOOTPRINT_MB = 2048
+
+
+def model_footprint_mb(model_name: str) -> int:
+    return MODEL_FOOTPRINTS_MB.get(model_name, DEFAULT_MODEL_FOOTPRINT_MB)
+
+
+def memory_budget_mb() -> float:
+    """Memory the models of a job may use together, `MODEL_MEMORY_BUDGET_MB` or what is available now"""
+    budget = os.environ.get("MODEL_MEMORY_BUDGET_MB")
+    if budget is not None:
+        return float(budget)
+    return _available_memory_mb() - MODEL_MEMORY_RESERVE_MB
+
 
 class NoSuchModelError(Exception):
     pass
@@ -111,7 +351,7 @@ def load(model_name):
     if model_name not in MODEL_LOADERS:
         raise NoSuchModelError
     logger.info(f"Will load {model_name}")
-    wrapper = LockWrapper(MODEL_LOADERS[model_name])
+    wrapper = ModelServer(MODEL_LOADERS[model_name])
     model_processes.append(wrapper)
     return wrapper
 
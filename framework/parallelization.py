@@ -1,12 +1,19 @@
 import ctypes
+import heapq
+import itertools
 import logging
+import os
+import pickle
+import signal
 import sys
 import threading
 import time
 import traceback
-from queue import PriorityQueue
-from typing import List, Union, Optional, Tuple, Callable
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, List, Union, Optional, Tuple, Callable
 
+import billiard
 import cv2 as cv
 from PIL.Image import Image
 from selenium import webdriver
@@ -14,13 +21,24 @@ from selenium import webdriver
 from framework import model_wrapper, axe_integration
 from framework.axe_integration import ImportedTest
 from framework.element import Element
-from framework.element_locator import ElementLocator
+from framework.element_locator import ElementLocator, locator_key, locator_cache, dom_fingerprint
+from framework.request_limiter import RemoteRequestLimiter
 from framework.screenshot.screenshot import Screenshot
 from framework.activity import Activity
+from framework.test import Test
 from framework.webdriver_manager import WebdriverManager
 
 logger = logging.getLogger("framework.parallelization")
 
+SCREENSHOT_FIELDS = ("screenshot", "screenshot_width", "screenshot_height")
+RESTART_GROUPING_WINDOW = 10
+# Models take long to load, loading starts before any other task
+MODEL_LOAD_PRIORITY = -20
+MODEL_WAVE_PRIORITY_BOOST = 1000
+# Screenshots of a page are taken as soon as its tests finished, so the tests are reported without waiting for others
+SCREENSHOT_PRIORITY = -1
+SCREENSHOT_ENCODING_THREADS = int(os.environ.get("SCREENSHOT_ENCODING_THREADS", 4))
+
 
 def verify_progress(func):
     def in_progress(progress_report_callback, *args, **kwargs):
@@ -119,6 +137,16 @@ class NoTasksLeftException(Exception):
 
 
 class TestQueue:
+    """
+    Dependency-driven task scheduler.
+
+    Every task keeps a counter of unresolved dependencies, and a task is moved to the ready queue
+    as soon as the counter drops to zero, so runners never rescan the whole queue.
+    Idle runners block on a condition variable and are woken up when a task completes.
+    """
+
+    FAILED_STATUSES = ("ERROR", "NOTRUN", "READY")
+
     def __init__(
             self,
             tasks: List[Tuple[int, 'ParallelTask']],
@@ -127,28 +155,37 @@ class TestQueue:
             activities: List[Activity],
             cancelled_tests, do_interim_results: bool = False
     ):
-        self.task_queue = PriorityQueue()
         self.__verify_dependencies(tasks)
-        for task in tasks:
-            self.task_queue.put(task)
         self.tests = tests
         self.axe_tasks = axe_tasks
         self.tests_values_fixed_order = None
         self.do_interim_results = do_interim_results
         self.activities = activities
+        self.lock = threading.RLock()
+        self.task_available = threading.Condition(self.lock)
         self.completed_tasks: List['ParallelTask'] = []
+        self.completed_task_names: Dict[str, 'ParallelTask'] = {}
         self.running_tasks: List['ParallelTask'] = []
-        self.lock = threading.RLock()
-        self.unsuitable_tasks: List[Tuple[int, 'ParallelTask']] = []
-        self.dependency_failed = False
+        self.waiting_tasks: Dict['ParallelTask', int] = {}
+        # Ready tasks that can run on a reused browser and the ones that need a fresh one
+        self.ready_tasks: List[Tuple[int, 'ParallelTask']] = []
+        self.ready_restart_tasks: List[Tuple[int, 'ParallelTask']] = []
+        self.task_priorities: Dict['ParallelTask', int] = {}
+        self.dependants: Dict[str, List['ParallelTask']] = defaultdict(list)
         self.cancelled_tests = cancelled_tests
         self.finished_tests = {}
         self.screenshotted_tests = []
-
-    @verify_progress
-    def __complete_axe_task(self, progress_report_callback):
-        for axe_test in self.finished_tests["aXe"]:
-            progress_report_callback({"screenshots_for_test": axe_test})
+        # Screenshot tasks left for every test, the test is reported once all of its pages are screenshotted
+        self.pending_screenshots: Dict[str, int] = defaultdict(int)
+
+        for priority, task in tasks:
+            self.task_priorities[task] = priority
+            for test_name in task.screenshot_tests:
+                self.pending_screenshots[test_name] += 1
+            dependency_names = {dependency[0] for dependency in self.__form_task_dependencies(task)}
+            for dependency_name in dependency_names:
+                self.dependants[dependency_name].append(task)
+            self.__schedule(task, len(dependency_names))
 
     @verify_progress
     def __finished_screenshotting_progress(self, progress_report_callback, test_name):
@@ -166,14 +203,18 @@ class TestQueue:
     def __complete_task_progress(self, progress_report_callback):
         progress_report_callback({"tasks_complete": len(self.completed_tasks)})
 
-    def __complete_screenshotted_or_axe(self, task, test_runner):
-        if task.test_name == "aXe":
-            self.__complete_axe_task(test_runner.progress_report_callback)
-        elif self.finished_tests[task.test_name] not in self.screenshotted_tests:
-            self.__finished_screenshotting_progress(test_runner.progress_report_callback, task.test_name)
+    def __complete_screenshot_task(self, task: 'ParallelTask', test_runner: 'TestRunner'):
+        for test_name in task.screenshot_tests:
+            self.pending_screenshots[test_name] -= 1
+            if self.pending_screenshots[test_name] > 0 or test_name not in self.finished_tests:
+                continue
+            if self.finished_tests[test_name] not in self.screenshotted_tests:
+                self.__finished_screenshotting_progress(test_runner.progress_report_callback, test_name)
 
     def __get_unfinished_test_tasks(self, task: 'ParallelTask'):
-        tasks_in_queue = [x[1] for x in self.task_queue.queue]
+        tasks_in_queue = list(self.waiting_tasks) + [
+            ready_task[1] for ready_task in itertools.chain(self.ready_tasks, self.ready_restart_tasks)
+        ]
 
         return [
             t
@@ -245,30 +286,29 @@ class TestQueue:
                 else:
                     print(f"Submitting interim results for {task.test_name}")
                     self.__complete_test_task(task, runner)
-            elif task.name.startswith("screenshot"):
-                self.__complete_screenshotted_or_axe(task, runner)
+            elif task.screenshot_tests:
+                self.__complete_screenshot_task(task, runner)
 
             self.completed_tasks.append(task)
+            self.__resolve_dependants(task)
             self.__complete_task_progress(runner.progress_report_callback)
+            self.task_available.notify_all()
 
-    def __get_next_in_queue(self) -> Optional['ParallelTask']:
-        if self.task_queue.empty():
-            return None
-
-        task = self.task_queue.get()
-        self.unsuitable_tasks.append(task)
-        return task[1]
+    def __schedule(self, task: 'ParallelTask', unresolved_dependencies: int) -> None:
+        if unresolved_dependencies == 0:
+            ready_heap = self.ready_restart_tasks if task.webdriver_restart_required else self.ready_tasks
+            heapq.heappush(ready_heap, (self.task_priorities[task], task))
+        else:
+            self.waiting_tasks[task] = unresolved_dependencies
 
-    def _accept_last_task(self) -> None:
-        accepted_task = self.unsuitable_tasks.pop(-1)
-        logger.info(f"Accepted task {accepted_task[1].name} with priority {accepted_task[0]}")
-        self.running_tasks.append(accepted_task[1])
-        self._restore_unsuitable_tasks()
+    def __resolve_dependants(self, task: 'ParallelTask') -> None:
+        # Dependencies are matched by name, the first completed task with the name satisfies them
+        if task.name in self.completed_task_names:
+            return
+        self.completed_task_names[task.name] = task
 
-    def _restore_unsuitable_tasks(self) -> None:
-        for task in self.unsuitable_tasks:
-            self.task_queue.put(task)
-        self.unsuitable_tasks.clear()
+        for dependant in self.dependants.pop(task.name, []):
+            self.__schedule(dependant, self.waiting_tasks.pop(dependant) - 1)
 
     @staticmethod
     def __verify_dependencies(task_list: List[Tuple[int, 'ParallelTask']]) -> None:
@@ -281,32 +321,24 @@ class TestQueue:
                 if dep not in task_names:
                     raise ValueError(f"DEPENDENCY ERROR: Task {task[1].name} has an unmet dependency {dep}")
 
-    def __secure_counts(self, counter: int, max_tries: int = 10000) -> None:
-        if counter <= max_tries:
+    def __verify_progress_possible(self) -> None:
+        if self.running_tasks:
             return
 
-        logger.fatal("pop_task is in an endless loop!")
-        while not self.task_queue.empty():
-            task = self.task_queue.get()[1]
-            logger.fatal(f"{task.name} - {task.depends} ")
+        logger.fatal("pop_task is in a dependency cycle!")
+        for task, unresolved_dependencies in self.waiting_tasks.items():
+            logger.fatal(f"{task.name} - {task.depends} ({unresolved_dependencies} unresolved)")
 
-        raise ValueError("pop_task is in an endless loop!")
-
-    def __put_dep_unsuitable_tasks(self, test_runner: 'TestRunner') -> None:
-        if len(self.unsuitable_tasks) == 0:
-            _thread_idle_progress(test_runner.progress_report_callback, test_runner.thread_id)
-            raise NoTasksLeftException
-        else:
-            _dependencies_waiting_progress(test_runner.progress_report_callback, test_runner.thread_id)
-            self._restore_unsuitable_tasks()
+        raise ValueError("pop_task is in a dependency cycle!")
 
     def __skip_cancelled_task(self, task: 'ParallelTask', test_runner: 'TestRunner'):
         task.status = "NOTRUN"
         sys.stdout.force_write(f"====>Skipping task {task.name}, {task.test_name} is cancelled\n")
-        self._accept_last_task()
+        self.running_tasks.append(task)
         self.complete_task(task, test_runner)
 
-    def __form_task_dependencies(self, task: 'ParallelTask'):
+    @staticmethod
+    def __form_task_dependencies(task: 'ParallelTask'):
         res = []
         for dep in task.depends:
             if type(dep) is tuple:
@@ -315,70 +347,68 @@ class TestQueue:
                 res.append((dep, dep))
         return res
 
-    def __complete_of_failed_dependency(self, task: 'ParallelTask', test_runner: 'TestRunner', dependency,
-                                        dependencies: dict) -> bool:
-        for other_task in self.completed_tasks:
-            if dependency[0] == other_task.name:
-                if other_task.status in ["ERROR", "NOTRUN", "READY"] and task.fail(dependency[0]):
-                    task.status = "NOTRUN"
-                    sys.stdout.force_write(f"====>Dependency failed {dependency[0]}\n")
-
-                    self._accept_last_task()
-                    self.complete_task(task, test_runner)
-                    self.dependency_failed = True
-                else:
-                    dependencies[dependency[1]] = other_task.result
-
-                return True
-
-        return False
-
-    def __process_task_dependencies(self, task: 'ParallelTask', test_runner: 'TestRunner', dependencies: dict
-                                    ) -> Tuple[bool, 'ParallelTask', dict]:
-        # sys.stdout.force_write(f"===>Checking dependencies for test {task.name}\n")
-        depends = self.__form_task_dependencies(task)
-
-        for dependency in depends:
-            self.dependency_failed = False
-            completed = self.__complete_of_failed_dependency(task, test_runner, dependency, dependencies)
-
-            if not completed:
-                # sys.stdout.force_write(f"====>Dependency not completed yet {dependency}\n")
-                break
-            if self.dependency_failed:
-                break
+    def __collect_dependencies(self, task: 'ParallelTask', test_runner: 'TestRunner') -> Optional[dict]:
+        dependencies = {}
+
+        for dependency in self.__form_task_dependencies(task):
+            other_task = self.completed_task_names[dependency[0]]
+            if other_task.status in self.FAILED_STATUSES and task.fail(dependency[0]):
+                task.status = "NOTRUN"
+                sys.stdout.force_write(f"====>Dependency failed {dependency[0]}\n")
+                self.running_tasks.append(task)
+                self.complete_task(task, test_runner)
+                return None
+            dependencies[dependency[1]] = other_task.result
+
+        return dependencies
+
+    def __select_ready_heap(self, runner: 'TestRunner') -> List[Tuple[int, 'ParallelTask']]:
+        """
+        Picks between tasks that need a fresh browser and tasks that can reuse one.
+        Within RESTART_GROUPING_WINDOW priorities, restart tasks are taken while the pool has fresh browsers
+        and the rest is run on reused browsers otherwise, so that fewer browsers have to be started.
+        """
+        if not self.ready_restart_tasks:
+            return self.ready_tasks
+        if not self.ready_tasks:
+            return self.ready_restart_tasks
+
+        reuse_priority = self.ready_tasks[0][0]
+        restart_priority = self.ready_restart_tasks[0][0]
+        webdriver_manager = runner.webdriver_manager
+        if webdriver_manager is not None and webdriver_manager.has_fresh_instance():
+            prefer_restart = restart_priority <= reuse_priority + RESTART_GROUPING_WINDOW
         else:
-            self._accept_last_task()
-
-            return False, task, dependencies
-
-        return True, task, dependencies
-
-    def pop_task(self, runner: 'TestRunner'):
+            prefer_restart = restart_priority + RESTART_GROUPING_WINDOW < reuse_priority
+        return self.ready_restart_tasks if prefer_restart else self.ready_tasks
+
+    def __wait_for_ready_task(self, runner: 'TestRunner') -> None:
+        while not self.ready_tasks and not self.ready_restart_tasks:
+            if not self.waiting_tasks:
+                _thread_idle_progress(runner.progress_report_callback, runner.thread_id)
+                raise NoTasksLeftException
+            self.__verify_progress_possible()
+            _dependencies_waiting_progress(runner.progress_report_callback, runner.thread_id)
+            self.task_available.wait()
+
+    def pop_task(self, runner: 'TestRunner') -> Tuple['ParallelTask', dict]:
+        """Blocks until a task with resolved dependencies is available, raises NoTasksLeftException when done"""
         with self.lock:
-            counter = 0
-
             while True:
-                counter += 1
-                self.__secure_counts(counter)
+                self.__wait_for_ready_task(runner)
+                priority, task = heapq.heappop(self.__select_ready_heap(runner))
 
-                task = self.__get_next_in_queue()
-                if task is None:
-                    self.__put_dep_unsuitable_tasks(runner)
-                    return None
                 if task.test_name in self.cancelled_tests:
                     self.__skip_cancelled_task(task, runner)
-                    break
+                    continue
 
-                dependencies = {}
-                if len(task.depends):
-                    broken_cycle, task, dependencies = self.__process_task_dependencies(task, runner, dependencies)
-                    if not broken_cycle:
-                        return task, dependencies
-                else:
-                    # sys.stdout.force_write(f"No dependencies for test {task.name}\n")
-                    self._accept_last_task()
-                    return task, dependencies
+                dependencies = self.__collect_dependencies(task, runner)
+                if dependencies is None:
+                    continue
+
+                logger.info(f"Accepted task {task.name} with priority {priority}")
+                self.running_tasks.append(task)
+                return task, dependencies
 
 
 class TestRunner:
@@ -390,6 +420,8 @@ class TestRunner:
         self.thread_id = thread_id
         self.progress_report_callback = progress_report_callback
         self.webdriver_manager = webdriver_manager
+        # Kept between tasks
+        self.driver = None
         self.current_test = None
 
     def force_interrupt(self) -> None:
@@ -427,6 +459,8 @@ class ParallelTask:
             depends: Optional[List[Union[Tuple[str, str], str]]] = None,
             webdriver_restart_required=True,
             test_name=None,
+            requires_webdriver=True,
+            screenshot_tests: Optional[List[str]] = None,
     ):
         self.depends = [] if depends is None else depends
         self.status = "READY"
@@ -436,6 +470,10 @@ class ParallelTask:
         self.result = None
         self.on_dependency_fail = on_dependency_fail
         self.webdriver_restart_required = webdriver_restart_required
+        # Tasks without a webdriver (model loading) always run in the coordinating process
+        self.requires_webdriver = requires_webdriver
+        # Names of the tests a screenshot task takes screenshots for
+        self.screenshot_tests = [] if screenshot_tests is None else screenshot_tests
 
     def run(self, webdriver_instance: webdriver.Firefox, dependencies):
         self.status = "RUNNING"
@@ -474,6 +512,27 @@ def _monitor_cancelled_tests(test_runner: TestRunner, monitor_condition=True):
         time.sleep(2)
 
 
+def _start_cancellation_monitor(test_runner: TestRunner) -> None:
+    threading.Thread(
+        target=_monitor_cancelled_tests, args=(test_runner,), name="Test Cancellation Thread", daemon=True
+    ).start()
+
+
+def _task_webdriver(
+        webdriver_manager: WebdriverManager, driver: Optional[webdriver.Firefox], task: 'ParallelTask'
+) -> webdriver.Firefox:
+    """
+    The driver a runner keeps between tasks, so logins and caches survive.
+    A task that requires a restart gets a fresh driver instead of one that already ran tasks.
+    """
+    if driver is not None and task.webdriver_restart_required and not webdriver_manager.is_fresh(driver):
+        webdriver_manager.release(driver)
+        driver = None
+    if driver is None:
+        driver = webdriver_manager.request(fresh=task.webdriver_restart_required)
+    return driver
+
+
 def _current_test_run_task(test_runner: TestRunner, driver: webdriver.Firefox, task: ParallelTask, dependencies):
     test_runner.status = f"RUNNING {task.name}"
     _running_progress(test_runner.progress_report_callback, test_runner.thread_id, task)
@@ -490,22 +549,17 @@ def _current_test_run_task(test_runner: TestRunner, driver: webdriver.Firefox, t
     sys.stdout.reset_log(threading.current_thread())
 
 
-def _handle_queued_task(test_runner: TestRunner, driver: webdriver.Firefox, idle=False):
+def _handle_queued_task(test_runner: TestRunner):
     try:
         task_info = test_runner.test_queue.pop_task(test_runner)
     except NoTasksLeftException:
         return 1
 
-    if task_info is None:
-        if not idle:
-            logger.info(f"==>Thread {test_runner.thread_id} idling")
-
-        time.sleep(3)
-        return
-
     task, dependencies = task_info
-
+    driver = None
     try:
+        if task.requires_webdriver:
+            driver = test_runner.driver = _task_webdriver(test_runner.webdriver_manager, test_runner.driver, task)
         _current_test_run_task(test_runner, driver, *task_info)
     except Exception as e:
         task.status = "ERROR"
@@ -514,37 +568,335 @@ def _handle_queued_task(test_runner: TestRunner, driver: webdriver.Firefox, idle
             f"\n{traceback.format_exc()}\nLOGS:"
             f"\n{sys.stdout.get_log(threading.current_thread())}"
         )
+    finally:
+        test_runner.current_test = None
+        _cancelled_progress(test_runner.progress_report_callback, test_runner.thread_id)
 
-    test_runner.current_test = None
-    _cancelled_progress(test_runner.progress_report_callback, test_runner.thread_id)
-
-    test_runner.test_queue.complete_task(task, test_runner)
+        # * Dependants and other runners wait for the task, it is completed even when no browser could be started
+        test_runner.test_queue.complete_task(task, test_runner)
+        # Health check and recycling happen after dependants were unblocked
+        if driver is not None and not test_runner.webdriver_manager.task_done(driver):
+            test_runner.driver = None
 
 
 def _threaded_method(test_runner: TestRunner) -> None:
-    should_monitor_cancelled_tests = True
-    test_cancellation_thread = threading.Thread(
-        target=_monitor_cancelled_tests,
-        args=(test_runner, should_monitor_cancelled_tests),
-        name="Test Cancellation Thread",
-    )
-    test_cancellation_thread.start()
+    _start_cancellation_monitor(test_runner)
 
     _start_webdriver_progress(test_runner.progress_report_callback, test_runner.thread_id)
-    webdriver_instance = test_runner.webdriver_manager.request()
 
     while True:
-        _ = _handle_queued_task(test_runner, webdriver_instance)
+        _ = _handle_queued_task(test_runner)
         if _ != 1:
             continue
         break
 
-    test_runner.webdriver_manager.release(webdriver_instance)
-
+    if test_runner.driver is not None:
+        test_runner.webdriver_manager.release(test_runner.driver)
+        test_runner.driver = None
     logger.info(f"==>Shutting down cancelled test monitor for {test_runner.thread_id}\n")
     logger.info(f"==>Thread {test_runner.thread_id} terminated\n")
 
 
+class _ModelReference:
+    """Stands in for a loaded model in the dependencies sent to a worker process"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+class _WorkerConnection:
+    def __init__(self, connection):
+        self.connection = connection
+        self.lock = threading.Lock()
+
+    def send(self, message) -> None:
+        with self.lock:
+            self.connection.send(message)
+
+    def request(self, message):
+        with self.lock:
+            self.connection.send(message)
+            return self.connection.recv()
+
+
+class _ModelProxy:
+    """Forwards model calls from a worker process to the model loaded by the coordinating process"""
+
+    def __init__(self, name: str, connection: _WorkerConnection):
+        self.name = name
+        self.connection = connection
+
+    def run(self, func, *args, **kwargs):
+        return self.run_many(func, [args], kwargs)[0]
+
+    def run_many(self, func, args_list, kwargs=None):
+        error, result = self.connection.request(("model", self.name, func, args_list, kwargs))
+        if error is not None:
+            raise error
+        return result
+
+    def unload(self):
+        raise ValueError("Models can only be unloaded by the coordinating process")
+
+
+def _iterate_dependency_tests(dependencies: dict):
+    for dependency in dependencies.values():
+        if isinstance(dependency, list):
+            yield from (test for test in dependency if isinstance(test, Test))
+
+
+def _collect_screenshot_fields(tests) -> dict:
+    fields = {}
+    for test in tests:
+        for problematic_element in test.problematic_elements:
+            if "screenshot" in problematic_element and "uuid" in problematic_element:
+                fields[problematic_element["uuid"]] = {
+                    key: problematic_element[key] for key in SCREENSHOT_FIELDS if key in problematic_element
+                }
+    return fields
+
+
+def _apply_screenshot_fields(tests, fields: dict) -> None:
+    for test in tests:
+        for problematic_element in test.problematic_elements:
+            if problematic_element.get("uuid") in fields:
+                problematic_element.update(fields[problematic_element["uuid"]])
+
+
+def _task_test(task: 'ParallelTask') -> Optional[Test]:
+    run_test_shell = getattr(task.func, "__self__", None)
+    return run_test_shell.test if isinstance(run_test_shell, RunTestShell) else None
+
+
+def _worker_run_task(
+        connection: _WorkerConnection, driver: webdriver.Firefox, tests: dict, task: 'ParallelTask', message
+) -> None:
+    _, _, dependencies, test_states, thread_id = message
+
+    for (activity_name, test_name), run_state in test_states.items():
+        for test in tests.get(activity_name, []):
+            if test.name == test_name:
+                test.set_run_state(run_state)
+
+    for name, dependency in dependencies.items():
+        if isinstance(dependency, _ModelReference):
+            dependencies[name] = _ModelProxy(dependency.name, connection)
+        elif isinstance(dependency, ElementLocator):
+            dependency.webdriver_instance = driver
+    dependencies["progress_report_callback"] = lambda info: connection.send(("progress", info))
+    dependencies["thread_id"] = thread_id
+
+    try:
+        task.run(driver, dependencies)
+    except Exception as e:
+        task.status = "ERROR"
+        logger.error(f"==>Worker {os.getpid()} encountered an ERROR while running {task.name}:{e}"
+                     f"\n{traceback.format_exc()}")
+
+    test = _task_test(task)
+    screenshotted_tests = itertools.chain(itertools.chain.from_iterable(tests.values()),
+                                          _iterate_dependency_tests(dependencies))
+    reply = (
+        "done", task.status, task.result,
+        test.get_run_state() if test is not None else None,
+        _collect_screenshot_fields(screenshotted_tests),
+    )
+    try:
+        connection.send(reply)
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        logger.error(f"==>Result of {task.name} could not be sent to the coordinator: {e}")
+        connection.send(("done", "ERROR", None, None, {}))
+
+
+def _process_worker_main(connection, limiter_connection, task_list: List['ParallelTask'], tests: dict,
+                         webdriver_manager: WebdriverManager) -> None:
+    # Own process group, so that cancelling a task kills geckodriver and firefox with the worker
+    os.setsid()
+    if isinstance(sys.stdout, StdoutManager):
+        sys.stdout = StdoutManager(sys.stdout.original_stdout, debug=True)
+    connection = _WorkerConnection(connection)
+    # Requests are throttled by the limiter of the coordinator, a copy would multiply the request rate per worker
+    webdriver_manager = webdriver_manager.clone(limiter=RemoteRequestLimiter(limiter_connection))
+    webdriver_manager.prewarm(1)
+
+    driver = None
+    try:
+        while True:
+            message = connection.connection.recv()
+            if message is None:
+                break
+            task = task_list[message[1]]
+            driver = _task_webdriver(webdriver_manager, driver, task)
+            _worker_run_task(connection, driver, tests, task, message)
+            if not webdriver_manager.task_done(driver):
+                driver = None
+    finally:
+        webdriver_manager.close_all()
+
+
+class ProcessTestRunner(TestRunner):
+    """
+    Runs every webdriver task in a forked worker process with its own browser.
+
+    The runner thread stays in the coordinating process: it pops tasks from the queue, sends the
+    task id and pickled dependencies to the worker and applies the results it gets back.
+    The requests of the worker are reserved over another pipe by the request limiter of the job.
+    Cancelling a task kills the worker process group, a new worker is forked for the next task.
+    """
+
+    def __init__(
+        self, test_queue: TestQueue, thread_id: int, progress_report_callback, webdriver_manager: WebdriverManager,
+        task_list: List['ParallelTask'],
+    ):
+        super().__init__(test_queue, thread_id, progress_report_callback, webdriver_manager)
+        self.task_list = task_list
+        self.task_ids = {task: task_id for task_id, task in enumerate(task_list)}
+        self.process = None
+        self.connection = None
+
+    def force_interrupt(self) -> None:
+        if self.process is None or not self.process.is_alive():
+            raise ValueError("No worker process to interrupt")
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            # The worker has not become a process group leader yet
+            os.kill(self.process.pid, signal.SIGKILL)
+        print(f"Killed worker process {self.process.pid}")
+
+    def launch(self) -> None:
+        self.thread = threading.Thread(target=_process_coordinator_method, args=(self,))
+        self.thread.start()
+
+    def start_worker(self) -> None:
+        self.connection, worker_connection = billiard.Pipe()
+        limiter_connection, worker_limiter_connection = billiard.Pipe()
+        self.process = billiard.context.Process(
+            target=_process_worker_main,
+            args=(
+                worker_connection, worker_limiter_connection, self.task_list, self.test_queue.tests,
+                self.webdriver_manager,
+            ),
+        )
+        self.process.start()
+        worker_connection.close()
+        worker_limiter_connection.close()
+        # Serves the worker until it exits
+        threading.Thread(
+            target=self.webdriver_manager.limiter.serve, args=(limiter_connection,), name="Request Limiter Thread",
+            daemon=True,
+        ).start()
+
+    def stop_worker(self) -> None:
+        if self.process is None:
+            return
+        if self.process.is_alive():
+            try:
+                self.connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(timeout=60)
+        if self.process.is_alive():
+            self.force_interrupt()
+        self.connection.close()
+        self.process = None
+        self.connection = None
+
+    def run_remote(self, task: 'ParallelTask', dependencies: dict) -> None:
+        models = {}
+        for name, dependency in dependencies.items():
+            if isinstance(dependency, model_wrapper.ModelServer):
+                models[name] = dependency
+                dependencies[name] = _ModelReference(name)
+
+        test_states = {}
+        synced_tests = set(task.screenshot_tests)
+        if task.test_name is not None and _task_test(task) is None:
+            synced_tests.add(task.test_name)
+        for activity_name, activity_tests in self.test_queue.tests.items():
+            for test in activity_tests:
+                if test.name in synced_tests:
+                    test_states[(activity_name, test.name)] = test.get_run_state()
+
+        if self.process is None or not self.process.is_alive():
+            _start_webdriver_progress(self.progress_report_callback, self.thread_id)
+            self.start_worker()
+        self.connection.send(("run", self.task_ids[task], dependencies, test_states, self.thread_id))
+
+        while True:
+            message = self.connection.recv()
+            if message[0] == "progress":
+                if self.progress_report_callback is not None:
+                    self.progress_report_callback(message[1])
+            elif message[0] == "model":
+                _, name, func, args_list, kwargs = message
+                try:
+                    reply = (None, models[name].run_many(func, args_list, kwargs))
+                except Exception as e:
+                    reply = (e, None)
+                try:
+                    self.connection.send(reply)
+                except (pickle.PicklingError, TypeError, AttributeError) as e:
+                    self.connection.send((ValueError(f"Model reply could not be sent to the worker: {e}"), None))
+            else:
+                break
+
+        _, task.status, task.result, run_state, screenshot_fields = message
+        test = _task_test(task)
+        if run_state is not None:
+            test.set_run_state(run_state)
+        _apply_screenshot_fields(itertools.chain.from_iterable(self.test_queue.tests.values()), screenshot_fields)
+        _apply_screenshot_fields(_iterate_dependency_tests(dependencies), screenshot_fields)
+
+
+def _process_run_task(test_runner: ProcessTestRunner, task: ParallelTask, dependencies) -> None:
+    if not task.requires_webdriver:
+        _current_test_run_task(test_runner, None, task, dependencies)
+        return
+
+    test_runner.status = f"RUNNING {task.name}"
+    _running_progress(test_runner.progress_report_callback, test_runner.thread_id, task)
+    test_runner.current_test = task.test_name
+    logger.info(f"==>Thread {test_runner.thread_id} running {task.name} in a worker process\n")
+
+    try:
+        test_runner.run_remote(task, dependencies)
+    except (EOFError, BrokenPipeError, ConnectionResetError):
+        task.status = "ERROR"
+        test = _task_test(task)
+        if test is not None:
+            test.status = "ERROR"
+            test.message = "Worker process killed, test cancelled"
+        test_runner.stop_worker()
+    logger.info(f"==>Thread {test_runner.thread_id} completed {task.name}:{task.status}\n")
+
+
+def _process_coordinator_method(test_runner: ProcessTestRunner) -> None:
+    _start_cancellation_monitor(test_runner)
+
+    while True:
+        try:
+            task, dependencies = test_runner.test_queue.pop_task(test_runner)
+        except NoTasksLeftException:
+            break
+
+        try:
+            _process_run_task(test_runner, task, dependencies)
+        except Exception as e:
+            task.status = "ERROR"
+            logger.error(
+                f"==>Thread {test_runner.thread_id} encountered an ERROR while running {task.name}:{e}"
+                f"\n{traceback.format_exc()}"
+            )
+
+        test_runner.current_test = None
+        _cancelled_progress(test_runner.progress_report_callback, test_runner.thread_id)
+        test_runner.test_queue.complete_task(task, test_runner)
+
+    test_runner.stop_worker()
+    logger.info(f"==>Thread {test_runner.thread_id} terminated\n")
+
+
 class StdoutManager:
     def __init__(self, original_stdout, debug: bool = False):
         self.original_stdout = original_stdout
@@ -595,30 +947,36 @@ class ScreenshotController:
             self.counter += 1
         return count
 
-    def __write_screenshots(self, elements, shots: List[Optional[Image]]) -> None:
+    def __write_screenshots(self, elements, shots: List[Optional[Image]], encoder: ThreadPoolExecutor) -> List[Future]:
+        encoded = []
         for element_number, (element, image) in enumerate(zip(elements, shots)):
             screenshot_id = self.__increment()
             print(f"Saving screenshot {screenshot_id}")
 
             self.__screenshot_saving_progress(self.progress_report_callback, element_number, len(shots))
 
-            screenshot_filename = f"screenshots/img{screenshot_id}.jpg"
-            self.__save_screenshot(screenshot_filename, image, element)
-
-    def __save_screenshot(self, filename: str, image: Optional[Image], problematic_element) -> None:
-        if image is not None:
-            problematic_element["screenshot"] = filename
-            width, height = image.size
-            problematic_element["screenshot_height"] = height
-            problematic_element["screenshot_width"] = width
-
-            self.screenshotted_elements[problematic_element["element"]] = {
-                "screenshot": filename,
-                "screenshot_width": width,
-                "screenshot_height": height,
-            }
+            # Worker processes have their own counters, the pid keeps the file names unique
+            screenshot_filename = f"screenshots/img{os.getpid()}_{screenshot_id}.jpg"
+            if image is not None:
+                self.__save_screenshot(screenshot_filename, image, element)
+                encoded.append(encoder.submit(self.__encode_screenshot, screenshot_filename, image))
+        return encoded
+
+    def __save_screenshot(self, filename: str, image: Image, problematic_element) -> None:
+        problematic_element["screenshot"] = filename
+        width, height = image.size
+        problematic_element["screenshot_height"] = height
+        problematic_element["screenshot_width"] = width
+
+        self.screenshotted_elements[problematic_element["element"]] = {
+            "screenshot": filename,
+            "screenshot_width": width,
+            "screenshot_height": height,
+        }
 
-            image.convert("RGB").save(filename)
+    @staticmethod
+    def __encode_screenshot(filename: str, image: Image) -> None:
+        image.convert("RGB").save(filename)
 
     def __get_screenshot_images(
             self,
@@ -629,20 +987,18 @@ class ScreenshotController:
         return Screenshot(driver, elements_to_screenshot, activity, self.__screenshot_taking_progress).get_images()
 
     @staticmethod
-    def __test_demands_no_screenshots(test, test_filter):
+    def __test_demands_no_screenshots(test, test_names):
         return (
             len(test.problematic_elements) == 0
-            or test_filter != "aXe"
-            and test.name != test_filter
-            or test_filter == "aXe"
-            and test.name.startswith("test_")
+            or test.name not in test_names
+            or test.status in TestQueue.FAILED_STATUSES
         )
 
-    def __get_activity_elements_to_screenshot(self, activity: Activity, tests, test_filter):
+    def __get_activity_elements_to_screenshot(self, activity: Activity, tests, test_names):
         elements_to_screenshot = []
 
         for test in tests[activity.name]:
-            if self.__test_demands_no_screenshots(test, test_filter):
+            if self.__test_demands_no_screenshots(test, test_names):
                 continue
 
             print("Taking screenshots for " + test.name)
@@ -666,40 +1022,42 @@ class ScreenshotController:
 
         return screenshot_candidates
 
-    def get_screenshots_creator(self, tests: dict, activities: List[Activity], test_filter: str):
-        def _do_screenshots(webdriver_instance: webdriver.Firefox, dependencies, tests=tests, activities=activities):
-            with self.lock:
+    def get_screenshots_creator(self, tests: dict, activity: Activity, test_names: List[str]):
+        """
+        Screenshots of all tests of one activity: the page is loaded once and
+        the problematic elements of every test in test_names are captured together.
+        """
+        def _do_screenshots(webdriver_instance: webdriver.Firefox, dependencies, tests=tests, activity=activity):
+            with self.lock, ThreadPoolExecutor(SCREENSHOT_ENCODING_THREADS) as encoder:
                 self.progress_report_callback = dependencies["progress_report_callback"]
                 self.thread_id = dependencies["thread_id"]
 
-                for activity in activities:
-                    self.__screenshot_loading_progress(self.progress_report_callback)
-                    if not test_filter.startswith("test_") and activity.name + "_" + "aXe" in dependencies and dependencies[activity.name + "_aXe"][0] not in tests[activity.name]:
-                        tests[activity.name].extend(dependencies[activity.name + "_" + "aXe"])
-
-                    elements_to_screenshot = self.__get_activity_elements_to_screenshot(
-                        activity, tests, test_filter
+                self.__screenshot_loading_progress(self.progress_report_callback)
+                axe_task_name = activity.name + "_aXe"
+                if axe_task_name in dependencies and dependencies[axe_task_name]:
+                    tests[activity.name].extend(
+                        axe_test for axe_test in dependencies[axe_task_name] if axe_test not in tests[activity.name]
                     )
 
-                    if not elements_to_screenshot:
-                        continue
+                elements_to_screenshot = self.__get_activity_elements_to_screenshot(activity, tests, test_names)
 
-                    print(f"Opening {activity.url}")
-                    activity.get(webdriver_instance)
-                    # * TOOK here too
+                if not elements_to_screenshot:
+                    return "PASS", None
 
-                    webdriver_instance.fullscreen_window()
-                    if activity.page_resolution:
-                        webdriver_instance.set_window_size(*activity.page_resolution)
+                print(f"Opening {activity.url}")
+                activity.get(webdriver_instance)
 
-                    screenshots = self.__get_screenshot_images(
-                        webdriver_instance, activity, elements_to_screenshot
-                    )
+                webdriver_instance.fullscreen_window()
+                if activity.page_resolution:
+                    webdriver_instance.set_window_size(*activity.page_resolution)
+
+                screenshots = self.__get_screenshot_images(webdriver_instance, activity, elements_to_screenshot)
 
-                    assert len(elements_to_screenshot) == len(screenshots), \
-                        "Lost screenshots in _get_screenshot_images"
+                assert len(elements_to_screenshot) == len(screenshots), "Lost screenshots in _get_screenshot_images"
 
-                    self.__write_screenshots(elements_to_screenshot, screenshots)
+                # * Encoding has to finish before the task completes, the completion event uploads the files
+                for future in self.__write_screenshots(elements_to_screenshot, screenshots, encoder):
+                    future.result()
 
                 return "PASS", None
 
@@ -757,6 +1115,8 @@ class FormTestQueueCapsule:
         self.axe_tasks: List[ParallelTask] = []
         self.run_axe_tests = run_axe_tests
         self.new_locator_task_name = ""
+        # Activities that produce the same page state share one locator task
+        self.locator_tasks: Dict[Tuple, str] = {}
         self.screenshot_controller = ScreenshotController()
 
     def form_test_queue(self, testing: bool = False):
@@ -802,35 +1162,36 @@ class FormTestQueueCapsule:
             self.tasks.append((-10, axe_task))
             self.all_tests.append(activity.name + "_" + "aXe")
 
-        if not testing:
-            for axe_test in self.run_axe_tests:
-                self.tasks.append(
-                    (
-                        100000,
-                        ParallelTask(
-                            self.screenshot_controller.get_screenshots_creator(self.tests, self.activities, axe_test),
-                            "screenshots_aXe_"+axe_test,
-                            lambda dependency: False,
-                            [axe_task.name for axe_task in self.axe_tasks],
-                            test_name=axe_test,
-                        ),
-                    )
-                )
-
     def __append_locator_task(self, activity):
+        key = locator_key(activity)
+        if key in self.locator_tasks:
+            self.new_locator_task_name = self.locator_tasks[key]
+            return
+
         def _run_locator(webdriver_instance, dependencies, activity=activity) -> Tuple[str, ElementLocator]:
             # * authorize by get -> open -> auth_by_options
             activity.get(webdriver_instance)
 
             webdriver_instance.maximize_window()
+            fingerprint = dom_fingerprint(webdriver_instance)
+            cache_key = key + (tuple(sorted(self.required_elements)),)
+            element_locator = locator_cache.get(cache_key, fingerprint, webdriver_instance, activity)
+            if element_locator is not None:
+                logger.info(f"Reusing element locator results for {activity.name}")
+                return "PASS", element_locator
+
             element_locator = ElementLocator(webdriver_instance, activity, self.required_elements)
             element_locator.analyze()
+            locator_cache.put(cache_key, fingerprint, element_locator)
 
             return "PASS", element_locator
 
         self.new_locator_task_name = "locator_" + activity.name
+        self.locator_tasks[key] = self.new_locator_task_name
         # ? -5 is for sort only
-        self.tasks.append((-5, ParallelTask(_run_locator, self.new_locator_task_name)))
+        self.tasks.append(
+            (-5, ParallelTask(_run_locator, self.new_locator_task_name, webdriver_restart_required=False))
+        )
 
     def __build_tasks_queue_with_priorities(self, testing: bool) -> None:
         for activity in self.activities:
@@ -839,8 +1200,8 @@ class FormTestQueueCapsule:
 
             for priority, task in enumerate(testing_tasks):
                 self.tasks.append((priority, task[1]))
-                if not testing:
-                    self.__append_screenshot_parallel_for_task(task)
+            if not testing:
+                self.__append_screenshot_task(activity, [task[1] for task in testing_tasks])
 
     def __build_parallel_testing_tasks(self, activity: Activity):
         testing_tasks = []
@@ -872,17 +1233,33 @@ class FormTestQueueCapsule:
 
         return testing_tasks
 
-    def __append_screenshot_parallel_for_task(self, task):
+    def __append_screenshot_task(self, activity: Activity, testing_tasks: List[ParallelTask]):
+        """
+        One screenshot task per activity takes screenshots for all of its tests once they finished,
+        so the page is loaded once instead of once per test.
+        """
+        depends = [task.name for task in testing_tasks]
+        test_names = [task.test_name for task in testing_tasks]
+
+        axe_task_name = activity.name + "_aXe"
+        if any(axe_task.name == axe_task_name for axe_task in self.axe_tasks):
+            depends.append(axe_task_name)
+            test_names.extend(self.run_axe_tests or [])
+
+        if not test_names:
+            return
+
         self.tasks.append(
             (
-                100000,
+                SCREENSHOT_PRIORITY,
                 ParallelTask(
-                    self.screenshot_controller.get_screenshots_creator(
-                        self.tests, self.activities, task[1].test_name
-                    ),
-                    "screenshots_" + task[1].test_name,
-                    depends=[task[1].name],
-                    test_name=task[1].test_name,
+                    self.screenshot_controller.get_screenshots_creator(self.tests, activity, test_names),
+                    "screenshots_" + activity.name,
+                    # * Screenshots of the other tests are still taken when one of them fails
+                    lambda dependency: False,
+                    depends=depends,
+                    webdriver_restart_required=False,
+                    screenshot_tests=test_names,
                 ),
             )
         )
@@ -925,55 +1302,109 @@ def _build_nontest_deps(tests):
     return set(filter(lambda i: not i.startswith("test_"), nontest_deps))
 
 
-def _form_tasks_with_models(tasks: List[Tuple[int, ParallelTask]], nontest_dependencies):
-    prev_model_unload = []
+def _group_models_used_together(tasks: List[Tuple[int, ParallelTask]], model_names) -> List[List[str]]:
+    """Models required by the same task have to be loaded at the same time"""
+    groups = {model_name: {model_name} for model_name in model_names}
+    for _, task in tasks:
+        task_models = [model_name for model_name in model_names if model_name in task.depends]
+        for model_name in task_models[1:]:
+            if groups[model_name] is not groups[task_models[0]]:
+                merged = groups[task_models[0]] | groups[model_name]
+                for merged_model in merged:
+                    groups[merged_model] = merged
+    unique_groups = {id(group): group for group in groups.values()}
+    return [sorted(group) for group in unique_groups.values()]
+
+
+def _plan_model_waves(model_groups: List[List[str]], workload: Dict[str, int], budget_mb: float) -> List[List[str]]:
+    """
+    Splits models into waves that fit into the memory budget together, a wave is loaded once the previous is unloaded.
+    Models with the most dependent tasks are placed first, each into the earliest wave it fits in.
+    """
+    waves: List[List[str]] = []
+    wave_memory: List[int] = []
+    for group in sorted(model_groups, key=lambda models: (-sum(workload[model] for model in models), models)):
+        footprint = sum(model_wrapper.model_footprint_mb(model_name) for model_name in group)
+        for wave_id, used_memory in enumerate(wave_memory):
+            if used_memory + footprint <= budget_mb:
+                waves[wave_id].extend(group)
+                wave_memory[wave_id] += footprint
+                break
+        else:
+            waves.append(list(group))
+            wave_memory.append(footprint)
+    return waves
 
-    for model_name in nontest_dependencies:
 
-        def load_model(webdriver_instance, dependencies, model_name=model_name):
-            return "PASS", model_wrapper.load(model_name=model_name)
+def _form_tasks_with_models(tasks: List[Tuple[int, ParallelTask]], nontest_dependencies,
+                            memory_budget_mb: Optional[float] = None):
+    model_names = sorted(nontest_dependencies)
+    if not model_names:
+        return
+    if memory_budget_mb is None:
+        memory_budget_mb = model_wrapper.memory_budget_mb()
+
+    tasks_needing_model = {
+        model_name: [task[1].name for task in tasks if model_name in task[1].depends] for model_name in model_names
+    }
+    waves = _plan_model_waves(
+        _group_models_used_together(tasks, model_names),
+        {model_name: len(tasks_needing_model[model_name]) for model_name in model_names},
+        memory_budget_mb,
+    )
+    logger.info(f"=>Models are loaded in {len(waves)} waves: {waves}")
+
+    # Tasks of the earlier waves go first, so their models are unloaded and the next wave can start sooner
+    wave_of_model = {model_name: wave_id for wave_id, wave in enumerate(waves) for model_name in wave}
+    for task_id, (priority, task) in enumerate(tasks):
+        task_waves = [wave_of_model[model_name] for model_name in model_names if model_name in task.depends]
+        if task_waves and task_waves[0] < len(waves) - 1:
+            tasks[task_id] = (priority - MODEL_WAVE_PRIORITY_BOOST * (len(waves) - 1 - task_waves[0]), task)
+
+    for wave_id, wave in enumerate(waves):
+        previous_wave_unloads = ["unload_" + model_name for model_name in waves[wave_id - 1]] if wave_id else []
+        for model_name in wave:
 
-        def unload_model(webdriver_instance, dependencies, model_name=model_name):
-            return "PASS", dependencies[model_name].unload()
+            def load_model(webdriver_instance, dependencies, model_name=model_name):
+                return "PASS", model_wrapper.load(model_name=model_name)
 
-        tasks_needing_model = list()
-        for task in tasks:
-            if model_name in task[1].depends:
-                tasks_needing_model.append(task)
+            def unload_model(webdriver_instance, dependencies, model_name=model_name):
+                return "PASS", dependencies[model_name].unload()
 
-        if prev_model_unload:
             tasks.append(
                 (
-                    0,
+                    MODEL_LOAD_PRIORITY,
                     ParallelTask(
-                        load_model, model_name, None, list(prev_model_unload), webdriver_restart_required=False
+                        load_model, model_name, None, list(previous_wave_unloads), webdriver_restart_required=False,
+                        requires_webdriver=False,
                     ),
                 )
             )
-        else:
-            tasks.append((0, ParallelTask(load_model, model_name, webdriver_restart_required=False)))
-
-        tasks.append(
-            (
-                0,
-                ParallelTask(
-                    unload_model,
-                    "unload_" + model_name,
-                    lambda dependency: False,
-                    [task[1].name for task in tasks_needing_model] + [model_name],
-                    webdriver_restart_required=False,
-                ),
+            tasks.append(
+                (
+                    0,
+                    ParallelTask(
+                        unload_model,
+                        "unload_" + model_name,
+                        lambda dependency: False,
+                        tasks_needing_model[model_name] + [model_name],
+                        webdriver_restart_required=False,
+                        requires_webdriver=False,
+                    ),
+                )
             )
-        )
-        prev_model_unload.append("unload_" + model_name)
 
 
 def _launch_threads_test_runners(test_queue: TestQueue, webdriver_manager: WebdriverManager, threads: List[TestRunner],
                                  thread_count: int,
-                                 progress):
+                                 progress,
+                                 task_list: Optional[List[ParallelTask]] = None):
     for thread_id in range(thread_count):
         logger.info(f"==>Launching thread {thread_id}")
-        test_runner = TestRunner(test_queue, thread_id, progress, webdriver_manager)
+        if task_list is None:
+            test_runner = TestRunner(test_queue, thread_id, progress, webdriver_manager)
+        else:
+            test_runner = ProcessTestRunner(test_queue, thread_id, progress, webdriver_manager, task_list)
         threads.append(test_runner)
         test_runner.launch()
 
@@ -988,6 +1419,7 @@ def _run_tests_from_queue(
         report_progress_callback=None,
         do_test_merge=True,
         cancelled_tests=None,
+        use_processes=False,
 ) -> None:
     threads: List[TestRunner] = list()
     if cancelled_tests is None:
@@ -1003,9 +1435,13 @@ def _run_tests_from_queue(
 
     logger.info("=>Setting up the stdout manager")
     sys.stdout = StdoutManager(sys.stdout, debug=thread_count == 1)
-    logger.info(f"=>Launching the {thread_count} threads")
+    # Worker processes are forked with the full task list, tasks are then referred to by index
+    task_list = [task[1] for task in tasks] if use_processes else None
+    logger.info(f"=>Launching the {thread_count} {'processes' if use_processes else 'threads'}")
 
-    _launch_threads_test_runners(test_queue, webdriver_manager, threads, thread_count, report_progress_callback)
+    _launch_threads_test_runners(
+        test_queue, webdriver_manager, threads, thread_count, report_progress_callback, task_list
+    )
 
     for thread in threads:
         thread.thread.join()
@@ -1027,6 +1463,7 @@ def run_tests_in_parallel(
         testing: bool = False,
         do_test_merge=True,
         cancelled_tests=None,
+        use_processes=False,
 ) -> None:
     tasks, axe_tasks = FormTestQueueCapsule(
         tests, activities, required_elements, run_axe_tests=run_axe_tests
@@ -1042,4 +1479,5 @@ def run_tests_in_parallel(
         report_progress_callback,
         do_test_merge=do_test_merge,
         cancelled_tests=cancelled_tests,
+        use_processes=use_processes,
     )
@@ -1,25 +1,120 @@
+import asyncio
 import threading
 import time
+from collections import defaultdict
+from typing import Optional
+from urllib.parse import urlsplit
+
+
+class _TokenBucket:
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated = now
 
 
 class RequestLimiter:
-    def __init__(self, request_interval):
-        self._lock = threading.RLock()
+    """
+    Per-host token bucket shared by the browsers and the HTTP clients of a job.
+
+    Every host gets one request per `request_interval` seconds, with bursts of up to `burst` requests.
+    Requests without a URL share one bucket. A request reserves its tokens under the lock and sleeps after
+    releasing it, so requests to other hosts are not held up and waiting requests are served in order.
+    """
+
+    def __init__(self, request_interval, burst=1):
+        self._lock = threading.Lock()
         self._request_interval = request_interval
+        self._burst = burst
+        self._buckets = dict()
         self.requests = 0
-        self._next_request_time = time.time()
+        self.throttled_requests = 0
+        self.throttled_seconds = defaultdict(float)
+
+    @staticmethod
+    def host(url: Optional[str]) -> str:
+        return (urlsplit(url).hostname or "") if url else ""
+
+    def delay_access(self, register=True, count=1, url=None):
+        """
+        Waits until `count` requests to the host of `url` are allowed.
+        With `register=False` nothing is reserved,
+        `register_request()` is expected once the request is known to be made.
+        """
+        delay = self._reserve(url, count, register)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def delay_access_async(self, register=True, count=1, url=None):
+        delay = self._reserve(url, count, register)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def register_request(self, count=1, url=None):
+        self._reserve(url, count, register=True, record=False)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "throttled_requests": self.throttled_requests,
+                "throttled_seconds": sum(self.throttled_seconds.values()),
+                "throttled_seconds_by_host": dict(self.throttled_seconds),
+            }
+
+    def serve(self, connection) -> None:
+        """Reserves requests for the RemoteRequestLimiter on the other end of `connection` until it is closed"""
+        try:
+            while True:
+                try:
+                    url, count, register, record = connection.recv()
+                except (EOFError, OSError):
+                    return
+                connection.send(self._reserve(url, count, register, record))
+        finally:
+            connection.close()
 
-    def delay_access(self, register=True, count=1):
+    def _reserve(self, url, count, register, record=True) -> float:
+        # 0 means no restrictions
+        if self._request_interval == 0:
+            if register:
+                with self._lock:
+                    self.requests += count
+            return 0
+
+        host = self.host(url)
         with self._lock:
-            # 0 means no restrictions
-            if self._request_interval == 0:
-                return
-            request_delay = time.time() > self._next_request_time
-            if request_delay:
-                time.sleep(request_delay)
+            now = time.monotonic()
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = _TokenBucket(self._burst, now)
+            bucket.tokens = min(self._burst, bucket.tokens + (now - bucket.updated) / self._request_interval)
+            bucket.updated = now
+
+            # * Tokens go negative while requests are waiting, later requests queue up behind them
+            delay = max(0, (count - bucket.tokens) * self._request_interval)
             if register:
-                self.register_request(count)
+                bucket.tokens -= count
+                self.requests += count
+            if record and delay > 0:
+                self.throttled_requests += 1
+                self.throttled_seconds[host] += delay
+            return delay
+
+
+class RemoteRequestLimiter(RequestLimiter):
+    """
+    Limiter of a worker process. Its requests are reserved by the RequestLimiter of the coordinating process
+    over `connection`, so all workers of a job share the host buckets and the metrics.
+    """
+
+    def __init__(self, connection):
+        super().__init__(0)
+        self._connection = connection
+
+    def metrics(self) -> dict:
+        raise ValueError("Request metrics are kept by the coordinating process")
 
-    def register_request(self, count=1):
+    def _reserve(self, url, count, register, record=True) -> float:
         with self._lock:
-            self._next_request_time = max(time.time(), self._next_request_time) + count * self._request_interval
+            self._connection.send((url, count, register, record))
+            return self._connection.recv()
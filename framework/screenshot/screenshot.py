@@ -3,8 +3,9 @@ import traceback
 from io import BytesIO
 from math import floor
 from time import sleep
-from typing import List, Optional, Tuple, Callable
+from typing import List, Optional, Tuple, Callable, Dict
 
+import numpy as np
 from PIL import Image
 from selenium import webdriver
 from selenium.common.exceptions import ElementNotInteractableException, NoSuchElementException
@@ -18,6 +19,21 @@ from framework.libs.element_rect import WebElementRect
 from framework.screenshot.draw import Draw
 
 THRESHOLD_PERCENTAGE = 0.01
+# Share of the viewport left above the first element of a batched capture
+VIEWPORT_HEADROOM = 0.25
+SCROLL_DELAY = 0.5
+
+JS_VIEWPORT_RECTS = """
+return Array.prototype.map.call(arguments[0], function (element) {
+    var style = window.getComputedStyle(element);
+    var rect = element.getBoundingClientRect();
+    return {
+        x: rect.x, y: rect.y, width: rect.width, height: rect.height,
+        displayed: style.display !== "none" && style.visibility === "visible" && rect.width * rect.height > 0
+    };
+}).concat([{scroll_x: window.pageXOffset, scroll_y: window.pageYOffset,
+            width: document.documentElement.clientWidth, height: window.innerHeight}]);
+"""
 
 
 class Screenshot:
@@ -98,49 +114,172 @@ class Screenshot:
 
         return single_image, shown_element
 
-    def _append_single_image_of_element(self, image: Image.Image, element) -> None:
-        if image is None:
-            self.images.append(None)
-            print(f"Element without coordinates or not visible - {element['element'].source[:100]}...")
-        else:
-            self.images.append(image)
-
-    def _prepare_and_try_element_screenshot(self, idx: int, element):
+    def _prepare_and_try_element_screenshot(self, element) -> Optional[Image.Image]:
         self.__reset_scroll_manually()
 
-        if self.progress_callback is not None:
-            self.progress_callback(idx, len(self.elements))
-
         if "interaction_sequence" in element:
             self._apply_interaction_sequence(element)
 
         single_image, shown_element = self._receive_element_displayed(element)
         if not single_image:
-            self.images.append(None)
-            return  # * proceed to next element
+            return None  # * proceed to next element
 
         if ("interaction_sequence" in element or shown_element) and self.activity is not None:
             # * Element interaction could have broken webdriver state
             self._restore_page_default()
 
-        self._append_single_image_of_element(single_image, element)
+        return single_image
+
+    def _report_progress(self, current: int) -> None:
+        if self.progress_callback is not None:
+            self.progress_callback(current, len(self.elements))
+
+    def _viewport_rects(self, web_elements: List[WebElement]) -> Tuple[List[Dict], Dict]:
+        """
+        Client rects of all elements and the viewport state, in one script call.
+        """
+        *rects, viewport = self.driver.execute_script(JS_VIEWPORT_RECTS, web_elements)
+        return rects, viewport
+
+    @staticmethod
+    def _group_by_viewport(rects: Dict[int, Dict], viewport_height: float) -> List[Tuple[float, List[int]]]:
+        """
+        Groups elements by the scroll offset they can be captured at, given their rects relative to the top of
+        the page. The first element of a group is placed below a headroom, the following ones are added while
+        they fit into the same viewport.
+
+        :return: list of (scroll offset, element numbers)
+        """
+        groups = []
+        for number in sorted(rects, key=lambda n: rects[n]["y"]):
+            rect = rects[number]
+            if groups and rect["y"] + rect["height"] <= groups[-1][0] + viewport_height:
+                groups[-1][1].append(number)
+            else:
+                groups.append((max(rect["y"] - VIEWPORT_HEADROOM * viewport_height, 0), [number]))
+        return groups
+
+    @staticmethod
+    def _in_viewport(rect: Dict, viewport: Dict) -> bool:
+        return (
+            rect["displayed"]
+            and rect["x"] >= 0 and rect["y"] >= 0
+            and rect["x"] + rect["width"] <= viewport["width"]
+            and rect["y"] + rect["height"] <= viewport["height"]
+        )
+
+    def _capture_viewport(self) -> np.ndarray:
+        return np.asarray(Image.open(BytesIO(self.driver.get_screenshot_as_png())).convert("RGBA"))
+
+    @classmethod
+    def _crop_element(cls, viewport_image: np.ndarray, rect: Dict, draw: bool = True) -> Optional[Image.Image]:
+        """
+        Crops an element from the decoded viewport capture with array slicing, without copying the rest of it.
+        """
+        height, width = viewport_image.shape[:2]
+        coordinates = [rect["x"], rect["y"], rect["x"] + rect["width"], rect["y"] + rect["height"]]
+        box = cls.__crop_box(width, height, coordinates)
+        if box is None:
+            return None
+
+        x1, y1 = (max(int(round(value)), 0) for value in box[:2])
+        x2, y2 = int(round(min(box[2], width))), int(round(min(box[3], height)))
+        if x2 <= x1 or y2 <= y1:
+            return None
+        image = Image.fromarray(viewport_image[y1:y2, x1:x2])
+        if draw:
+            image = Draw([
+                coordinates[0] - x1, coordinates[1] - y1, coordinates[2] - x1, coordinates[3] - y1
+            ], image).draw()
+        return image
+
+    def batch_elements(self, elements: List[Element], draw: bool = True) -> Dict[int, Optional[Image.Image]]:
+        """
+        Takes screenshots of several elements with one capture per scroll offset.
+        Elements are grouped by their position on the page and cropped from the same decoded capture.
+
+        Returns:
+            Dict: element number to its image. Elements that could not be captured this way
+                  (hidden, moved during scrolling or out of the viewport horizontally) are left out.
+        """
+        web_elements = []
+        numbers = []
+        for number, element in enumerate(elements):
+            try:
+                web_elements.append(element.get_element(self.driver))
+                numbers.append(number)
+            except ElementLostException:
+                print(f"Lost element before taking screenshot - {element.source[:100]}")
+
+        if not web_elements:
+            return {}
+
+        self._scroll_to_top_left_of_the_page()
+        rects, viewport = self._viewport_rects(web_elements)
+        page_rects = {
+            position: dict(rect, y=rect["y"] + viewport["scroll_y"])
+            for position, rect in enumerate(rects)
+            if rect["displayed"] and rect["x"] >= 0 and rect["x"] + rect["width"] <= viewport["width"]
+        }
+
+        images = {}
+        for offset, positions in self._group_by_viewport(page_rects, viewport["height"]):
+            self.driver.execute_script(f"window.scrollTo(0, {offset})")
+            sleep(SCROLL_DELAY)
+
+            # * Elements are measured again, the page can shift while scrolling and fixed elements stay in place
+            group_rects, group_viewport = self._viewport_rects([web_elements[position] for position in positions])
+            viewport_image = self._capture_viewport()
+            for position, rect in zip(positions, group_rects):
+                if self._in_viewport(rect, group_viewport):
+                    images[numbers[position]] = self._crop_element(viewport_image, rect, draw)
+
+        self._scroll_to_top_left_of_the_page()
+        return images
 
     def form_screenshot_queue_of_elements(self):
+        images: List[Optional[Image.Image]] = [None] * len(self.elements)
+
+        # * Interactions change the page, elements that need them are captured one by one after the batch
+        batch_numbers = [
+            number for number, element in enumerate(self.elements) if "interaction_sequence" not in element
+        ]
+        try:
+            batch_images = self.batch_elements([self.elements[number]["element"] for number in batch_numbers])
+        except Exception:
+            batch_images = {}
+            print(f"Exception while taking batched screenshots:\n{traceback.format_exc()}")
+
+        batched = set()
+        for position, image in batch_images.items():
+            images[batch_numbers[position]] = image
+            batched.add(batch_numbers[position])
+        self._report_progress(len(batched))
+
+        captured = len(batched)
         for element_id, element in enumerate(self.elements):
+            if element_id in batched:
+                continue
+
+            self._report_progress(captured)
+            captured += 1
             print(f"Taking screenshot for {element['element'].source[:100]} on {self.driver.current_url}")
             try:
-                self._prepare_and_try_element_screenshot(element_id, element)
+                images[element_id] = self._prepare_and_try_element_screenshot(element)
             except Exception:
-                self.images.append(None)
                 print(
                     f"Exception while taking a screenshot for {element['element'].source[:100]}:\n"
                     f"{traceback.format_exc()}"
                 )
 
+        self.images.extend(images)
+
     def get_images(self) -> List[Optional[Image.Image]]:
         """
         Method for obtaining a list with images of transferred elements
         indicating the boundaries of each element in the image.
+        Elements are captured in batches, one capture per viewport;
+        elements with an interaction_sequence, or that are not visible, are captured one by one.
         Example of interaction_sequence:
             {"element": elem, ...,
             "interaction_sequence": {"element": elem, "action": "zoom", "zoom_percent": 200%}}'
@@ -389,53 +528,67 @@ class Screenshot:
             return image.resize((need_w, int(new_h)), resample=Image.BILINEAR)
         return image
 
+    @classmethod
+    def __crop_image(cls, image: Image.Image, coordinates: Tuple[int, int, int, int]) -> Optional[Image.Image]:
+        """
+        :param coordinates: coordinates
+        :return: cropped image
+        """
+        box = cls.__crop_box(image.width, image.height, coordinates)
+        if box is None:
+            return None
+        if box == (0, 0, image.width, image.height):
+            return image
+        return image.crop(box=box)
+
     @staticmethod
-    def __crop_image(image: Image.Image, coordinates: Tuple[int, int, int, int]) -> Optional[Image.Image]:
+    def __crop_box(image_width: int, image_height: int, coordinates) -> Optional[Tuple[float, float, float, float]]:
         """
-        image.size[0] - width screenshot
-        image.size[1] - height screenshot
+        image_width - width screenshot
+        image_height - height screenshot
 
         max - used to define the lower boundary
         min - used to define the upper  boundary
         :param coordinates: coordinates
-        :return: cropped image
+        :return: crop box, the whole screenshot if the element is large enough
         """
         x, y, x1, y1 = coordinates
-        # print(f"CROPPING: {coordinates} from {image.size[0]}:{image.size[1]}")
-        if x > image.width or y > image.height:
+        # print(f"CROPPING: {coordinates} from {image_width}:{image_height}")
+        if x > image_width or y > image_height:
             print("Element out of bounds of image!")
             return None
 
+        whole_image = (0, 0, image_width, image_height)
         height, width = y1 - y, x1 - x
         if height > width:
-            if height / image.height >= THRESHOLD_PERCENTAGE:
-                return image
+            if height / image_height >= THRESHOLD_PERCENTAGE:
+                return whole_image
             new_height = floor(height / THRESHOLD_PERCENTAGE)
-            new_width = image.width * new_height / image.height
+            new_width = image_width * new_height / image_height
         else:
-            if width / image.width >= THRESHOLD_PERCENTAGE:
-                return image
+            if width / image_width >= THRESHOLD_PERCENTAGE:
+                return whole_image
             new_width = floor(width / THRESHOLD_PERCENTAGE)
-            new_height = image.height * new_width / image.width
-        k = new_height / image.height
-        if x < image.width - x1:
+            new_height = image_height * new_width / image_width
+        k = new_height / image_height
+        if x < image_width - x1:
             crop_x1 = max(x - k * x, 0)
             crop_x2 = new_width + crop_x1
         else:
-            crop_x2 = image.width - (image.width - x1) * (1 - k)
+            crop_x2 = image_width - (image_width - x1) * (1 - k)
             crop_x1 = crop_x2 - new_width
-        if y < image.height - y1:
+        if y < image_height - y1:
             crop_y1 = max(y - k * y, 0)
             crop_y2 = new_height + crop_y1
         else:
-            crop_y2 = image.height - (image.height - y1) * (1 - k)
+            crop_y2 = image_height - (image_height - y1) * (1 - k)
             crop_y1 = crop_y2 - new_height
         if crop_y2 <= crop_y1 or crop_x2 <= crop_x1:
             print("Element has invalid coordinates (x1>x2/y1>y2), skipping")
-            return image
+            return whole_image
         print(f"CROP: {crop_x1}:{crop_y1}, {crop_x2}:{crop_y2}")
 
-        return image.crop(box=(crop_x1, crop_y1, crop_x2, crop_y2))
+        return crop_x1, crop_y1, crop_x2, crop_y2
 
     def __get_coordinates(self, element: Element) -> Optional[List]:
         """
@@ -1,3 +1,4 @@
+import copy
 import logging
 import threading
 import sys
@@ -22,6 +23,11 @@ logger = logging.getLogger("framework.test")
 
 TESTDIR_NAME = "tests"
 
+RUN_STATE_ATTRIBUTES = (
+    "status", "message", "result", "execution_time",
+    "problematic_elements", "checked_elements", "problematic_pages", "run_times",
+)
+
 
 class TestMalformedException(Exception):
     pass
@@ -108,12 +114,33 @@ class Test:
         except AttributeError:
             pass
 
+    def clone(self) -> 'Test':
+        """A new instance of a loaded test, it shares the test module and metadata but not the run results"""
+        test_copy = copy.copy(self)
+        test_copy.depends = list(self.depends)
+        test_copy.problematic_elements = []
+        test_copy.checked_elements = set()
+        test_copy.problematic_pages = []
+        test_copy.run_times = list()
+        test_copy.result = None
+        test_copy.execution_time = None
+        test_copy.timing_event = None
+        return test_copy
+
     def reset(self):
         self.status = "READY"
         self.problematic_elements.clear()
         self.checked_elements.clear()
         self.message = None
 
+    def get_run_state(self) -> dict:
+        """Picklable snapshot of everything a test run changes, used to move results between processes"""
+        return {attribute: getattr(self, attribute, None) for attribute in RUN_STATE_ATTRIBUTES}
+
+    def set_run_state(self, run_state: dict) -> None:
+        for attribute, value in run_state.items():
+            setattr(self, attribute, value)
+
     def merge_other_test(self, other_test):
         if other_test.status not in STATUSES:
             logger.error(f"Invalid status for other test {other_test.name}:{other_test.status}, not merging")
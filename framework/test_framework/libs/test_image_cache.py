@@ -0,0 +1,109 @@
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from framework import request_limiter
+from framework.libs import download_image, image_cache
+from framework.libs.image_cache import ImageAnalysisCache
+
+IMAGE_URL = "https://example.com/logo.png"
+
+
+class ImageAnalysisCacheTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.cache_dir.name) / "images.sqlite3"
+        self.cache = ImageAnalysisCache(self.path)
+
+    def tearDown(self) -> None:
+        self.cache_dir.cleanup()
+
+    def test_latest_download_returned(self):
+        self.cache.put_download(IMAGE_URL, '"v1"', b"old")
+        self.cache.put_download(IMAGE_URL, '"v2"', b"new")
+
+        self.assertEqual(self.cache.get_download(IMAGE_URL), ('"v2"', b"new"))
+        self.assertIsNone(self.cache.get_download("https://example.com/other.png"))
+
+    def test_results_shared_between_jobs(self):
+        self.cache.put("ff00", "yolo", ["car"], "[0.5]")
+
+        other_job_cache = ImageAnalysisCache(self.path)
+
+        self.assertEqual(other_job_cache.get("ff00", "yolo", "[0.5]"), ["car"])
+        self.assertIsNone(other_job_cache.get("ff00", "yolo", "[0.6]"))
+        self.assertIsNone(other_job_cache.get("ff00", "ocr", "[0.5]"))
+
+    def test_oldest_analyses_pruned(self):
+        with mock.patch.object(image_cache, "PRUNE_EVERY", 4), mock.patch.object(image_cache, "MAX_ANALYSES", 2):
+            for number in range(4):
+                self.cache.put(f"ff0{number}", "yolo", [number])
+
+        self.assertIsNone(self.cache.get("ff00", "yolo"))
+        self.assertIsNone(self.cache.get("ff01", "yolo"))
+        self.assertEqual(self.cache.get("ff03", "yolo"), [3])
+
+    def test_older_schema_dropped(self):
+        connection = sqlite3.connect(str(self.path))
+        connection.execute("CREATE TABLE analyses (image_hash TEXT, kind TEXT, params TEXT, result TEXT)")
+        connection.execute("INSERT INTO analyses VALUES ('ff00', 'yolo', '', '[\"car\"]')")
+        connection.commit()
+        connection.close()
+
+        self.assertIsNone(self.cache.get("ff00", "yolo"))
+        self.cache.put("ff00", "yolo", ["dog"])
+        self.assertEqual(self.cache.get("ff00", "yolo"), ["dog"])
+        self.assertFalse(self.cache.disabled)
+
+    def test_unavailable_cache_disabled(self):
+        with open(self.path, "w") as blocking_file:
+            blocking_file.write("not a directory")
+        cache = ImageAnalysisCache(self.path / "images.sqlite3")
+
+        cache.put("ff00", "yolo", ["car"])
+
+        self.assertIsNone(cache.get("ff00", "yolo"))
+        self.assertTrue(cache.disabled)
+
+
+class DownloadTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache_dir = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(
+            download_image, "cached_image_analysis", ImageAnalysisCache(Path(self.cache_dir.name) / "images.sqlite3")
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.limiter = request_limiter.RequestLimiter(0)
+
+    def tearDown(self) -> None:
+        self.cache_dir.cleanup()
+
+    @staticmethod
+    def _response(status_code, content=b"", etag=None):
+        return mock.MagicMock(status_code=status_code, content=content, headers={"ETag": etag} if etag else {})
+
+    def test_unchanged_image_revalidated(self):
+        with mock.patch.object(download_image.requests, "get", side_effect=[
+            self._response(200, b"image", '"v1"'), self._response(304)
+        ]) as get:
+            first = download_image.download(IMAGE_URL, self.limiter)
+            second = download_image.download(IMAGE_URL, self.limiter)
+
+        self.assertEqual(first, b"image")
+        self.assertEqual(second, b"image")
+        self.assertEqual(get.call_args.kwargs["headers"], {"If-None-Match": '"v1"'})
+        self.assertIsNotNone(get.call_args.kwargs["timeout"])
+
+    def test_changed_image_downloaded(self):
+        with mock.patch.object(download_image.requests, "get", side_effect=[
+            self._response(200, b"image", '"v1"'), self._response(200, b"new image", '"v2"'), self._response(404)
+        ]):
+            download_image.download(IMAGE_URL, self.limiter)
+            changed = download_image.download(IMAGE_URL, self.limiter)
+            missing = download_image.download(IMAGE_URL, self.limiter)
+
+        self.assertEqual(changed, b"new image")
+        self.assertIsNone(missing)
@@ -0,0 +1,109 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import cv2
+import numpy as np
+
+from framework.libs import ocr_engine
+from framework.libs.image_cache import ImageAnalysisCache
+from framework.libs.image_hash import content_digest, perceptual_hash, hash_distance
+from framework.libs.ocr_engine import OcrEngine
+
+
+def _banner(text: str, size=(120, 400)) -> np.ndarray:
+    image = np.full((*size, 3), 255, np.uint8)
+    cv2.putText(image, text, (10, size[0] // 2), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 4)
+    return image
+
+
+class ImageHashTestCase(unittest.TestCase):
+    def test_copies_hashed_alike(self):
+        banner = _banner("SALE")
+        copy = cv2.resize(banner, (600, 180))
+        copy = cv2.imdecode(cv2.imencode(".jpg", copy, [cv2.IMWRITE_JPEG_QUALITY, 60])[1], cv2.IMREAD_UNCHANGED)
+
+        self.assertEqual(len(perceptual_hash(banner)), 16)
+        self.assertLessEqual(hash_distance(perceptual_hash(banner), perceptual_hash(copy)), 4)
+
+    def test_different_images_hashed_apart(self):
+        self.assertGreater(hash_distance(perceptual_hash(_banner("SALE")), perceptual_hash(_banner("NEWS"))), 10)
+
+    def test_color_channels_ignored(self):
+        banner = _banner("SALE")
+
+        self.assertEqual(perceptual_hash(banner), perceptual_hash(cv2.cvtColor(banner, cv2.COLOR_BGR2BGRA)))
+
+    def test_only_same_image_digested_alike(self):
+        banner = _banner("SALE")
+
+        self.assertEqual(content_digest(banner), content_digest(banner.copy()))
+        self.assertNotEqual(content_digest(banner), content_digest(cv2.resize(banner, (600, 180))))
+        self.assertNotEqual(content_digest(banner), content_digest(banner.reshape(400, 120, 3)))
+
+
+class OcrEngineTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.image_analysis = ImageAnalysisCache(Path(self.cache_dir.name) / "images.sqlite3")
+        patcher = mock.patch.object(ocr_engine, "cached_image_analysis", self.image_analysis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.engine = OcrEngine(cache_size=2)
+
+    def tearDown(self) -> None:
+        self.cache_dir.cleanup()
+
+    def test_result_cached_by_image(self):
+        recognize = mock.MagicMock(return_value=["SALE"])
+        banner = _banner("SALE")
+
+        first = self.engine.cached(banner, recognize, False)
+        second = self.engine.cached(banner.copy(), recognize, False)
+        self.engine.cached(banner, recognize, True)
+        self.engine.cached(_banner("NEWS"), recognize, False)
+
+        self.assertEqual(first, second)
+        self.assertEqual(recognize.call_count, 3)
+
+    def test_least_recently_used_result_evicted(self):
+        recognize = mock.MagicMock(return_value=[])
+        self.image_analysis.disabled = True
+        for text in ("ONE", "TWO", "SIX", "ONE"):
+            self.engine.cached(_banner(text), recognize)
+
+        self.assertEqual(recognize.call_count, 4)
+
+    def test_result_persisted_between_engines(self):
+        recognize = mock.MagicMock(return_value={"text_data": ["SALE"], "image_of_text": True})
+        self.engine.cached(_banner("SALE"), recognize, False)
+
+        result = OcrEngine().cached(_banner("SALE"), recognize, False)
+
+        recognize.assert_called_once()
+        self.assertEqual(result, {"text_data": ["SALE"], "image_of_text": True})
+
+    def test_similar_image_recognized_again(self):
+        recognize = mock.MagicMock(side_effect=[["SALE"], ["SALE 50%"]])
+        banner = _banner("SALE")
+        self.engine.cached(banner, recognize)
+        banner[-10:, -10:] = 0
+
+        result = OcrEngine().cached(banner, recognize)
+
+        self.assertEqual(recognize.call_count, 2)
+        self.assertEqual(result, ["SALE 50%"])
+
+    @mock.patch.object(ocr_engine, "Reader")
+    def test_reader_loaded_once_on_cpu(self, reader_class):
+        reader_class.return_value.readtext.side_effect = lambda image, **settings: [image]
+
+        with mock.patch.object(OcrEngine, "gpu", new_callable=mock.PropertyMock, return_value=False):
+            first = self.engine.readtext(["a.png", "b.png"], mag_ratio=1.1)
+            second = self.engine.readtext(["c.png"])
+
+        reader_class.assert_called_once()
+        self.assertFalse(reader_class.call_args.kwargs["gpu"])
+        self.assertEqual(first, [["a.png"], ["b.png"]])
+        self.assertEqual(second, [["c.png"]])
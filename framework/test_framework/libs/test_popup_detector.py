@@ -0,0 +1,109 @@
+import unittest
+from unittest import mock
+from urllib.parse import quote
+
+from selenium import webdriver
+from selenium.common.exceptions import JavascriptException
+
+from framework.libs import popup_detector
+
+# * A sticky header is shown from the start, the modal is inserted by a portal: a plain wrapper around the overlay
+PORTAL_PAGE = """
+<html><body>
+    <header style="position: fixed; top: 0; z-index: 1000; width: 100%; height: 40px">Header</header>
+    <div id="hidden-root" style="display: none">
+        <div id="hidden-modal" style="position: fixed; z-index: 500; width: 300px; height: 200px">Hidden</div>
+    </div>
+    <script>
+        setTimeout(() => {
+            const wrapper = document.createElement("div");
+            wrapper.innerHTML = '<div id="portal-modal" style="position: fixed; z-index: 9999; ' +
+                'width: 300px; height: 200px">Subscribe</div>';
+            document.body.appendChild(wrapper);
+        }, 500);
+    </script>
+</body></html>
+"""
+
+
+class PopupDetectorTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.driver = mock.MagicMock()
+        self.driver.execute.return_value = {"value": {"script": 30000}}
+        self.popup = mock.MagicMock(name="popup")
+        self.overlay = mock.MagicMock(name="overlay")
+        self.driver.execute_script.return_value = [self.overlay, 1000]
+
+    def test_shown_popup_returned_within_budget(self):
+        self.driver.execute_async_script.return_value = self.popup
+
+        popup = popup_detector.wait_for_popup(self.driver, idle_budget=2)
+
+        self.assertIs(popup, self.popup)
+        self.driver.execute_async_script.assert_called_once()
+        self.assertEqual(self.driver.execute_async_script.call_args[0][1], 2000)
+        self.assertEqual(
+            self.driver.set_script_timeout.call_args_list,
+            [mock.call(2 + popup_detector.SCRIPT_TIMEOUT_MARGIN), mock.call(30)]
+        )
+
+    def test_unobservable_page_has_no_popup(self):
+        self.driver.execute_async_script.side_effect = JavascriptException("MutationObserver is not defined")
+
+        self.assertIsNone(popup_detector.wait_for_popup(self.driver))
+        self.driver.set_script_timeout.assert_called_with(30)
+
+    @mock.patch.object(popup_detector, "_find_accept_button_recurse")
+    def test_shown_popup_closed(self, find_button):
+        self.driver.execute_async_script.return_value = self.popup
+
+        popup_detector.detect_popup(self.driver)
+
+        find_button.assert_called_once_with(self.popup, max_depth=20)
+        self.driver.execute_script.assert_not_called()
+
+    @mock.patch.object(popup_detector, "_find_accept_button_recurse", return_value=None)
+    def test_top_overlay_hidden_without_popup(self, find_button):
+        self.driver.execute_async_script.return_value = None
+
+        popup_detector.detect_popup(self.driver)
+
+        find_button.assert_called_once_with(self.overlay, max_depth=20)
+        self.assertEqual(self.driver.execute_script.call_count, 2)
+        self.assertIs(self.driver.execute_script.call_args[0][1], self.overlay)
+
+    @mock.patch.object(popup_detector, "_find_accept_button_recurse")
+    def test_nothing_on_top(self, find_button):
+        self.driver.execute_async_script.return_value = None
+        self.driver.execute_script.return_value = [None, None]
+
+        popup_detector.detect_popup(self.driver)
+
+        find_button.assert_not_called()
+
+
+class PopupDetectorPageTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.webdriver_inst = webdriver.Firefox()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.webdriver_inst.quit()
+
+    def setUp(self) -> None:
+        self.webdriver_inst.get("data:text/html," + quote(PORTAL_PAGE))
+
+    def test_overlay_inside_inserted_wrapper_detected(self):
+        popup = popup_detector.wait_for_popup(self.webdriver_inst, idle_budget=10)
+
+        self.assertEqual(popup.get_attribute("id"), "portal-modal")
+
+    def test_overlay_inside_shown_wrapper_detected(self):
+        self.webdriver_inst.execute_script(
+            "setTimeout(() => document.getElementById('hidden-root').style.display = 'block', 100)"
+        )
+
+        popup = popup_detector.wait_for_popup(self.webdriver_inst, idle_budget=10)
+
+        self.assertEqual(popup.get_attribute("id"), "hidden-modal")
@@ -0,0 +1,111 @@
+import unittest
+from unittest import mock
+
+from selenium.common.exceptions import (
+    JavascriptException, TimeoutException, UnexpectedAlertPresentException, WebDriverException
+)
+
+from framework import await_page_load
+
+QUIET_RESULT = {"status": "quiet", "elapsed": 0.6, "resources": 12, "mutations": 40, "pending": 0}
+
+
+class WaitForPageLoadTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.driver = mock.MagicMock(current_url="https://example.com/")
+        self.driver.execute.return_value = {"value": {"script": 10000}}
+        patcher = mock.patch.object(await_page_load, "load_wait_timings", await_page_load.LoadWaitTimings())
+        self.timings = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_quiet_page_awaited_with_one_script(self):
+        self.driver.execute_async_script.return_value = QUIET_RESULT
+
+        with mock.patch.object(await_page_load, "_wait_by_polling") as polling:
+            await_page_load.wait_for_page_load(self.driver)
+
+        self.driver.execute_async_script.assert_called_once()
+        quiet_window = self.driver.execute_async_script.call_args.args[1]
+        self.assertEqual(quiet_window, await_page_load.QUIET_WINDOW * 1000)
+        polling.assert_not_called()
+        self.assertEqual(self.timings.summary()["statuses"], {"quiet": 1})
+
+    def test_script_timeout_restored(self):
+        self.driver.execute_async_script.side_effect = JavascriptException("PerformanceObserver is not defined")
+
+        with mock.patch.object(await_page_load, "_wait_by_polling"):
+            await_page_load.wait_for_page_load(self.driver)
+
+        self.assertEqual(
+            self.driver.set_script_timeout.call_args_list,
+            [mock.call(await_page_load.TIMEOUT + await_page_load.SCRIPT_TIMEOUT_MARGIN), mock.call(10)]
+        )
+
+    def test_script_timeout_of_session_restored_without_timeouts_command(self):
+        self.driver.execute.side_effect = WebDriverException("unknown command")
+        self.driver.capabilities = {"timeouts": {"script": 20000}}
+        self.driver.execute_async_script.return_value = QUIET_RESULT
+
+        await_page_load.wait_for_page_load(self.driver)
+
+        self.driver.set_script_timeout.assert_called_with(20)
+
+    def test_timed_out_wait_not_polled(self):
+        self.driver.execute_async_script.side_effect = TimeoutException("Timed out after 35000 ms")
+
+        with mock.patch.object(await_page_load, "_wait_by_polling") as polling:
+            await_page_load.wait_for_page_load(self.driver)
+
+        polling.assert_not_called()
+        self.assertEqual(self.timings.summary()["statuses"], {"timeout": 1})
+
+    def test_replaced_document_observed_again(self):
+        self.driver.execute_async_script.side_effect = [JavascriptException("document unloaded"), QUIET_RESULT]
+
+        with mock.patch.object(await_page_load, "_wait_by_polling") as polling:
+            await_page_load.wait_for_page_load(self.driver)
+
+        self.assertEqual(self.driver.execute_async_script.call_count, 2)
+        polling.assert_not_called()
+
+    def test_unobservable_page_polled(self):
+        self.driver.execute_async_script.side_effect = JavascriptException("PerformanceObserver is not defined")
+
+        with mock.patch.object(await_page_load, "_wait_by_polling") as polling:
+            await_page_load.wait_for_page_load(self.driver)
+
+        polling.assert_called_once_with(self.driver)
+        self.assertEqual(self.timings.summary()["statuses"], {"polled": 1})
+
+    def test_alert_not_awaited(self):
+        self.driver.execute_async_script.side_effect = UnexpectedAlertPresentException()
+
+        with mock.patch.object(await_page_load, "_wait_by_polling") as polling:
+            await_page_load.wait_for_page_load(self.driver)
+
+        polling.assert_not_called()
+        self.assertEqual(self.timings.summary()["statuses"], {"alert": 1})
+
+
+class LoadWaitTimingsTestCase(unittest.TestCase):
+    def test_summary(self):
+        timings = await_page_load.LoadWaitTimings(size=20)
+        for second in range(1, 21):
+            timings.record(f"https://example.com/{second}", second, "quiet" if second < 20 else "timeout")
+
+        summary = timings.summary()
+
+        self.assertEqual(summary["pages"], 20)
+        self.assertEqual(summary["mean"], 10.5)
+        self.assertEqual(summary["median"], 11)
+        self.assertEqual(summary["p95"], 20)
+        self.assertEqual(summary["max"], 20)
+        self.assertEqual(summary["statuses"], {"quiet": 19, "timeout": 1})
+
+    def test_oldest_entries_dropped(self):
+        timings = await_page_load.LoadWaitTimings(size=2)
+        for second in (30, 1, 2):
+            timings.record("https://example.com/", second, "quiet")
+
+        self.assertEqual(timings.summary()["max"], 2)
+        self.assertEqual(await_page_load.LoadWaitTimings().summary(), {"pages": 0})
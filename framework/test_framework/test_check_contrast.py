@@ -0,0 +1,16 @@
+import unittest
+
+from framework.tests.contrast.check_contrast import contrast, contrast_ratios
+
+
+class ContrastRatiosTestCase(unittest.TestCase):
+    def test_matches_single_contrast(self):
+        backgrounds = [[1, 1, 1], [0, 0, 0], [0.2, 0.5, 0.01], [0.03, 0.03, 0.03]]
+        texts = [[0, 0, 0], [0, 0, 0], [0.9, 0.1, 0.4], [1, 1, 1]]
+        ratios = contrast_ratios(backgrounds, texts)
+
+        for ratio, background, text in zip(ratios, backgrounds, texts):
+            self.assertAlmostEqual(ratio, contrast(background, text))
+
+    def test_black_on_white(self):
+        self.assertAlmostEqual(contrast_ratios([[1, 1, 1]], [[0, 0, 0]])[0], 21)
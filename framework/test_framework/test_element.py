@@ -1,9 +1,10 @@
 import copy
 import unittest
+from unittest.mock import MagicMock
 
 from selenium import webdriver
 
-from framework.element import Element
+from framework.element import Element, JS_SNAPSHOT
 
 
 class ElementTestCase(unittest.TestCase):
@@ -62,3 +63,37 @@ class ElementTestCase(unittest.TestCase):
         self.assertTrue(is_same)
         is_not_same = not self.search_box_element.is_same_site('https://google.com', 'https://apple.com')
         self.assertTrue(is_not_same)
+
+
+class ElementSnapshotTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.webdriver_inst = MagicMock()
+        self.web_element = MagicMock()
+        self.webdriver_inst.execute_script.return_value = {
+            'a': [[
+                self.web_element, 'a', 'home', 'html > body > a', '<a id="home" href="/">Home</a>',
+                10, 20, True, {'id': 'home', 'href': '/'}
+            ]],
+            'img': [],
+        }
+
+    def test_snapshot_builds_elements_in_one_call(self):
+        snapshot = Element.snapshot(self.webdriver_inst, ['a', 'img'])
+
+        self.webdriver_inst.execute_script.assert_called_once_with(JS_SNAPSHOT, ['a', 'img'])
+        self.assertEqual(snapshot['img'], [])
+        element, is_displayed = snapshot['a'][0]
+        self.assertTrue(is_displayed)
+        self.assertEqual(element.tag_name, 'a')
+        self.assertEqual(element.element_id, 'home')
+        self.assertEqual(element.get_selector(), 'html > body > a')
+        self.assertEqual(element.position, {'x': 10, 'y': 20})
+        self.assertEqual(element.get_attribute(self.webdriver_inst, 'href'), '/')
+        self.assertIs(element.get_element(self.webdriver_inst), self.web_element)
+        self.webdriver_inst.execute_script.assert_called_once()
+
+    def test_snapshot_element_without_id(self):
+        self.webdriver_inst.execute_script.return_value['a'][0][2] = ''
+        element, _ = Element.snapshot(self.webdriver_inst, ['a'])['a'][0]
+
+        self.assertIsNone(element.element_id)
@@ -1,10 +1,14 @@
 import unittest
+from unittest.mock import MagicMock, patch
 
 from selenium import webdriver
 
 from framework import request_limiter
 from framework.activity import Activity
-from framework.element_locator import ElementLocator, DEFAULT_TARGET_ELEMENTS
+from framework.element import Element
+from framework.element_locator import (
+    ElementLocator, DEFAULT_TARGET_ELEMENTS, LocatorCache, locator_key, _ElementInfo
+)
 
 
 @unittest.skip('Deprecated. Will be removed soon')
@@ -36,3 +40,85 @@ class ElementLocatorTestCase(unittest.TestCase):
 
     def test_element_locator_analyze(self):
         self.element_locator.analyze(fake=False)
+
+
+class LocatorCacheTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.activity = Activity(
+            name='Main Activity', url='https://example.com', options='', page_after_login=None, commands=[]
+        )
+        self.cache = LocatorCache(max_size=2)
+        self.element_locator = ElementLocator(MagicMock(), self.activity, {'a'})
+        self.element_locator.final_url = 'https://example.com/home'
+
+    def test_locator_key(self):
+        same_page = Activity(
+            name='Other Activity', url='https://example.com', options='', page_after_login=None, commands=[]
+        )
+        with_popup = Activity(
+            name='Main Activity_with_popup', url='https://example.com', options='', page_after_login=None,
+            commands=[{'target': None, 'targets': None, 'value': None, 'command': 'wait_for_popup'}]
+        )
+        other_resolution = Activity(
+            name='Main Activity', url='https://example.com', options='', page_after_login=None, commands=[],
+            page_resolution='800x600'
+        )
+
+        self.assertEqual(locator_key(self.activity), locator_key(same_page))
+        self.assertEqual(locator_key(with_popup)[3], 'wait_for_popup')
+        self.assertNotEqual(locator_key(self.activity), locator_key(with_popup))
+        self.assertNotEqual(locator_key(self.activity), locator_key(other_resolution))
+
+    def test_cached_locator_is_a_rebound_copy(self):
+        key = locator_key(self.activity)
+        self.cache.put(key, 'fingerprint', self.element_locator)
+        webdriver_inst = MagicMock()
+        cached = self.cache.get(key, 'fingerprint', webdriver_inst, self.activity)
+
+        self.assertIsNot(cached, self.element_locator)
+        self.assertIs(cached.webdriver_instance, webdriver_inst)
+        self.assertIs(cached.activity, self.activity)
+        self.assertEqual(cached.final_url, 'https://example.com/home')
+
+    def test_changed_fingerprint_invalidates_entry(self):
+        key = locator_key(self.activity)
+        self.cache.put(key, 'fingerprint', self.element_locator)
+
+        self.assertIsNone(self.cache.get(key, 'changed', MagicMock(), self.activity))
+        self.assertIsNone(self.cache.get(key, 'fingerprint', MagicMock(), self.activity))
+
+    def test_least_recently_used_entry_evicted(self):
+        for key in ('first', 'second', 'third'):
+            self.cache.put((key,), 'fingerprint', self.element_locator)
+
+        self.assertIsNone(self.cache.get(('first',), 'fingerprint', MagicMock(), self.activity))
+        self.assertIsNotNone(self.cache.get(('third',), 'fingerprint', MagicMock(), self.activity))
+
+
+def _snapshot_element(selector, attributes):
+    return Element.from_snapshot_entry(
+        [None, 'div', '', selector, f'<div class="{selector}"></div>', 0, 0, True, attributes], MagicMock()
+    )
+
+
+class StateDiffTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        activity = Activity(
+            name='Main Activity', url='https://example.com', options='', page_after_login=None, commands=[]
+        )
+        self.element_locator = ElementLocator(MagicMock(), activity, {'div'})
+        self.activator = _snapshot_element('menu-button', {'aria-expanded': 'false'})
+        self.menu = _snapshot_element('menu', {'aria-hidden': 'true'})
+        self.still_hidden = _snapshot_element('dialog', {'aria-hidden': 'true'})
+        self.element_locator.known_elements['div'] = [
+            _ElementInfo(self.activator, True), _ElementInfo(self.menu, False), _ElementInfo(self.still_hidden, False)
+        ]
+
+    def test_attributes_of_changed_elements_not_cached(self):
+        with patch.object(Element, 'displayed_by_selector', return_value=[True, False]):
+            self.element_locator._update_state_diff(self.activator)
+
+        self.assertIsNone(self.activator.cached_attrs)
+        self.assertIsNone(self.menu.cached_attrs)
+        self.assertEqual(self.still_hidden.cached_attrs, {'aria-hidden': 'true'})
+        self.assertIs(self.element_locator.known_elements['div'][1].activating_element, self.activator)
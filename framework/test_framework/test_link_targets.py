@@ -0,0 +1,86 @@
+import threading
+import time
+import unittest
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from framework import request_limiter
+from framework.link_targets import LinkTargetService, normalize_url
+
+PAGE = "<html><head><title>Pricing plans</title></head><body><p>Compare our plans</p></body></html>"
+RESPONSE_DELAY = 0.2
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    hits = Counter()
+
+    def do_GET(self):
+        self.hits[self.path] += 1
+        time.sleep(RESPONSE_DELAY)
+        if self.path.startswith("/missing"):
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.end_headers()
+        self.wfile.write(PAGE.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class LinkTargetServiceTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        PageHandler.hits.clear()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.service = LinkTargetService(request_limiter.RequestLimiter(0), max_workers=8, cache_size=4)
+
+    def tearDown(self) -> None:
+        self.service.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_url_normalized(self):
+        self.assertEqual(normalize_url("HTTPS://Example.COM#top"), "https://example.com/")
+        self.assertEqual(normalize_url("https://example.com/a?b=1#c"), "https://example.com/a?b=1")
+
+    def test_same_target_fetched_once(self):
+        urls = [f"{self.base_url}/pricing#plan-{number}" for number in range(10)]
+        self.service.prefetch(urls)
+
+        targets = [self.service.get(url) for url in urls]
+
+        self.assertEqual(PageHandler.hits["/pricing"], 1)
+        self.assertTrue(all(target is targets[0] for target in targets))
+        self.assertEqual(targets[0].title, "Pricing plans")
+        self.assertIn("Compare our plans", targets[0].text)
+
+    def test_targets_fetched_concurrently(self):
+        urls = [f"{self.base_url}/page_{number}" for number in range(4)]
+
+        started = time.perf_counter()
+        self.service.prefetch(urls)
+        for url in urls:
+            self.service.get(url)
+
+        self.assertLess(time.perf_counter() - started, RESPONSE_DELAY * len(urls))
+
+    def test_failed_targets_cached(self):
+        self.assertIsNone(self.service.get(f"{self.base_url}/missing"))
+        self.assertIsNone(self.service.get(f"{self.base_url}/missing"))
+        self.assertIsNone(self.service.get("mailto:someone@example.com"))
+        self.assertIsNone(self.service.get(None))
+
+        self.assertEqual(PageHandler.hits["/missing"], 1)
+
+    def test_least_recently_used_target_evicted(self):
+        for number in range(5):
+            self.service.get(f"{self.base_url}/page_{number}")
+        self.service.get(f"{self.base_url}/page_1")
+        self.service.get(f"{self.base_url}/page_0")
+
+        self.assertEqual(PageHandler.hits["/page_0"], 2)
+        self.assertEqual(PageHandler.hits["/page_1"], 1)
@@ -0,0 +1,133 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from framework import model_wrapper
+from framework.model_wrapper import ModelServer, batched
+
+
+def _upper_batch(model, calls):
+    model.batches.append(len(calls))
+    return [text.upper() for (text,), _ in calls]
+
+
+@batched(_upper_batch)
+def _upper(model, text):
+    return text.upper()
+
+
+def _fail(model, text):
+    raise ValueError(text)
+
+
+class _FakeModel:
+    def __init__(self):
+        self.batches = []
+
+
+class _FakeProcess:
+    pid = 0
+
+    @staticmethod
+    def is_alive():
+        return True
+
+
+class _FakeReplica:
+    """Runs batches in the calling thread instead of a model process"""
+
+    def __init__(self, model_loader):
+        self.model = model_loader()
+        self.process = _FakeProcess()
+        self.batches = []
+
+    def run_batch(self, batch):
+        self.batches.append(batch)
+        return model_wrapper._run_batch(self.model, batch)
+
+    def memory_mb(self):
+        return 0
+
+    def unload(self):
+        pass
+
+
+@mock.patch.object(model_wrapper, "_ModelReplica", _FakeReplica)
+class ModelServerTestCase(unittest.TestCase):
+    def test_run_many_uses_batch_implementation(self):
+        server = ModelServer(_FakeModel, replicas=1)
+
+        self.assertEqual(server.run_many(_upper, [("a",), ("b",), ("c",)]), ["A", "B", "C"])
+        self.assertEqual(server.replicas[0].model.batches, [3])
+        server.unload()
+
+    def test_concurrent_calls_coalesced(self):
+        server = ModelServer(_FakeModel, replicas=1, batch_window=0.5)
+        results = {}
+
+        def _call(text):
+            results[text] = server.run(_upper, text)
+
+        threads = [threading.Thread(target=_call, args=(text,)) for text in ("x", "y", "z")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        self.assertEqual(results, {"x": "X", "y": "Y", "z": "Z"})
+        self.assertEqual(len(server.replicas[0].batches), 1)
+        server.unload()
+
+    def test_error_raised_only_for_failing_call(self):
+        server = ModelServer(_FakeModel, replicas=1)
+
+        with self.assertRaises(ValueError):
+            server.run(_fail, "broken")
+        self.assertEqual(server.run(_upper, "ok"), "OK")
+        server.unload()
+
+    @mock.patch.object(model_wrapper, "_available_memory_mb", return_value=0)
+    def test_replicas_limited_by_memory(self, available_memory):
+        server = ModelServer(_FakeModel, replicas=3)
+
+        self.assertEqual(len(server.replicas), 1)
+        server.unload()
+
+    def test_unloaded_model_raises(self):
+        server = ModelServer(_FakeModel, replicas=1)
+        server.unload()
+
+        with self.assertRaises(ValueError):
+            server.run(_upper, "late")
+
+
+class ModelCacheTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache_dir = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(model_wrapper, "MODEL_CACHE_DIR", Path(self.cache_dir.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.cache_dir.cleanup)
+
+    @mock.patch.object(model_wrapper, "KeyedVectors")
+    def test_word2vec_converted_once_then_memory_mapped(self, keyed_vectors):
+        keyed_vectors.load_word2vec_format.return_value.save.side_effect = lambda path: Path(path).touch()
+
+        model_wrapper.load_word2vec_googlenews()
+        model_wrapper.load_word2vec_googlenews()
+
+        keyed_vectors.load_word2vec_format.assert_called_once()
+        keyed_vectors.load.assert_called_once_with(
+            str(Path(self.cache_dir.name) / "word2vec_googlenews" / "GoogleNews.kv"), mmap="r"
+        )
+
+    def test_failed_cache_write_leaves_no_entry(self):
+        def _write_cache(temp_dir):
+            (temp_dir / "partial").touch()
+            raise OSError("No space left on device")
+
+        model_wrapper._publish_cache("broken", _write_cache)
+
+        self.assertEqual(list(Path(self.cache_dir.name).iterdir()), [])
@@ -0,0 +1,327 @@
+import sys
+import threading
+import unittest
+from unittest import mock
+from unittest.mock import MagicMock
+
+from selenium.common.exceptions import WebDriverException
+
+from framework.activity import Activity
+from framework.parallelization import (
+    TestQueue, ParallelTask, NoTasksLeftException, StdoutManager, FormTestQueueCapsule, _form_tasks_with_models,
+    _handle_queued_task, _threaded_method, TestRunner, SCREENSHOT_PRIORITY
+)
+from framework.request_limiter import RequestLimiter
+from framework.webdriver_manager import WebdriverManager
+
+
+class FakeRunner:
+    def __init__(self, thread_id=0):
+        self.thread_id = thread_id
+        self.webdriver_manager = None
+        self.driver = None
+        self.progress = []
+
+    def progress_report_callback(self, info):
+        self.progress.append(info)
+
+
+def _passing_task(name, depends=None, on_dependency_fail=None, test_name=None, webdriver_restart_required=True):
+    return ParallelTask(
+        lambda webdriver_instance, dependencies: ("PASS", name),
+        name,
+        on_dependency_fail=on_dependency_fail,
+        depends=depends,
+        webdriver_restart_required=webdriver_restart_required,
+        test_name=test_name,
+    )
+
+
+class TestQueueTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.original_stdout = sys.stdout
+        sys.stdout = StdoutManager(sys.stdout, debug=True)
+        self.runner = FakeRunner()
+
+    def tearDown(self) -> None:
+        sys.stdout = self.original_stdout
+
+    def _make_queue(self, tasks, cancelled_tests=None):
+        return TestQueue(tasks, {}, [], [], cancelled_tests=cancelled_tests or [])
+
+    def _run(self, test_queue):
+        order = []
+        while True:
+            try:
+                task, dependencies = test_queue.pop_task(self.runner)
+            except NoTasksLeftException:
+                return order
+            task.run(None, dependencies)
+            order.append((task.name, dependencies))
+            test_queue.complete_task(task, self.runner)
+
+    def test_dependencies_resolved_before_dependants(self):
+        tasks = [
+            (0, _passing_task("test", depends=["locator", ("model", "alias")])),
+            (5, _passing_task("locator")),
+            (1, _passing_task("model")),
+        ]
+        order = self._run(self._make_queue(tasks))
+
+        self.assertEqual([name for name, _ in order], ["model", "locator", "test"])
+        self.assertEqual(order[2][1], {"locator": "locator", "alias": "model"})
+
+    def test_priority_order_of_ready_tasks(self):
+        tasks = [(2, _passing_task("c")), (0, _passing_task("a")), (1, _passing_task("b"))]
+        order = self._run(self._make_queue(tasks))
+
+        self.assertEqual([name for name, _ in order], ["a", "b", "c"])
+
+    def test_failed_dependency_skips_task(self):
+        failing = ParallelTask(lambda webdriver_instance, dependencies: ("ERROR", None), "locator")
+        dependant = _passing_task("test", depends=["locator"])
+        order = self._run(self._make_queue([(0, failing), (1, dependant)]))
+
+        self.assertEqual([name for name, _ in order], ["locator"])
+        self.assertEqual(dependant.status, "NOTRUN")
+
+    def test_failed_dependency_ignored_by_on_dependency_fail(self):
+        failing = ParallelTask(lambda webdriver_instance, dependencies: ("ERROR", None), "model")
+        dependant = _passing_task("unload_model", depends=["model"], on_dependency_fail=lambda dependency: False)
+        order = self._run(self._make_queue([(0, failing), (1, dependant)]))
+
+        self.assertEqual([name for name, _ in order], ["model", "unload_model"])
+
+    def test_cancelled_test_is_not_run(self):
+        cancelled = _passing_task("page_test_a", test_name="test_a")
+        order = self._run(self._make_queue([(0, cancelled), (1, _passing_task("other"))], ["test_a"]))
+
+        self.assertEqual([name for name, _ in order], ["other"])
+        self.assertEqual(cancelled.status, "NOTRUN")
+
+    def test_unmet_dependency_raises(self):
+        with self.assertRaises(ValueError):
+            self._make_queue([(0, _passing_task("test", depends=["missing"]))])
+
+    def test_dependency_cycle_raises(self):
+        tasks = [(0, _passing_task("a", depends=["b"])), (0, _passing_task("b", depends=["a"]))]
+
+        with self.assertRaises(ValueError):
+            self._make_queue(tasks).pop_task(self.runner)
+
+    def test_waiting_runner_woken_on_completion(self):
+        test_queue = self._make_queue([(0, _passing_task("locator")), (1, _passing_task("test", depends=["locator"]))])
+        locator, _ = test_queue.pop_task(self.runner)
+        popped = []
+
+        waiting_runner = threading.Thread(
+            target=lambda: popped.append(test_queue.pop_task(FakeRunner(1))), daemon=True
+        )
+        waiting_runner.start()
+        locator.run(None, {})
+        test_queue.complete_task(locator, self.runner)
+        waiting_runner.join(timeout=5)
+
+        self.assertFalse(waiting_runner.is_alive())
+        self.assertEqual(popped[0][0].name, "test")
+
+    def test_restart_tasks_grouped_by_fresh_browsers(self):
+        self.runner.webdriver_manager = MagicMock()
+        tasks = [
+            (0, _passing_task("restart")),
+            (1, _passing_task("reuse", webdriver_restart_required=False)),
+            (50, _passing_task("late_reuse", webdriver_restart_required=False)),
+        ]
+
+        self.runner.webdriver_manager.has_fresh_instance.return_value = False
+        self.assertEqual(self._make_queue(tasks).pop_task(self.runner)[0].name, "reuse")
+
+        self.runner.webdriver_manager.has_fresh_instance.return_value = True
+        self.assertEqual(self._make_queue(tasks).pop_task(self.runner)[0].name, "restart")
+
+    def test_restart_grouping_keeps_priorities_apart(self):
+        self.runner.webdriver_manager = MagicMock()
+        self.runner.webdriver_manager.has_fresh_instance.return_value = False
+        tasks = [(0, _passing_task("restart")), (50, _passing_task("late_reuse", webdriver_restart_required=False))]
+        order = self._run(self._make_queue(tasks))
+
+        self.assertEqual([name for name, _ in order], ["restart", "late_reuse"])
+
+    def test_runner_keeps_browser_between_tasks(self):
+        webdriver_manager = MagicMock()
+        webdriver_manager.request.side_effect = lambda fresh: MagicMock(name="fresh" if fresh else "used")
+        webdriver_manager.is_fresh.return_value = False
+        webdriver_manager.task_done.return_value = True
+        test_queue = self._make_queue([
+            (0, _passing_task("locator")),
+            (1, _passing_task("test", depends=["locator"], webdriver_restart_required=False)),
+            (2, _passing_task("restart")),
+        ])
+        runner = TestRunner(test_queue, 0, lambda info: None, webdriver_manager)
+
+        runner_thread = threading.Thread(target=_threaded_method, args=(runner,), daemon=True)
+        runner_thread.start()
+        runner_thread.join(timeout=5)
+
+        self.assertFalse(runner_thread.is_alive())
+        self.assertEqual([task.status for task in test_queue.completed_tasks], ["PASS"] * 3)
+        self.assertEqual([call.kwargs for call in webdriver_manager.request.call_args_list], [{"fresh": True}] * 2)
+        self.assertEqual(webdriver_manager.task_done.call_count, 3)
+        # * The browser of the first two tasks is reset for the restart task, the last one when the runner stops
+        self.assertEqual(webdriver_manager.release.call_count, 2)
+        self.assertIsNone(runner.driver)
+
+    def test_task_failed_when_browser_does_not_start(self):
+        self.runner.webdriver_manager = WebdriverManager(RequestLimiter(0))
+        self.addCleanup(self.runner.webdriver_manager.close_all)
+        test_queue = self._make_queue([(0, _passing_task("locator")), (1, _passing_task("test", depends=["locator"]))])
+        self.runner.test_queue = test_queue
+        self.runner.current_test = None
+
+        with mock.patch.object(WebdriverManager, "_launch", side_effect=WebDriverException("Firefox failed to start")):
+            self.assertIsNone(_handle_queued_task(self.runner))
+
+        self.assertEqual(test_queue.completed_tasks[0].status, "ERROR")
+        self.assertEqual(test_queue.running_tasks, [])
+        self.assertEqual(self._run(test_queue), [])
+
+    def test_test_screenshotted_after_all_pages(self):
+        tests = {activity_name: [MagicMock(problematic_elements=[])] for activity_name in ("A", "B")}
+        for activity_tests in tests.values():
+            activity_tests[0].name = "test_x"
+        tasks = [
+            (0, _passing_task("A_test_x", test_name="test_x")),
+            (2, _passing_task("B_test_x", test_name="test_x")),
+        ]
+        for priority, activity_name in ((1, "A"), (3, "B")):
+            tasks.append((priority, ParallelTask(
+                lambda webdriver_instance, dependencies: ("PASS", None), "screenshots_" + activity_name,
+                depends=[activity_name + "_test_x"], screenshot_tests=["test_x"]
+            )))
+        test_queue = TestQueue(tasks, tests, [], [], cancelled_tests=[], do_interim_results=True)
+
+        order = [name for name, _ in self._run(test_queue)]
+        screenshot_events = [
+            number for number, info in enumerate(self.runner.progress) if "screenshots_for_test" in info
+        ]
+
+        self.assertEqual(order, ["A_test_x", "screenshots_A", "B_test_x", "screenshots_B"])
+        self.assertEqual(len(screenshot_events), 1)
+        self.assertEqual(
+            sum("tasks_complete" in info for info in self.runner.progress[:screenshot_events[0]]), 3
+        )
+
+    def test_test_reported_once_its_pages_screenshotted(self):
+        tests = {activity_name: [MagicMock(problematic_elements=[]) for _ in range(2)] for activity_name in ("A", "B")}
+        for activity_tests in tests.values():
+            activity_tests[0].name, activity_tests[1].name = "test_a", "test_b"
+        tasks = [
+            (0, _passing_task("A_test_a", test_name="test_a")),
+            (1, _passing_task("A_test_b", test_name="test_b")),
+            (2, _passing_task("B_test_b", test_name="test_b")),
+        ]
+        for activity_name, test_names in (("A", ["test_a", "test_b"]), ("B", ["test_b"])):
+            tasks.append((SCREENSHOT_PRIORITY, ParallelTask(
+                lambda webdriver_instance, dependencies: ("PASS", None), "screenshots_" + activity_name,
+                depends=[activity_name + "_" + test_name for test_name in test_names], screenshot_tests=test_names
+            )))
+        test_queue = TestQueue(tasks, tests, [], [], cancelled_tests=[], do_interim_results=True)
+
+        order = [name for name, _ in self._run(test_queue)]
+        events = [info for info in self.runner.progress if "screenshots_for_test" in info or "tasks_complete" in info]
+
+        # * test_a ran on page A only, it is reported before the tests of page B are run
+        self.assertEqual(order, ["A_test_a", "A_test_b", "screenshots_A", "B_test_b", "screenshots_B"])
+        self.assertEqual(
+            [info["screenshots_for_test"].name if "screenshots_for_test" in info else "done" for info in events],
+            ["done", "done", "test_a", "done", "done", "test_b", "done"]
+        )
+
+
+class FormTestQueueTestCase(unittest.TestCase):
+    @staticmethod
+    def _activity(name, url="https://example.com", page_resolution=None):
+        return Activity(
+            name=name, url=url, options="", page_after_login=None, commands=[], page_resolution=page_resolution
+        )
+
+    @staticmethod
+    def _test(name):
+        test = MagicMock()
+        test.name = name
+        test.depends = []
+        test.webdriver_restart_required = False
+        return test
+
+    def test_identical_activities_share_locator_task(self):
+        activities = [
+            self._activity("Main Page_Main Activity"),
+            self._activity("Copy Page_Main Activity"),
+            self._activity("Small Page_Main Activity", page_resolution="800x600"),
+        ]
+        tests = {activity.name: [self._test("test_a")] for activity in activities}
+        tasks, _ = FormTestQueueCapsule(tests, activities, {"a"}, run_axe_tests=[]).form_test_queue(testing=True)
+
+        locator_tasks = [task.name for _, task in tasks if task.name.startswith("locator_")]
+        self.assertEqual(locator_tasks, ["locator_Main Page_Main Activity", "locator_Small Page_Main Activity"])
+        test_task = next(task for _, task in tasks if task.name == "Copy Page_Main Activity_test_a")
+        self.assertEqual(test_task.depends[0], "locator_Main Page_Main Activity")
+
+    def test_one_screenshot_task_per_activity(self):
+        activities = [self._activity("Main Page_Main Activity"), self._activity("Second Page_Main Activity")]
+        tests = {activity.name: [self._test("test_a"), self._test("test_b")] for activity in activities}
+        tasks, _ = FormTestQueueCapsule(tests, activities, {"a"}, run_axe_tests=[]).form_test_queue()
+
+        screenshot_tasks = [task for _, task in tasks if task.name.startswith("screenshots_")]
+        self.assertEqual({priority for priority, task in tasks if task in screenshot_tasks}, {SCREENSHOT_PRIORITY})
+        self.assertEqual(
+            [task.name for task in screenshot_tasks],
+            ["screenshots_Main Page_Main Activity", "screenshots_Second Page_Main Activity"]
+        )
+        self.assertEqual(
+            sorted(screenshot_tasks[1].depends),
+            ["Second Page_Main Activity_test_a", "Second Page_Main Activity_test_b"]
+        )
+        self.assertEqual(sorted(screenshot_tasks[1].screenshot_tests), ["test_a", "test_b"])
+
+
+class ModelPlanningTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tasks = [
+            (0, _passing_task("test_spacy_a", depends=["spacy_en_lg"])),
+            (1, _passing_task("test_spacy_b", depends=["spacy_en_lg"])),
+            (2, _passing_task("test_word2vec", depends=["word2vec_googlenews"])),
+            (3, _passing_task("test_free")),
+        ]
+
+    def _tasks_by_name(self):
+        return {task.name: (priority, task) for priority, task in self.tasks}
+
+    def test_models_loaded_together_when_they_fit(self):
+        _form_tasks_with_models(self.tasks, {"spacy_en_lg", "word2vec_googlenews"}, memory_budget_mb=10000)
+        tasks = self._tasks_by_name()
+
+        self.assertEqual(tasks["spacy_en_lg"][1].depends, [])
+        self.assertEqual(tasks["word2vec_googlenews"][1].depends, [])
+        self.assertEqual(tasks["test_spacy_a"][0], 0)
+        self.assertEqual(tasks["unload_spacy_en_lg"][1].depends, ["test_spacy_a", "test_spacy_b", "spacy_en_lg"])
+
+    def test_models_split_into_waves_over_budget(self):
+        _form_tasks_with_models(self.tasks, {"spacy_en_lg", "word2vec_googlenews"}, memory_budget_mb=4000)
+        tasks = self._tasks_by_name()
+
+        # spaCy has more dependent tests, so it is loaded first and its tests are prioritized
+        self.assertEqual(tasks["spacy_en_lg"][1].depends, [])
+        self.assertEqual(tasks["word2vec_googlenews"][1].depends, ["unload_spacy_en_lg"])
+        self.assertLess(tasks["test_spacy_b"][0], tasks["test_free"][0])
+        self.assertEqual(tasks["test_word2vec"][0], 2)
+
+    def test_models_used_by_one_task_share_a_wave(self):
+        self.tasks.append((4, _passing_task("test_both", depends=["spacy_en_lg", "word2vec_googlenews"])))
+        _form_tasks_with_models(self.tasks, {"spacy_en_lg", "word2vec_googlenews"}, memory_budget_mb=0)
+        tasks = self._tasks_by_name()
+
+        self.assertEqual(tasks["spacy_en_lg"][1].depends, [])
+        self.assertEqual(tasks["word2vec_googlenews"][1].depends, [])
+        self.assertIn("test_both", tasks["unload_spacy_en_lg"][1].depends)
+        self.assertIn("test_both", tasks["unload_word2vec_googlenews"][1].depends)
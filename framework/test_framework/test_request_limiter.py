@@ -0,0 +1,107 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+import unittest
+
+from framework.request_limiter import RequestLimiter, RemoteRequestLimiter
+
+INTERVAL = 0.2
+
+
+def _worker_requests(connection, count):
+    limiter = RemoteRequestLimiter(connection)
+    for _ in range(count):
+        limiter.delay_access(url="https://example.com")
+
+
+class RequestLimiterTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.limiter = RequestLimiter(INTERVAL)
+
+    def test_no_restrictions(self):
+        limiter = RequestLimiter(0)
+        started = time.perf_counter()
+        for _ in range(10):
+            limiter.delay_access(url="https://example.com")
+
+        self.assertLess(time.perf_counter() - started, 0.05)
+        self.assertEqual(limiter.metrics()["requests"], 10)
+        self.assertEqual(limiter.metrics()["throttled_seconds"], 0)
+
+    def test_requests_to_one_host_spaced(self):
+        started = time.perf_counter()
+        for _ in range(3):
+            self.limiter.delay_access(url="https://example.com/page")
+
+        self.assertGreaterEqual(time.perf_counter() - started, 2 * INTERVAL * 0.9)
+
+    def test_hosts_throttled_independently(self):
+        self.limiter.delay_access(url="https://example.com")
+        waiting = threading.Thread(target=self.limiter.delay_access, kwargs={"url": "https://example.com/other"})
+        waiting.start()
+
+        # * The waiting thread sleeps without the lock, another host is not held up
+        time.sleep(INTERVAL / 4)
+        started = time.perf_counter()
+        self.limiter.delay_access(url="https://example.org")
+        self.assertLess(time.perf_counter() - started, INTERVAL / 4)
+        waiting.join()
+
+        metrics = self.limiter.metrics()
+        self.assertEqual(metrics["throttled_requests"], 1)
+        self.assertEqual(list(metrics["throttled_seconds_by_host"]), ["example.com"])
+
+    def test_concurrent_requests_queue_up(self):
+        finished = []
+
+        def request():
+            self.limiter.delay_access(url="https://example.com")
+            finished.append(time.perf_counter())
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=request) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        delays = sorted(moment - started for moment in finished)
+        for number, delay in enumerate(delays):
+            self.assertAlmostEqual(delay, number * INTERVAL, delta=INTERVAL / 2)
+
+    def test_unregistered_access_does_not_reserve(self):
+        self.limiter.delay_access(register=False, url="https://example.com")
+        self.limiter.delay_access(register=False, url="https://example.com")
+        self.limiter.register_request(url="https://example.com")
+
+        self.assertEqual(self.limiter.metrics()["throttled_requests"], 0)
+        self.assertEqual(self.limiter.metrics()["requests"], 1)
+
+    def test_async_access(self):
+        async def requests():
+            await asyncio.gather(*(self.limiter.delay_access_async(url="https://example.com") for _ in range(3)))
+
+        started = time.perf_counter()
+        asyncio.run(requests())
+
+        self.assertGreaterEqual(time.perf_counter() - started, 2 * INTERVAL * 0.9)
+        self.assertEqual(self.limiter.metrics()["throttled_requests"], 2)
+
+    def test_worker_processes_share_buckets(self):
+        context = multiprocessing.get_context("fork")
+        workers = []
+        started = time.perf_counter()
+        for _ in range(2):
+            connection, worker_connection = context.Pipe()
+            worker = context.Process(target=_worker_requests, args=(worker_connection, 2))
+            worker.start()
+            worker_connection.close()
+            threading.Thread(target=self.limiter.serve, args=(connection,), daemon=True).start()
+            workers.append(worker)
+        for worker in workers:
+            worker.join(timeout=10)
+
+        self.assertGreaterEqual(time.perf_counter() - started, 3 * INTERVAL * 0.9)
+        self.assertEqual(self.limiter.metrics()["requests"], 4)
+        self.assertEqual(self.limiter.metrics()["throttled_requests"], 3)
@@ -0,0 +1,96 @@
+import unittest
+from io import BytesIO
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+from framework.screenshot import screenshot
+from framework.screenshot.screenshot import Screenshot, JS_VIEWPORT_RECTS
+
+VIEWPORT_WIDTH, VIEWPORT_HEIGHT = 400, 300
+
+
+class FakeDriver:
+    """Page of a fixed height, elements are absolutely positioned rects"""
+
+    def __init__(self, page_rects):
+        self.page_rects = page_rects
+        self.scroll_y = 0
+        self.captures = 0
+        self.current_url = "https://example.com"
+
+    def execute_script(self, script, *args):
+        if script == JS_VIEWPORT_RECTS:
+            rects = [
+                dict(self.page_rects[element], y=self.page_rects[element]["y"] - self.scroll_y, displayed=True)
+                for element in args[0]
+            ]
+            viewport = {"scroll_x": 0, "scroll_y": self.scroll_y, "width": VIEWPORT_WIDTH, "height": VIEWPORT_HEIGHT}
+            return rects + [viewport]
+        if script.startswith("window.scrollTo"):
+            self.scroll_y = float(script[len("window.scrollTo(0, "):-1])
+
+    def get_screenshot_as_png(self):
+        self.captures += 1
+        # * Every row is painted with its page coordinate, so crops can be traced back to the scroll offset
+        rows = (np.arange(VIEWPORT_HEIGHT) + int(self.scroll_y)) % 256
+        pixels = np.repeat(rows[:, None, None], VIEWPORT_WIDTH, axis=1).repeat(3, axis=2).astype(np.uint8)
+        buffer = BytesIO()
+        Image.fromarray(pixels).save(buffer, format="PNG")
+        return buffer.getvalue()
+
+
+class FakeElement:
+    def __init__(self, name):
+        self.name = name
+        self.source = f"<div id='{name}'>"
+
+    def get_element(self, driver):
+        return self.name
+
+
+@mock.patch.object(screenshot, "sleep", lambda delay: None)
+class BatchScreenshotTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.driver = FakeDriver({
+            "header": {"x": 10, "y": 10, "width": 100, "height": 40},
+            "menu": {"x": 10, "y": 100, "width": 100, "height": 40},
+            "footer": {"x": 10, "y": 900, "width": 100, "height": 40},
+            "hidden_right": {"x": 500, "y": 10, "width": 100, "height": 40},
+        })
+
+    def test_elements_grouped_by_viewport(self):
+        groups = Screenshot._group_by_viewport(
+            {number: self.driver.page_rects[name] for number, name in enumerate(["footer", "header", "menu"])},
+            VIEWPORT_HEIGHT
+        )
+
+        self.assertEqual(groups, [(0, [1, 2]), (825, [0])])
+
+    def test_one_capture_per_viewport(self):
+        elements = [FakeElement(name) for name in ["header", "footer", "menu", "hidden_right"]]
+
+        images = Screenshot(self.driver, elements).batch_elements(elements, draw=False)
+
+        self.assertEqual(self.driver.captures, 2)
+        self.assertEqual(sorted(images), [0, 1, 2])
+        self.assertEqual(images[0].size, (VIEWPORT_WIDTH, VIEWPORT_HEIGHT))
+        # * The footer is cropped from the capture taken at its own scroll offset
+        self.assertEqual(np.asarray(images[1])[0, 0, 0], 825 % 256)
+
+    def test_interaction_elements_captured_individually(self):
+        elements = [
+            {"element": FakeElement("header")},
+            {"element": FakeElement("menu"), "interaction_sequence": []},
+            {"element": FakeElement("hidden_right")},
+        ]
+        shot = Screenshot(self.driver, elements)
+
+        with mock.patch.object(shot, "_prepare_and_try_element_screenshot", return_value=None) as individual:
+            images = shot.get_images()
+
+        self.assertEqual(self.driver.captures, 1)
+        self.assertEqual([call.args[0] for call in individual.call_args_list], [elements[1], elements[2]])
+        self.assertIsNotNone(images[0])
+        self.assertEqual(images[1:], [None, None])
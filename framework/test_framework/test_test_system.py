@@ -0,0 +1,62 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from framework import xlsdata
+from framework.test_system import TestRegistry
+
+TEST_MODULE = '''
+framework_version = 5
+webdriver_restart_required = False
+elements_type = "link"
+depends = ["spacy_en_lg"]
+
+
+def test(webdriver_instance, activity, element_locator):
+    return {"status": "PASS"}
+'''
+
+
+@mock.patch.object(xlsdata, "get_data_for_issue", return_value={"issue_type": "Test issue", "WCAG": "1.1.1"})
+class TestRegistryTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tests_dir = tempfile.TemporaryDirectory()
+        os.mkdir(os.path.join(self.tests_dir.name, "links"))
+        with open(os.path.join(self.tests_dir.name, "links", "test_link.py"), "w") as test_file:
+            test_file.write(TEST_MODULE)
+        with open(os.path.join(self.tests_dir.name, "links", "test_broken.py"), "w") as test_file:
+            test_file.write("def broken(:\n")
+        self.registry = TestRegistry(self.tests_dir.name)
+
+    def tearDown(self) -> None:
+        self.tests_dir.cleanup()
+
+    def test_module_imported_once(self, get_data_for_issue):
+        with mock.patch.object(
+                importlib.util, "spec_from_file_location", wraps=importlib.util.spec_from_file_location
+        ) as spec_from_file_location:
+            first = self.registry.get_tests(["test_link"], None)
+            second = self.registry.get_tests(["test_link"], ["links"])
+
+        spec_from_file_location.assert_called_once()
+        self.assertEqual([test.name for test in first], ["test_link"])
+        self.assertEqual(second[0].depends, ["spacy_en_lg"])
+        self.assertFalse(second[0].webdriver_restart_required)
+
+    def test_instances_do_not_share_run_state(self, get_data_for_issue):
+        first, = self.registry.get_tests(["test_link"], None)
+        second, = self.registry.get_tests(["test_link"], None)
+        first.problematic_elements.append({"element": None})
+        first.depends.append("test_other")
+        first.status = "FAIL"
+
+        self.assertIs(first.test_func, second.test_func)
+        self.assertEqual(second.problematic_elements, [])
+        self.assertEqual(second.depends, ["spacy_en_lg"])
+        self.assertEqual(second.status, "READY")
+
+    def test_broken_module_skipped(self, get_data_for_issue):
+        self.assertEqual([test.name for test in self.registry.get_tests(None, ["links"])], ["test_link"])
+        self.assertIsNone(self.registry.loaded_tests[("links", "test_broken.py")])
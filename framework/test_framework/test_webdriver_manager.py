@@ -0,0 +1,95 @@
+import unittest
+from unittest import mock
+from unittest.mock import MagicMock
+
+from selenium.common.exceptions import WebDriverException
+
+from framework import request_limiter
+from framework.webdriver_manager import WebdriverManager
+
+
+def _fake_driver():
+    driver = MagicMock()
+    driver.window_handles = ["main"]
+    driver.capabilities = {}
+    return driver
+
+
+@mock.patch.object(WebdriverManager, "_try_to_run", side_effect=lambda: _fake_driver())
+class WebdriverManagerTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.manager = WebdriverManager(request_limiter.RequestLimiter(0), max_tasks_per_driver=2)
+
+    def test_prewarm_fills_pool(self, try_to_run):
+        self.manager.prewarm(3)
+        drivers = [self.manager.request() for _ in range(3)]
+
+        self.assertEqual(try_to_run.call_count, 3)
+        self.assertEqual(len(set(map(id, drivers))), 3)
+        self.assertEqual(len(self.manager.active_instances), 3)
+
+    def test_released_driver_is_reset_and_reused(self, try_to_run):
+        driver = self.manager.request()
+        self.manager.release(driver)
+
+        self.assertIs(self.manager.request(), driver)
+        driver.delete_all_cookies.assert_called_once()
+        driver.get.assert_called_with("about:blank")
+        self.assertFalse(driver.authenticated)
+
+    def test_cookies_of_all_domains_removed(self, try_to_run):
+        driver = self.manager.request()
+        self.manager.release(driver)
+
+        driver.context.assert_called_once_with(driver.CONTEXT_CHROME)
+        self.assertIn("Services.cookies.removeAll()", driver.execute_script.call_args_list[-1].args[0])
+
+    def test_unhealthy_driver_is_replaced(self, try_to_run):
+        driver = self.manager.request()
+        driver.execute_script.side_effect = WebDriverException("browser crashed")
+
+        self.assertFalse(self.manager.task_done(driver))
+
+        self.assertNotIn(driver, self.manager.active_instances)
+        driver.quit.assert_called_once()
+        self.assertIsNot(self.manager.request(), driver)
+
+    def test_driver_recycled_after_max_tasks(self, try_to_run):
+        other_driver = self.manager.request()
+        driver = self.manager.request()
+
+        self.assertTrue(self.manager.task_done(driver))
+        driver.delete_all_cookies.assert_not_called()
+        self.assertFalse(self.manager.task_done(driver))
+
+        driver.quit.assert_called_once()
+        # * The replacement is started although another browser is active
+        self.assertIsNot(self.manager.request(), driver)
+        self.assertEqual(try_to_run.call_count, 3)
+        self.assertIn(other_driver, self.manager.active_instances)
+
+    def test_fresh_request_replaces_used_driver(self, try_to_run):
+        driver = self.manager.request()
+        self.manager.task_done(driver)
+        self.manager.release(driver)
+
+        fresh_driver = self.manager.request(fresh=True)
+
+        self.assertIsNot(fresh_driver, driver)
+        driver.quit.assert_called_once()
+        self.assertEqual(self.manager.active_instances, [fresh_driver])
+
+    def test_fresh_request_takes_unused_driver(self, try_to_run):
+        self.manager.prewarm(2)
+        used_driver = self.manager.request()
+        self.manager.task_done(used_driver)
+        self.manager.release(used_driver)
+
+        self.assertIsNot(self.manager.request(fresh=True), used_driver)
+        with self.manager.lock:
+            while self.manager.prewarming > 0:
+                self.manager.driver_available.wait(timeout=5)
+
+        # The used driver is replaced with a fresh spare in the background
+        used_driver.quit.assert_called_once()
+        self.assertTrue(self.manager.has_fresh_instance())
@@ -0,0 +1,111 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from framework.libs.image_cache import ImageAnalysisCache
+from framework.tests.images.yolo import yolo_opencv
+from framework.tests.images.yolo.yolo_opencv import YoloDetector, non_max_suppression
+
+CLASSES = ["person", "car", "dog"]
+ROWS = 4
+
+
+def _detection(x, y, w, h, class_id, confidence):
+    detection = np.zeros(5 + len(CLASSES), dtype=np.float32)
+    detection[:4] = x, y, w, h
+    detection[5 + class_id] = confidence
+    return detection
+
+
+class FakeNet:
+    """Returns prepared detections for every image of the blob, stacked in 2D like older OpenCV versions"""
+
+    def __init__(self, detections):
+        self.detections = detections
+        self.forward_calls = 0
+        self.blob = None
+
+    @staticmethod
+    def getLayerNames():
+        return ["conv", "yolo"]
+
+    @staticmethod
+    def getUnconnectedOutLayers():
+        return [[2]]
+
+    def setInput(self, blob):
+        self.blob = blob
+
+    def forward(self, layers):
+        self.forward_calls += 1
+        rows = [self.detections[round(image[0, 0, 0] / yolo_opencv.SCALE / 100)] for image in self.blob]
+        return [np.concatenate(rows)]
+
+
+def _image(number):
+    # * The image number is painted in the pixels, so the fake network can tell the images of the blob apart
+    image = np.zeros((50, 80, 3), dtype=np.uint8)
+    image[:, :] = number * 100
+    return image
+
+
+class YoloDetectorTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        empty = [_detection(0, 0, 0, 0, 0, 0)] * ROWS
+        overlapping = [
+            _detection(0.5, 0.5, 0.4, 0.4, 1, 0.8),
+            _detection(0.52, 0.5, 0.4, 0.4, 1, 0.9),
+            _detection(0.1, 0.1, 0.1, 0.1, 2, 0.3),
+            _detection(0.9, 0.9, 0.1, 0.1, 0, 0.6),
+        ]
+        same_place = [_detection(0.5, 0.5, 0.4, 0.4, 2, 0.7)] + empty[1:]
+        self.net = FakeNet([np.stack(empty), np.stack(overlapping), np.stack(same_place)])
+        self.detector = YoloDetector(batch_size=2)
+        self.detector.classes = CLASSES
+        self.cache_dir = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(
+            yolo_opencv, "cached_image_analysis", ImageAnalysisCache(Path(self.cache_dir.name) / "images.sqlite3")
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self) -> None:
+        self.cache_dir.cleanup()
+
+    def test_nms_keeps_best_box(self):
+        boxes = np.array([[0, 0, 10, 10], [1, 0, 10, 10], [20, 20, 5, 5]], dtype=np.float32)
+
+        keep = non_max_suppression(boxes, np.array([0.6, 0.9, 0.5]), 0.4)
+
+        self.assertEqual(list(keep), [1, 2])
+
+    def test_batches_detected_with_one_load(self):
+        with mock.patch.object(yolo_opencv.cv2.dnn, "readNet", return_value=self.net) as read_net, \
+                mock.patch("builtins.open", mock.mock_open(read_data="\n".join(CLASSES))):
+            results = self.detector.detect([_image(1), None, _image(2), _image(0), _image(1)])
+
+        read_net.assert_called_once()
+        self.assertEqual(self.net.forward_calls, 2)
+        self.assertEqual(results, [["car", "person"], [], ["dog"], [], ["car", "person"]])
+
+    def test_known_images_not_detected_again(self):
+        with mock.patch.object(yolo_opencv.cv2.dnn, "readNet", return_value=self.net), \
+                mock.patch("builtins.open", mock.mock_open(read_data="\n".join(CLASSES))):
+            self.detector.detect([_image(1), _image(2)])
+            results = self.detector.detect([_image(2), _image(1)])
+
+        self.assertEqual(self.net.forward_calls, 1)
+        self.assertEqual(results, [["dog"], ["car", "person"]])
+
+    def test_images_detected_again_by_new_version(self):
+        with mock.patch.object(yolo_opencv.cv2.dnn, "readNet", return_value=self.net), \
+                mock.patch("builtins.open", mock.mock_open(read_data="\n".join(CLASSES))):
+            self.detector.detect([_image(1)])
+            with mock.patch.object(yolo_opencv, "ANALYSIS_VERSION", yolo_opencv.ANALYSIS_VERSION + 1):
+                results = self.detector.detect([_image(1)])
+
+        self.assertEqual(self.net.forward_calls, 2)
+        self.assertEqual(results, [["car", "person"]])
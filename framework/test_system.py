@@ -1,5 +1,6 @@
 import logging
-from typing import List, Optional
+import threading
+from typing import List, Optional, Dict, Tuple
 import importlib.util
 from framework import axe_integration, xlsdata
 import traceback
@@ -11,38 +12,80 @@ from framework import test
 logger = logging.getLogger("framework.test_system")
 
 
-def discover_tests(filter_test: Optional[List[str]], filter_category: Optional[List[str]]) -> List[test.Test]:
-    logger.info("=>Loading tests")
-    tests = list()
-    test_cat_names = os.listdir("framework/"+test.TESTDIR_NAME)
-    for test_cat_name in test_cat_names:
-        if filter_category is not None and test_cat_name not in filter_category:
-            continue
-
-        test_cat_dir = os.path.join("framework/"+test.TESTDIR_NAME, test_cat_name)
-        test_cat_file_names = os.listdir(test_cat_dir)
-        for test_cat_file_name in test_cat_file_names:
-            if test_cat_file_name.startswith("test_"):
-                if filter_test is not None and test_cat_file_name[:-3] not in filter_test:
-                    # print(f"===>SKIP")
+class TestRegistry:
+    """
+    Imports every test module once per process and keeps the loaded tests,
+    `discover_tests` hands out fresh clones of them for every activity.
+    """
+
+    def __init__(self, tests_dir: str = "framework/" + test.TESTDIR_NAME):
+        self.tests_dir = tests_dir
+        self.lock = threading.RLock()
+        self.file_names: Dict[str, List[str]] = {}
+        # None for tests that failed to load, so they are not imported again
+        self.loaded_tests: Dict[Tuple[str, str], Optional[test.Test]] = {}
+
+    def get_tests(self, filter_test: Optional[List[str]], filter_category: Optional[List[str]]) -> List[test.Test]:
+        tests = list()
+        with self.lock:
+            for test_cat_name, test_cat_file_names in self._list_test_files().items():
+                if filter_category is not None and test_cat_name not in filter_category:
                     continue
-                test_cat_file = os.path.join(test_cat_dir, test_cat_file_name)
-                logging.info(f"==>Loading test {test_cat_file_name}")
-                try:
-                    spec = importlib.util.spec_from_file_location(
-                        f"framework.{test.TESTDIR_NAME}.{test_cat_name}.{test_cat_file_name}"[:-3],
-                        test_cat_file
-                    )
-                    test_module = importlib.util.module_from_spec(spec)
-                    spec.loader.exec_module(test_module)
-                    tests.append(test.Test(test_module, test_cat_file_name, test_cat_name))
-                except SyntaxError:
-                    logger.error(f"===>Syntax error")
-                    logger.error(traceback.format_exc())
-                except Exception as e:
-                    logger.error(f"===>{e}")
-                    logger.error(traceback.format_exc())
+                for test_cat_file_name in test_cat_file_names:
+                    if filter_test is not None and test_cat_file_name[:-3] not in filter_test:
+                        continue
+                    loaded_test = self._load_test(test_cat_name, test_cat_file_name)
+                    if loaded_test is not None:
+                        tests.append(loaded_test.clone())
+        return tests
+
+    def clear(self) -> None:
+        with self.lock:
+            self.file_names.clear()
+            self.loaded_tests.clear()
+
+    def _list_test_files(self) -> Dict[str, List[str]]:
+        if not self.file_names:
+            for test_cat_name in os.listdir(self.tests_dir):
+                test_cat_dir = os.path.join(self.tests_dir, test_cat_name)
+                if os.path.isdir(test_cat_dir):
+                    self.file_names[test_cat_name] = [
+                        file_name for file_name in os.listdir(test_cat_dir) if file_name.startswith("test_")
+                    ]
+        return self.file_names
+
+    def _load_test(self, test_cat_name: str, test_cat_file_name: str) -> Optional[test.Test]:
+        key = (test_cat_name, test_cat_file_name)
+        if key in self.loaded_tests:
+            return self.loaded_tests[key]
+
+        test_cat_file = os.path.join(self.tests_dir, test_cat_name, test_cat_file_name)
+        logging.info(f"==>Loading test {test_cat_file_name}")
+        loaded_test = None
+        try:
+            spec = importlib.util.spec_from_file_location(
+                f"framework.{test.TESTDIR_NAME}.{test_cat_name}.{test_cat_file_name}"[:-3],
+                test_cat_file
+            )
+            test_module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(test_module)
+            loaded_test = test.Test(test_module, test_cat_file_name, test_cat_name)
+        except SyntaxError:
+            logger.error(f"===>Syntax error")
+            logger.error(traceback.format_exc())
+        except Exception as e:
+            logger.error(f"===>{e}")
+            logger.error(traceback.format_exc())
+        self.loaded_tests[key] = loaded_test
+        return loaded_test
+
+
+test_registry = TestRegistry()
 
+
+def discover_tests(filter_test: Optional[List[str]], filter_category: Optional[List[str]]) -> List[test.Test]:
+    logger.info("=>Loading tests")
+    tests = test_registry.get_tests(filter_test, filter_category)
     logger.info(">Done")
 
     return tests
@@ -7,7 +7,7 @@ from selenium.webdriver.firefox.webelement import FirefoxWebElement
 from framework.activity import Activity
 from framework.element_locator import ElementLocator
 from framework.element import Element
-from framework.libs.spacy_model_interface import create_doc
+from framework.libs.spacy_model_interface import create_docs
 from framework.libs.distance_between_elements import distance
 from framework.libs.is_visible import is_visible
 
@@ -158,8 +158,8 @@ def check_clarifications(captcha, driver, model_wrapper):
     """
     alt = captcha.get_attribute(driver, 'alt')
     if alt and len(alt) >= 5:
-        scale_vector = create_doc(
-            model_wrapper, ' '.join(['captcha', 'verification', 'robot', 'submit', 'verify'])).vector
-        alt_vector = create_doc(model_wrapper, alt).vector
+        scale_doc, alt_doc = create_docs(
+            model_wrapper, [' '.join(['captcha', 'verification', 'robot', 'submit', 'verify']), alt])
+        scale_vector, alt_vector = scale_doc.vector, alt_doc.vector
         similarity = np.dot(alt_vector, scale_vector) / (np.linalg.norm(alt_vector) * np.linalg.norm(scale_vector))
         return similarity > 0.7
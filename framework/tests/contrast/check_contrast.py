@@ -1,3 +1,9 @@
+import numpy as np
+
+# sensitivity of the human eye to individual components of light (R,G,B)
+LUMINANCE_ODDS = np.array([0.2126, 0.7152, 0.0722])
+
+
 def contrast(background, text):
     background = relative_luminance(background)
     text = relative_luminance(text)
@@ -16,4 +22,17 @@ def relative_luminance(rgb):
 def linear_value(color):
     if color <= 0.03928:
         return color / 12.92
-    return ((color + 0.055) / 1.055) ** 2.4
\ No newline at end of file
+    return ((color + 0.055) / 1.055) ** 2.4
+
+
+def relative_luminances(rgb: np.ndarray) -> np.ndarray:
+    """`relative_luminance` for an array of colors, one color in 0..1 RGB per row"""
+    linear = np.where(rgb <= 0.03928, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    return linear @ LUMINANCE_ODDS
+
+
+def contrast_ratios(backgrounds: np.ndarray, texts: np.ndarray) -> np.ndarray:
+    """`contrast` for every row pair of two arrays of colors"""
+    background = relative_luminances(np.asarray(backgrounds, dtype=float).reshape(-1, 3)) + 0.05
+    text = relative_luminances(np.asarray(texts, dtype=float).reshape(-1, 3)) + 0.05
+    return np.maximum(background / text, text / background)
@@ -2,22 +2,97 @@ import re
 import time
 import unicodedata
 import tempfile
-from typing import List
+from typing import List, Tuple
 
+import numpy as np
 from selenium import webdriver
 from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.support.color import Color
 from selenium.common.exceptions import WebDriverException
 from selenium.webdriver import ActionChains
 
-from framework.element import Element
+from framework.element import Element, ElementLostException, JS_SNAPSHOT_FUNCTIONS
 from framework.element_locator import ElementLocator
 from framework.element_wrapper import ElementWrapper
 from framework.screenshot.screenshot import Screenshot
-from framework.tests.contrast.check_contrast import contrast
+from framework.tests.contrast.check_contrast import contrast_ratios
 
 TIMEOUT = 2.0
 EPSILON = 0.105
+CANDIDATES_XPATH = "//body//*[not(child::*[normalize-space(text())])]"
+
+# Everything the contrast check reads from an element, resolved in the page in one pass
+JS_CONTRAST_FUNCTIONS = (
+    '''
+    function resolveBackground(element) {
+        // Closest background color, a pseudo element background or a gradient, in this order
+        var gradient = [];
+        var pseudoBackground = "";
+        for (var node = element; node && node.nodeType === Node.ELEMENT_NODE; node = node.parentElement) {
+            var style = window.getComputedStyle(node);
+            var backgroundColor = style.getPropertyValue("background-color");
+            if (backgroundColor && backgroundColor !== "rgba(0, 0, 0, 0)")
+                return [backgroundColor];
+            for (var pseudo of ["::after", "::before"]) {
+                var pseudoStyle = window.getComputedStyle(node, pseudo);
+                var background = pseudoStyle.getPropertyValue("background-color");
+                if (!pseudoBackground && background.startsWith("rgb(") && pseudoStyle.getPropertyValue("opacity") !== "0")
+                    pseudoBackground = background;
+            }
+            var backgroundImage = style.getPropertyValue("background-image");
+            if (backgroundImage.startsWith("linear-gradient") && !gradient.length)
+                gradient = backgroundImage.match(/rgb\\(.*?\\)/g) || backgroundImage.match(/rgba\\(.*?\\)/g) || [];
+        }
+        return pseudoBackground ? [pseudoBackground] : gradient;
+    }
+    function contrastStyles(element) {
+        var style = window.getComputedStyle(element);
+        var rect = element.getBoundingClientRect();
+        var ancestors = [];
+        for (var node = element.parentElement; node && ancestors.length < 3; node = node.parentElement) {
+            var ancestorRect = node.getBoundingClientRect();
+            ancestors.push([buildSelector(node), ancestorRect.width, ancestorRect.height]);
+        }
+        return {
+            tag: element.tagName.toLowerCase(),
+            text: element.innerText || "",
+            x: Math.round(rect.left + window.pageXOffset),
+            y: Math.round(rect.top + window.pageYOffset),
+            width: rect.width,
+            height: rect.height,
+            displayed: isDisplayed(element),
+            image_context: element.closest("img, svg") !== null || element.querySelector("img, svg") !== null
+                || (element.children.length === 0 && style.getPropertyValue("background-image") !== "none"),
+            ancestors: ancestors,
+            color: style.getPropertyValue("color"),
+            opacity: style.getPropertyValue("opacity"),
+            parent_opacity: element.parentElement
+                ? window.getComputedStyle(element.parentElement).getPropertyValue("opacity") : "1",
+            font_size: style.getPropertyValue("font-size"),
+            font_weight: style.getPropertyValue("font-weight"),
+            overflow: style.getPropertyValue("overflow"),
+            before_content: window.getComputedStyle(element, "::before").getPropertyValue("content"),
+            backgrounds: resolveBackground(element)
+        };
+    }
+    '''
+)
+
+JS_CONTRAST_CANDIDATES = JS_SNAPSHOT_FUNCTIONS + JS_CONTRAST_FUNCTIONS + (
+    '''
+    var found = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    var candidates = [];
+    for (var i = 0; i < found.snapshotLength; i++)
+        candidates.push([snapshotEntry(found.snapshotItem(i)), contrastStyles(found.snapshotItem(i))]);
+    return candidates;
+    '''
+)
+
+JS_CONTRAST_STYLES = JS_SNAPSHOT_FUNCTIONS + JS_CONTRAST_FUNCTIONS + (
+    '''
+    return arguments[0].map(contrastStyles);
+    '''
+)
 
 
 class FramesContrast:
@@ -97,63 +172,56 @@ class FramesContrast:
         time.sleep(timeout)
         return True
 
-    def action(self, action: str, element: ElementWrapper, timeout: float = TIMEOUT, with_scroll: bool = True):
+    def action(self, action: str, element: ElementWrapper, y: float, timeout: float = TIMEOUT):
         """
         scroll before action, sleep and imitate action('focus' or 'hover')
         :param action: str, 'focus' or 'hover'
         :param element: ElementWrapper
+        :param y: float, vertical position of the element on the page
         :param timeout: float
-        :param with_scroll: bool, 'true' if need scroll before action
         :return: bool ('true' if the action was performed without errors)
         """
-        if with_scroll:
-            self._dr.execute_script(
-                f"window.scrollTo(0, {list(element.location)[1] - 0.5 * self._dr.get_window_size()['height']})")
-            time.sleep(1)
+        self._dr.execute_script(f"window.scrollTo(0, {y - 0.5 * self._dr.get_window_size()['height']})")
+        time.sleep(1)
         if action == 'focus':
             return self.focus(element.element, timeout)
         elif action == 'hover':
             return self.hover(element.element, timeout)
 
     @staticmethod
-    def is_image(text: str, element: WebElement):
+    def is_image(text: str, styles: dict):
         """
         checking that the element is an image
         :param text: (str)
-        :param element: (WebElement)
+        :param styles: (dict) element styles collected by JS_CONTRAST_FUNCTIONS
         :return: bool
         """
-        image_tags = {'img', 'svg'}
-        return (element.tag_name in image_tags
-                or set([e.tag_name for e in element.find_elements_by_xpath("ancestor::*")]).intersection(image_tags)
-                or set([e.tag_name for e in element.find_elements_by_xpath("descendant::*")]).intersection(image_tags)
-                or (not element.find_elements_by_xpath('child::*')
-                    and element.value_of_css_property("background-image") != 'none')) and not text
+        return styles["image_context"] and not text
 
-    def get_pseudo_element_attribute(self, pseudo: str, element: WebElement, attr: str = 'content') -> str:
-        return self._dr.execute_script(
-            f"return window.getComputedStyle(arguments[0], ':{pseudo}').getPropertyValue('{attr}');", element)
+    @staticmethod
+    def is_visible(styles: dict):
+        return styles["height"] > 1 and styles["width"] > 1 and styles["x"] >= 0 and styles["y"] >= 0 \
+               and styles["displayed"]
 
-    def check_severity(self, wrap: ElementWrapper):
-        return not wrap.text.strip() and not self.text_is_visible(wrap) and \
-               self.get_pseudo_element_attribute("before", wrap.element) not in ['none', '""']
+    def check_severity(self, styles: dict):
+        return not styles["text"].strip() and not self.text_is_visible(styles) and \
+               styles["before_content"] not in ['none', '""']
 
     @staticmethod
-    def text_is_visible(wrap: ElementWrapper):
-        return wrap.css_property("overflow") != "hidden" or (
-                wrap.element.size["height"] > 5 and wrap.element.size["width"] > 5)
+    def text_is_visible(styles: dict):
+        return styles["overflow"] != "hidden" or (styles["height"] > 5 and styles["width"] > 5)
 
-    def remove_hover(self, ancestors):
-        size = ancestors.pop().get_element(self._dr).size
+    def remove_hover(self, ancestor_size: Tuple[float, float]):
+        width, height = ancestor_size
         try:
-            ActionChains(self._dr).move_by_offset(0.6 * size['width'], 0.6 * size['height']).context_click().perform()
+            ActionChains(self._dr).move_by_offset(0.6 * width, 0.6 * height).context_click().perform()
         except WebDriverException:
             return False
         time.sleep(TIMEOUT)
 
-    def detect_graphic_object(self, text: str, wrap: ElementWrapper):
+    def detect_graphic_object(self, text: str, element: Element, styles: dict):
         return (text and all([unicodedata.category(i) == 'So' for i in text])) or not self.text_is_visible(
-            wrap) or (not text and wrap.framework_element.get_attribute(self._dr, "data-show-all-default") is None)
+            styles) or (not text and element.get_attribute(self._dr, "data-show-all-default") is None)
 
     def get_children(self, elem: Element):
         return elem.safe_operation_wrapper(lambda e: e.find_by_xpath("child::*", self._dr), on_lost=lambda: [])
@@ -170,99 +238,128 @@ class FramesContrast:
         descendants = sum([e['element'].find_by_xpath('descendant::*', self._dr) for e in bad_elements], [])
         return list(filter(lambda x: x['element'] not in descendants, bad_elements))
 
+    def candidates(self) -> List[list]:
+        """Elements without text children, with their styles, in a single script call"""
+        return [
+            [Element.from_snapshot_entry(entry, self._dr), styles]
+            for entry, styles in self._dr.execute_script(JS_CONTRAST_CANDIDATES, CANDIDATES_XPATH)
+        ]
+
+    def styles(self, elements: List[Element]) -> List[list]:
+        """Current styles of the elements that are still on the page, in a single script call"""
+        web_elements = []
+        for element in elements:
+            try:
+                web_elements.append((element, element.get_element(self._dr)))
+            except ElementLostException:
+                continue
+        styles = self._dr.execute_script(JS_CONTRAST_STYLES, [web_element for _, web_element in web_elements])
+        return [[element, element_styles] for (element, _), element_styles in zip(web_elements, styles)]
+
     def main(self, action):
-        bad_elements = {}
         checked_elements = []
-        bad_elements_with_gradient = []
-        elements = self._loc.get_all_by_xpath(self._dr, "//body//*[not(child::*[normalize-space(text())])]")
+        # Elements whose colors changed after the action: (element, styles, text, param, color, backgrounds)
+        changed_elements = []
         focused_elements = []
-        body = self._wrap(self._loc.get_all_by_xpath(self._dr, '//body')[0])
-        previous_element = None
-
-        def check_element(element):
-            analyzed_element = self._wrap(element)
-            text = analyzed_element.text.strip()
-            if not analyzed_element.is_visible or self.is_image(text, analyzed_element.element) \
-                    or analyzed_element.framework_element in checked_elements:
+        previous_styles = None
+
+        def check_element(candidate):
+            element, styles = candidate
+            text = styles["text"].strip()
+            if not self.is_visible(styles) or self.is_image(text, styles) or element in checked_elements:
                 return
 
-            nonlocal previous_element
-            if previous_element is not None:
-                ancestors = set(
-                    analyzed_element.framework_element.find_by_xpath('ancestor::*', self._dr)[-3:]).intersection(
-                    previous_element.framework_element.find_by_xpath('ancestor::*', self._dr)[-3:]
+            nonlocal previous_styles
+            if previous_styles is not None:
+                ancestors = set(map(tuple, styles["ancestors"])).intersection(
+                    map(tuple, previous_styles["ancestors"])
                 )
                 if ancestors and action == "focus":
-                    self.action(action, body, with_scroll=False)
+                    self.focus(self._dr.find_element_by_tag_name("body"), TIMEOUT)
                 elif ancestors:
-                    self.remove_hover(ancestors)
-
-            background_color_before_action = self.prepare_background_color(analyzed_element)
-            color_before_action = self.prepare_color(
-                analyzed_element, [int(x * 255) for x in background_color_before_action[0]])
-            if not self.action(action, analyzed_element) and action == 'focus' \
-                    and analyzed_element.element.tag_name in ['span', 'p']:
-                ancestor = self.get_ancestor(analyzed_element.framework_element)
+                    self.remove_hover(ancestors.pop()[1:])
+
+            background_color_before_action = self.prepare_background_color(styles)
+            color_before_action = self.prepare_color(styles, [int(x * 255) for x in background_color_before_action[0]])
+            if not self.action(action, self._wrap(element), styles["y"]) and action == 'focus' \
+                    and styles["tag"] in ['span', 'p']:
+                ancestor = self.get_ancestor(element)
                 if ancestor not in checked_elements:
                     focused_elements.append(ancestor)
                 return
 
             checked_elements.append(element)
-            previous_element = analyzed_element
-            if text and self.text_is_visible(analyzed_element):
-                bold = int(self.get_css(analyzed_element, "font-weight")) >= 700
-                size = float(re.search(r"\d+", self.get_css(analyzed_element, 'font-size'))[0])
+            previous_styles = styles
+            # Only the element the action was performed on is queried again
+            styles_after_action = self.styles([element])
+            if not styles_after_action:
+                return
+            styles_after_action = styles_after_action[0][1]
+            if text and self.text_is_visible(styles_after_action):
+                bold = int(styles_after_action["font_weight"]) >= 700
+                size = float(re.search(r"\d+", styles_after_action["font_size"])[0])
                 param = self.get_param(text, size, bold)
             else:
                 param = 3
 
-            color, background_colors = self.get_colors_value(analyzed_element, color_before_action, background_color_before_action)
-            if color is None:
+            background_colors = self.prepare_background_color(styles_after_action)
+            color = self.prepare_color(styles_after_action, [int(x * 255) for x in background_colors[0]])
+            if color == color_before_action and background_colors == background_color_before_action:
                 return
+            changed_elements.append((element, styles_after_action, text, param, color, background_colors))
+
+        Element.safe_foreach(self.candidates(), check_element)
+        Element.safe_foreach(self.styles(focused_elements), check_element)
+        return checked_elements, self.filter_bad_elements(self.find_bad_elements(action, changed_elements))
+
+    def find_bad_elements(self, action: str, changed_elements: List[tuple]) -> List[dict]:
+        """Computes contrast ratios of all changed elements at once and takes screenshots of the bad ones"""
+        if not changed_elements:
+            return []
+        background_counts = [len(background_colors) for *_, background_colors in changed_elements]
+        ratios = contrast_ratios(
+            [background for *_, background_colors in changed_elements for background in background_colors],
+            [color for *_, color, background_colors in changed_elements for _ in background_colors],
+        )
+        min_ratios = np.minimum.reduceat(ratios, np.cumsum([0] + background_counts[:-1]))
+
+        bad_elements = {}
+        bad_elements_with_gradient = []
+        for (element, styles, text, param, color, background_colors), min_ratio in zip(changed_elements, min_ratios):
             key = (tuple(color), tuple(tuple(i) for i in background_colors))
             if key in bad_elements and len(background_colors) <= 1:
-                return
+                continue
+
+            result, severity = self.check_odds(min_ratio, len(background_colors) > 1, param)
+            if not result:
+                continue
+            # The screenshot shows the element in the state the contrast was measured in
+            self.action(action, self._wrap(element), styles["y"])
+            file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
+            Screenshot(self._dr, element).single_element(draw=True).save(file.name)
+            if len(background_colors) <= 1:
+                bad_elements[key] = self.bad_element(element, styles, action, severity, file, text)
+            else:
+                bad_elements_with_gradient.append(self.bad_element(element, styles, action, severity, file, text))
+            file.close()
+        return bad_elements_with_gradient + list(bad_elements.values())
 
-            result, severity = self.check_odds(color, background_colors, param)
-            if result and len(background_colors) <= 1:
-                file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-                Screenshot(self._dr, element).single_element(draw=True).save(file.name)
-                bad_elements[key] = self.bad_element(analyzed_element, action, severity, file, text)
-                file.close()
-            elif result:
-                file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-                Screenshot(self._dr, element).single_element(draw=True).save(file.name)
-                bad_elements_with_gradient.append(self.bad_element(analyzed_element, action, severity, file, text))
-                file.close()
-
-        Element.safe_foreach(elements, check_element)
-        Element.safe_foreach(focused_elements, check_element)
-        return checked_elements, self.filter_bad_elements(bad_elements_with_gradient + list(bad_elements.values()))
-
-    def bad_element(self, analyzed_element, action, severity, file, text):
+    def bad_element(self, element, styles, action, severity, file, text):
         return {
-            "element": analyzed_element.framework_element,
+            "element": element,
             "problem": "Bad contrast",
-            "severity": "WARN" if severity or self.check_severity(analyzed_element) else "FAIL",
+            "severity": "WARN" if severity or self.check_severity(styles) else "FAIL",
             "screenshot": file.name,
-            "error_id": f"ObjectContrast{action.capitalize()}" if self.detect_graphic_object(text, analyzed_element)
+            "error_id": f"ObjectContrast{action.capitalize()}" if self.detect_graphic_object(text, element, styles)
                         else f"test_contrast_{action}"
         }
 
     @staticmethod
-    def check_odds(color, background_colors, odd):
-        # if len(background_colors) > 1 => this is gradient background
-        _contrast = min([contrast(color, i) for i in background_colors])
-        return (_contrast < odd or abs(_contrast - odd) < EPSILON, len(background_colors) > 1
+    def check_odds(_contrast, is_gradient, odd):
+        # gradient backgrounds are compared by the color with the lowest contrast
+        return (_contrast < odd or abs(_contrast - odd) < EPSILON, is_gradient
                 or (_contrast >= odd and abs(_contrast - odd) < EPSILON))
 
-    def get_colors_value(self, analyzed_element, color_before, background_color_before):
-        background_colors = self.prepare_background_color(analyzed_element)
-        color = self.prepare_color(analyzed_element, [int(x * 255) for x in background_colors[0]])
-        if color == color_before and background_colors == background_color_before:
-            return None, None
-        return color, background_colors
-
     @staticmethod
     def rgba_to_rgb(rgba, background=(255, 255, 255)):
         """
@@ -278,31 +375,32 @@ class FramesContrast:
         return self.rgba_to_rgb(list(map(float, re.findall(r"\d*\.\d+|\d+", color)))) if color.startswith('rgba(') \
             else re.findall(r"\d+", Color.from_string(color).rgb)
 
-    def prepare_background_color(self, analyzed_element: ElementWrapper):
+    def prepare_background_color(self, styles: dict):
         """
-        FIXME
-        :param analyzed_element:
-        :return:
+        Background colors of an element, several for gradients
+        :param styles: (dict) element styles collected by JS_CONTRAST_FUNCTIONS
+        :return: list: rgb colors with components in 0..1
         """
-        background_color = self.background(analyzed_element.framework_element)
+        background_color = styles["backgrounds"]
         return [list(map(lambda x: float(x) / 255, self.get_rgb_color(color))) for color in background_color] if \
             background_color else [[1, 1, 1]]
 
-    def get_opacity(self, analyzed_element: ElementWrapper):
-        opacity = self.get_css(analyzed_element, "opacity")
+    @staticmethod
+    def get_opacity(styles: dict):
+        opacity = styles["opacity"]
         if opacity == '1':
-            opacity = analyzed_element.element.find_element_by_xpath("parent::*").value_of_css_property("opacity")
+            opacity = styles["parent_opacity"]
         return opacity if opacity != '1' else None
 
-    def prepare_color(self, analyzed_element: ElementWrapper, background_color: List[int]):
+    def prepare_color(self, styles: dict, background_color: List[int]):
         """
         search color(color or background color)
         :param background_color:
-        :param analyzed_element: (ElementWrapper)
+        :param styles: (dict) element styles collected by JS_CONTRAST_FUNCTIONS
         :return: list: The List of rgb species prepared for contrast test.
         """
-        color = self.get_css(analyzed_element, "color")
-        opacity = self.get_opacity(analyzed_element)
+        color = styles["color"]
+        opacity = self.get_opacity(styles)
         if opacity is not None and color.startswith("rgb("):
             rgb = self.rgba_to_rgb(list(map(float, re.findall(r"\d*\.\d+|\d+", color))) + [float(opacity)],
                                    background_color)
@@ -310,40 +408,3 @@ class FramesContrast:
             rgb = self.rgba_to_rgb(list(map(float, re.findall(r"\d*\.\d+|\d+", color))), background_color) \
                 if color.startswith('rgba(') else re.findall(r"\d+", Color.from_string(color).rgb)
         return list(map(lambda x: int(x) / 255, rgb))
-
-    def background(self, element: ElementWrapper, gradient: List[int] = None, pseudo_background: str = ""):
-        """
-        Looks for the background color of an element, gradually moving to the parent until it finds a color
-
-        Warning:
-            If the site DOM is too nested (more than 1000 elements), a recursion error will occur.
-
-        Parameters:
-            element (ElementWrapper)
-            gradient
-            pseudo_background
-        Returns:
-            Str:  background-color
-        """
-        if element is None:
-            return [pseudo_background] if pseudo_background else gradient
-        if gradient is None:
-            gradient = []
-
-        wrap = self._wrap(element)
-        background_color = wrap.css_property('background-color')
-        if not background_color or background_color == 'rgba(0, 0, 0, 0)':
-            for pseudo in ['after', 'before']:
-                background = self.get_pseudo_element_attribute(pseudo, wrap.element, "background-color")
-                opacity = self.get_pseudo_element_attribute(pseudo, wrap.element, "opacity")
-                if not pseudo_background and background.startswith("rgb(") and opacity != "0":
-                    pseudo_background = background
-            background_image = wrap.css_property('background-image')
-            if background_image != 'none' and background_image.startswith('linear-gradient') and not gradient:
-                gradient = re.findall(r"rgb\(.*?\)", background_image) or re.findall(r"rgba\(.*?\)", background_image)
-            return self.background(wrap.framework_element.get_parent(self._dr), gradient, pseudo_background)
-        return [background_color]
-
-    @staticmethod
-    def get_css(wrap_element: ElementWrapper, css_property: str):
-        return wrap_element.css_property(css_property)
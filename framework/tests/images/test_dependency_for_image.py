@@ -175,18 +175,23 @@ def test(webdriver_instance: webdriver.Chrome, activity, element_locator: Elemen
         if img.safe_operation_wrapper(is_visible, on_element_lost)
     ]
 
-    counter = 1
+    files = []
     for obj in images:
-        print(f"\rFound images {counter}", end="", flush=True)
         file = get_image_element(webdriver_instance, obj)
 
         if wont_read_or_rgba(file):
             print("force_screenshot")
             file = get_image_element(webdriver_instance, obj, force_screenshot=True)
+        files.append(file)
+
+    # * All images of the page go through the network in batches
+    objects_of_images = yolo_opencv.object_detection_many([file.name for file in files])
 
+    counter = 1
+    for obj, file, objects in zip(images, files, objects_of_images):
+        print(f"\rFound images {counter}", end="", flush=True)
         filename = file.name
         histogram = colors_histogram(filename)
-        objects = yolo_opencv.object_detection(filename)
         text, rectangles, shape_img = get_text_from_image(filename)
         if text is None:
             return {"status": "NOTRUN", "message": "Tesseract was not installed and/or added to PATH"}
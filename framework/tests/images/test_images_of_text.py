@@ -6,11 +6,10 @@ from skimage.filters import threshold_yen, threshold_sauvola
 from skimage.exposure import rescale_intensity
 from scipy.signal import find_peaks
 
-from easyocr import Reader
-
 from selenium import webdriver
 
 from framework.libs.download_image import get_image_element, wont_read_or_rgba
+from framework.libs.ocr_engine import cached_ocr_engine
 from framework.element_locator import ElementLocator
 
 depends = []
@@ -21,6 +20,9 @@ framework_version = 5
 webdriver_restart_required = False
 elements_type = "image"
 
+# Part of the image analysis cache key, bumped with every change of the preprocessing or the verdict
+ANALYSIS_VERSION = 1
+
 test_data = [
     {
         "page_info": {"url": "images/images_of_text/page_bug_image_with_text.html"},
@@ -534,38 +536,18 @@ class TextFeaturePreprocessor:
                     lambda data: len(data[0]) > wordlen
                     and data[2] > self.probability_threshold
                     or data[2] > confidence_prob,
-                    reader.readtext(
-                        filename,
-                        **settings,
-                    ),
+                    reader.readtext([filename], **settings)[0],
                 )
             ]
 
-        try:
-            mag_ratio, recognized = self.best_magnification_data(self.best_mag_ratio, handle_recognized)
-        except RuntimeError:
-            self.recognize_text(gpu=False)
-
+        mag_ratio, recognized = self.best_magnification_data(self.best_mag_ratio, handle_recognized)
         self.best_mag_ratio = [mag_ratio]
 
         return recognized
 
     # * main for 'recognize'
-    def recognize_text(self, **kwargs):
-        config = dict(
-            lang_list=["en"],
-            gpu=True,
-            recog_network="standard",
-            user_network_directory=None,
-            model_storage_directory="/models/easy_ocr",  # !cannot unzip model
-            detector=True,
-            recognizer=True,
-            download_enabled=True,
-        )
-        for kw, val in kwargs.items():
-            config[kw] = val
-
-        reader = Reader(**config)
+    def recognize_text(self):
+        reader = cached_ocr_engine
 
         recognition_settings = dict(
             decoder="wordbeamsearch",
@@ -699,6 +681,12 @@ class TextFeaturePreprocessor:
         self.draw_result(recognized_data)
 
     def detect_text(self):
+        # * site-wide images like logos and banners are recognized once
+        result = cached_ocr_engine.cached(self.image, self.recognize_image, ANALYSIS_VERSION, self.large_image)
+        self.text_data = list(result["text_data"])
+        self.image_of_text = result["image_of_text"]
+
+    def recognize_image(self):
         if not self.large_image:
             self.image = self.make_square(self.make_square(self.image))
 
@@ -713,3 +701,4 @@ class TextFeaturePreprocessor:
 
         self.write_filtered_images()
         self.do_ocr()
+        return {"text_data": self.text_data, "image_of_text": self.image_of_text}
@@ -1,53 +1,175 @@
+import json
+import os
+import sys
+import time
+from threading import Lock
+from typing import List, Optional
+
 import cv2
 import numpy as np
 
+from framework.libs.image_cache import cached_image_analysis
+from framework.libs.image_hash import content_digest
 
 conf_threshold = 0.5
 nms_threshold = 0.4
 
+MODEL_PATH = '/models/yolo/'
+CONFIG_PATH = 'framework/tests/images/yolo/yolov3.cfg'
+INPUT_SIZE = (416, 416)
+SCALE = 0.00392
+# Part of the image analysis cache key with the model files, bumped with every change of the detection code
+ANALYSIS_VERSION = 1
+# Images per forward pass
+BATCH_SIZE = int(os.environ.get("YOLO_BATCH_SIZE", 8))
+
 
 def get_output_layers(net):
     layer_names = net.getLayerNames()
-    output_layers = [layer_names[i[0] - 1] for i in net.getUnconnectedOutLayers()]
-    return output_layers
+    # * [[i], ...] in older OpenCV versions, [i, ...] in newer ones
+    return [layer_names[i - 1] for i in np.array(net.getUnconnectedOutLayers()).flatten()]
+
+
+def non_max_suppression(boxes: np.ndarray, scores: np.ndarray, threshold: float) -> np.ndarray:
+    """Greedy NMS of [x, y, w, h] boxes, indices of the kept boxes in order of decreasing score"""
+    x1, y1 = boxes[:, 0], boxes[:, 1]
+    x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+    areas = boxes[:, 2] * boxes[:, 3]
+    order = np.argsort(-scores, kind='stable')
+
+    keep = []
+    while order.size:
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        overlap_w = np.maximum(0, np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]))
+        overlap_h = np.maximum(0, np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest]))
+        overlap = overlap_w * overlap_h
+        iou = overlap / np.maximum(areas[best] + areas[rest] - overlap, 1e-9)
+        order = rest[iou <= threshold]
+    return np.array(keep, dtype=int)
+
+
+class YoloDetector:
+    """YOLOv3 network loaded once per process, images are sent through it in batches"""
+
+    def __init__(self, model_path: str = MODEL_PATH, config_path: str = CONFIG_PATH, batch_size: int = BATCH_SIZE):
+        self.model_path = model_path
+        self.config_path = config_path
+        self.batch_size = batch_size
+        self.net = None
+        self.classes = None
+        self.output_layers = None
+        # * The network keeps its input between setInput and forward
+        self.lock = Lock()
+
+    def _load(self):
+        if self.net is not None:
+            return
+        with open(f'{self.model_path}yolov3.txt', 'r') as f:
+            self.classes = [line.strip() for line in f.readlines()]
+        self.net = cv2.dnn.readNet(f'{self.model_path}yolov3.weights', self.config_path)
+        self.output_layers = get_output_layers(self.net)
+
+    def version(self) -> str:
+        """Version of the detection code and the model files, without loading the network"""
+        fingerprints = [str(ANALYSIS_VERSION)]
+        for path in (f'{self.model_path}yolov3.weights', f'{self.model_path}yolov3.txt', self.config_path):
+            try:
+                stat = os.stat(path)
+                fingerprints.append(f"{stat.st_size}:{int(stat.st_mtime)}")
+            except OSError:
+                fingerprints.append("")
+        return "-".join(fingerprints)
+
+    def detect(self, images: List[Optional[np.ndarray]], use_cache: bool = True) -> List[List[str]]:
+        """
+        Names of the objects found on every image, unreadable (None) images have none.
+        Images analysed before, on other pages or in earlier jobs, are taken from the image analysis cache.
+        """
+        results = [[] if image is None else None for image in images]
+        params = json.dumps((self.version(), conf_threshold, nms_threshold))
+        image_hashes = {}
+        if use_cache:
+            for number, image in enumerate(images):
+                if image is not None:
+                    image_hashes[number] = content_digest(image)
+                    results[number] = cached_image_analysis.get(image_hashes[number], "yolo", params)
+        missing = [number for number, labels in enumerate(results) if labels is None]
+
+        for start in range(0, len(missing), self.batch_size):
+            numbers = missing[start:start + self.batch_size]
+            batch = [images[number] for number in numbers]
+            for number, labels in zip(numbers, self._detect_batch(batch)):
+                results[number] = labels
+                if use_cache:
+                    cached_image_analysis.put(image_hashes[number], "yolo", labels, params)
+        return results
+
+    def _detect_batch(self, images: List[np.ndarray]) -> List[List[str]]:
+        blob = cv2.dnn.blobFromImages(images, SCALE, INPUT_SIZE, (0, 0, 0), True, crop=False)
+        with self.lock:
+            self._load()
+            self.net.setInput(blob)
+            outs = self.net.forward(self.output_layers)
+
+        # * Older OpenCV versions stack the detections of all images in 2D
+        detections = np.concatenate([out.reshape(len(images), -1, out.shape[-1]) for out in outs], axis=1)
+        scores = detections[:, :, 5:]
+        class_ids = scores.argmax(axis=2)
+        confidences = scores.max(axis=2)
+        image_numbers, detection_numbers = np.nonzero(confidences > conf_threshold)
+        if not image_numbers.size:
+            return [[] for _ in images]
+
+        sizes = np.array([image.shape[1::-1] for image in images], dtype=np.float32)[image_numbers]
+        centers = detections[image_numbers, detection_numbers, :2] * sizes
+        dimensions = (detections[image_numbers, detection_numbers, 2:4] * sizes).astype(int).astype(np.float32)
+        boxes = np.hstack([centers.astype(int) - dimensions / 2, dimensions])
+
+        # * Boxes of different images are shifted apart, so a single NMS never suppresses across images
+        shift = (boxes[:, :2] + boxes[:, 2:]).max() - boxes[:, :2].min() + 1
+        shifted = boxes.copy()
+        shifted[:, :2] += image_numbers[:, None] * shift
+        keep = non_max_suppression(shifted, confidences[image_numbers, detection_numbers], nms_threshold)
+
+        results = [[] for _ in images]
+        for image_number, detection_number in zip(image_numbers[keep], detection_numbers[keep]):
+            results[image_number].append(str(self.classes[class_ids[image_number, detection_number]]))
+        return results
+
+
+detector = YoloDetector()
 
 
 def object_detection(image_name):
-    image = cv2.imread(image_name)
-    if image is None:
-        return []
-    width = image.shape[1]
-    height = image.shape[0]
-    scale = 0.00392
-
-    classes = None
-    path = '/models/yolo/'
-    with open(f'{path}yolov3.txt', 'r') as f:
-        classes = [line.strip() for line in f.readlines()]
-    net = cv2.dnn.readNet(f'{path}yolov3.weights',
-                          'framework/tests/images/yolo/yolov3.cfg')
-    blob = cv2.dnn.blobFromImage(image, scale, (416, 416), (0, 0, 0), True, crop=False)
-
-    net.setInput(blob)
-
-    outs = net.forward(get_output_layers(net))
-
-    class_ids = []
-    confidences = []
-    boxes = []
-
-    for out in outs:
-        for detection in out:
-            scores = detection[5:]
-            class_id = np.argmax(scores)
-            confidence = scores[class_id]
-            if confidence > 0.5:
-                center_x = int(detection[0] * width)
-                center_y = int(detection[1] * height)
-                w = int(detection[2] * width)
-                h = int(detection[3] * height)
-                class_ids.append(class_id)
-                confidences.append(float(confidence))
-                boxes.append([center_x - w / 2, center_y - h / 2, w, h])
-
-    return [str(classes[class_ids[i[0]]]) for i in cv2.dnn.NMSBoxes(boxes, confidences, conf_threshold, nms_threshold)]
\ No newline at end of file
+    return object_detection_many([image_name])[0]
+
+
+def object_detection_many(image_names: List[str]) -> List[List[str]]:
+    return detector.detect([cv2.imread(image_name) for image_name in image_names])
+
+
+def benchmark(image_folder: str, batch_sizes=(1, 4, 8, 16)):
+    """Detection time of the sample images in the folder with different batch sizes"""
+    image_names = sorted(
+        os.path.join(image_folder, name) for name in os.listdir(image_folder)
+        if name.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp'))
+    )
+    images = [cv2.imread(image_name) for image_name in image_names]
+
+    started = time.perf_counter()
+    detector.detect(images[:1], use_cache=False)
+    print(f"Network loaded in {time.perf_counter() - started:.2f}s")
+
+    for batch_size in batch_sizes:
+        detector.batch_size = batch_size
+        started = time.perf_counter()
+        detector.detect(images, use_cache=False)
+        elapsed = time.perf_counter() - started
+        print(f"Batch size {batch_size}: {len(images)} images in {elapsed:.2f}s, "
+              f"{elapsed / max(len(images), 1) * 1000:.0f}ms per image")
+
+
+if __name__ == '__main__':
+    # python -m framework.tests.images.yolo.yolo_opencv <folder with sample images>
+    benchmark(sys.argv[1])
@@ -1,5 +1,3 @@
-import requests
-
 from framework.element_locator import ElementLocator
 from framework.element import Element
 from framework.libs.keywords_getter import KeywordsGetter
@@ -18,13 +16,6 @@ test_data = [
 ]
 
 
-def title_from_html_code(html_code):
-    if html_code.find("<title>") == -1:
-        return ""
-    html_code = html_code[html_code.find("<title>") + 7 :]
-    return html_code[: html_code.find("</title>")]
-
-
 def test(webdriver_instance, activity, element_locator: ElementLocator, dependencies):
     """The main function of testing. Finds all links, selects them clickable.
 
@@ -58,18 +49,16 @@ def test(webdriver_instance, activity, element_locator: ElementLocator, dependen
             return
         result = element_locator.click(link, webdriver_instance)
         if result["action"] == "NEWTAB" or result["action"] == "PAGECHANGE":
-            try:
-                response = requests.get(result["url"])
-            except requests.exceptions.InvalidSchema:
+            activity.get(webdriver_instance)
+            target = webdriver_instance.link_targets.get(result["url"])
+            if target is None:
                 return
-            html_code = response.text
-            title = set(clean.clean_html(title_from_html_code(html_code), True, True, True).split(" "))
-            text_link = clean.clean_html(html_code, False, False, False)
+            title = set(clean.clean_html(target.title, True, True, True).split(" "))
 
-            activity.get(webdriver_instance)
-            getter = KeywordsGetter(text_link)
+            getter = KeywordsGetter(clean.clean_html(target.text, False, False, False))
             keywords = getter.get_keywords_using_spacy(model_wrapper)
-            keywords.extend(getter.get_keywords_using_gensim())
+            # * Gensim keywords of the target are shared with the other link tests
+            keywords.extend(word for word, _ in target.keywords)
             keywords = set(keywords)
             keywords.update(title)
 
@@ -1,9 +1,7 @@
-import requests
 import operator
 import re
 from typing import List
 
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -67,38 +65,24 @@ class LinkDescriptionChecker:
         self.dependencies = dependencies
         self.locator = element_locator
 
-    @staticmethod
-    def page_info_using_requests(url: str):
-        try:
-            response = requests.get(url)
-        except requests.exceptions.RequestException:
-            return "", ""
-
-        if response.status_code != 200:
-            return "", ""
-
-        html_code = response.text
-        title, text = from_html_code(html_code)
-        title = set(filter(lambda x: len(x) > 2 and x not in cached_stopwords.get(),
-                           clean.clean_html(title, True, True, True).split()))
-        return title, text
-
     def check_link_description_using_keywords(self, link: Element, description: str):
         url = link.get_attribute(self.dr, 'href')
         if url is None:
             return
-        title, text = self.page_info_using_requests(url)
+        target = self.dr.link_targets.get(url)
 
-        if not title or not text:
+        if target is not None and target.title_words and target.text:
+            title, keywords = target.title_words, target.keywords
+        else:
             title, text = self.open_url_in_new_tab(url)
             title = set(filter(lambda x: len(x) > 2 and x not in cached_stopwords.get(),
                                clean.clean_html(title, True, True, True).split()))
-        keywords = KeywordsGetter(clean.clean_html(text, False, False, False)).get_keywords_using_gensim(
-            need_scores=True)
+            keywords = KeywordsGetter(clean.clean_html(text, False, False, False)).get_keywords_using_gensim(
+                need_scores=True)
         keywords.extend([(word, 1 / len(title) if len(title) < 6 else 2 / len(title)) for word in title])
         score = sum(
             1 * score if (description.find(word) != -1 or
-                          max([self.model_wrapper.run(similarity, word, descr) for descr in description.split()]) > 0.45)
+                          max(self.model_wrapper.run_many(similarity, [(word, descr) for descr in description.split()])) > 0.45)
             else 0 for (word, score) in keywords)
         return score >= 0.34
 
@@ -150,6 +134,7 @@ class LinkDescriptionChecker:
         if not links:
             self.result['status'] = 'NOELEMENTS'
             return self.result
+        self.dr.link_targets.prefetch(filter(None, (link.get_attribute(self.dr, 'href') for link, _, _ in links)))
 
         for i, (link, description, kind) in enumerate(links):
             print(f'Checking link {i + 1}/{len(links)}: {link}, {link.source[:200]}')
@@ -187,14 +172,6 @@ class LinkDescriptionChecker:
             return "", body
 
 
-def from_html_code(html_code: str) -> (str, str):
-    soup = BeautifulSoup(html_code, 'html.parser')
-    for title in soup.find_all('title'):
-        if 'head' in [p.name for p in title.find_parents()] and title.get_text():
-            return title.get_text(), soup.html.get_text()
-    return "", soup.html.get_text()
-
-
 def description_contains_stop_phrases(description: str) -> bool:
     return all([word.lower() in STOP_WORDS or word.isdigit() for word in re.findall(r"[\w']+", description)])
 
@@ -14,14 +14,17 @@ from selenium import webdriver
 
 from framework.await_page_load import wait_for_page_load
 from framework.activity import auth_by_options
+from framework.request_limiter import RequestLimiter
 
 FORBIDDEN_TOP_LEVEL_REGEX = re.compile(r"\.(htm|html|php)\?.*$")
 
 
 class Crawler:
-    def __init__(self, url: str, options: Optional[str] = None, depth_level=1):
+    def __init__(self, url: str, options: Optional[str] = None, depth_level=1,
+                 limiter: Optional[RequestLimiter] = None):
         self.webdriver_instance = webdriver.Firefox(firefox_profile=self._firefox_profile)
         self.url = url
+        self.limiter = limiter if limiter is not None else RequestLimiter(0)
 
         self.depth_level = depth_level
 
@@ -93,6 +96,7 @@ class Crawler:
                     user_agent = self.webdriver_instance.execute_script("return navigator.userAgent;")
                     headers, verify, get_req_timeout = {"User-Agent": user_agent}, False, 10
 
+                    self.limiter.delay_access(url=url)
                     response = requests.get(url, headers=headers, verify=verify, timeout=get_req_timeout)
                 except requests.Timeout:
                     print("Request timed out!")
@@ -110,6 +114,7 @@ class Crawler:
                     self.errors[response.status_code].append(url)
                     continue
 
+                self.limiter.delay_access(url=url)
                 self.webdriver_instance.get(url)
                 print(f'Waiting for page load : "{url}"')
                 self._wait_loading()
@@ -119,6 +124,7 @@ class Crawler:
                     tree = html.fromstring(source)
                 except ValueError as e:
                     print(e)
+                    self.limiter.delay_access(url=url)
                     response = requests.get(url, headers=headers, verify=verify, timeout=get_req_timeout)
                     tree = html.fromstring(response.text)
 
@@ -5,13 +5,16 @@ from urllib.request import urlopen
 import requests
 from bs4 import BeautifulSoup
 
+from framework import request_limiter
 from framework.tools import crawler
 from web_interface.apps.task.models import SitemapTask
 
 
 class SiteMap:
-    def __init__(self, url: str, mode: str, options: Optional[str] = None, depth_level: Optional[int] = None):
+    def __init__(self, url: str, mode: str, options: Optional[str] = None, depth_level: Optional[int] = None,
+                 request_interval: int = 0):
         self.url = url
+        self.limiter = request_limiter.RequestLimiter(request_interval)
         self.mode = mode
         self.options = options
         self.sitemap = []
@@ -34,7 +37,9 @@ class SiteMap:
             self._get_official_sitemap()
 
     def _get_simple_map(self) -> None:
-        crawl = crawler.Crawler(url=self.url.rstrip("/"), options=self.options, depth_level=self.depth_level)
+        crawl = crawler.Crawler(
+            url=self.url.rstrip("/"), options=self.options, depth_level=self.depth_level, limiter=self.limiter
+        )
         if self.mode == "auth":
             crawl.auth()
         crawl.crawl()
@@ -1,51 +1,326 @@
+import os
+import signal
 import time
 import threading
 import logging
+from typing import Optional
 
 from selenium import webdriver
 from selenium.common.exceptions import WebDriverException
 from selenium.webdriver import FirefoxProfile
 
+from framework.link_targets import LinkTargetService
+from framework.tools import authentication
+
 logger = logging.getLogger('framework.parallelization')
 
+WINDOW_SIZE = (1920, 1080)
+START_ATTEMPTS = 5
+START_RETRY_DELAY = 10
+# A driver is replaced with a fresh browser after this many tasks or this much resident memory
+MAX_TASKS_PER_DRIVER = int(os.environ.get("WEBDRIVER_MAX_TASKS", 50))
+MAX_DRIVER_MEMORY_MB = int(os.environ.get("WEBDRIVER_MAX_MEMORY_MB", 2048))
+BROWSER_PROCESS_NAMES = {"firefox", "firefox-bin", "geckodriver"}
+
+JS_HEALTH_CHECK = "return document.readyState;"
+
+JS_CLEAR_STORAGE = '''
+    try { window.localStorage.clear(); } catch (e) {}
+    try { window.sessionStorage.clear(); } catch (e) {}
+'''
+
+# * Runs in the chrome context: cookies of every domain, including SSO providers, are removed
+JS_RESET_BROWSER = '''
+    Services.cookies.removeAll();
+    Services.prefs.clearUserPref("layout.css.devPixelsPerPx");
+    Services.prefs.clearUserPref("browser.content.full-zoom");
+'''
+
+
+def _read_process_stat(pid: str):
+    try:
+        with open(f"/proc/{pid}/stat") as stat_file:
+            stat = stat_file.read()
+    except OSError:
+        return None
+    # The process name is in parentheses and may contain spaces
+    name = stat[stat.index("(") + 1:stat.rindex(")")]
+    fields = stat[stat.rindex(")") + 2:].split()
+    return name, int(fields[1]), int(fields[21])
+
+
+def process_tree_memory_mb(root_pid: int) -> float:
+    """Resident memory of a process and all its descendants, e.g. firefox with its content processes"""
+    processes = {}
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        stat = _read_process_stat(pid)
+        if stat is not None:
+            processes[int(pid)] = stat
+
+    tree = {root_pid}
+    changed = True
+    while changed:
+        changed = False
+        for pid, (_, parent_pid, _) in processes.items():
+            if parent_pid in tree and pid not in tree:
+                tree.add(pid)
+                changed = True
+
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    return sum(processes[pid][2] * page_size for pid in tree if pid in processes) / 1024 / 1024
+
+
+def kill_orphaned_browsers() -> None:
+    """Kills browsers left behind by a crashed job, they are re-parented to the init process"""
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        stat = _read_process_stat(pid)
+        if stat is not None and stat[0] in BROWSER_PROCESS_NAMES and stat[1] == 1:
+            logger.info(f"Killing orphaned {stat[0]} process {pid}")
+            try:
+                os.kill(int(pid), signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
 
 class WebdriverManager:
-    def __init__(self, limiter, enable_tracker_blocking=True, enable_caching=True):
+    """
+    Pool of Firefox instances.
+
+    Browsers are started outside of the pool lock, so several runners can start them at once,
+    and can be started ahead of time with `prewarm()`. Runners keep a driver between tasks and report every
+    task with `task_done()`: the driver is health checked and replaced when it served too many tasks or grew too big.
+    A released driver is reset to a clean state before it goes back to the pool.
+    """
+
+    def __init__(self, limiter, enable_tracker_blocking=True, enable_caching=True,
+                 max_tasks_per_driver=MAX_TASKS_PER_DRIVER, max_driver_memory_mb=MAX_DRIVER_MEMORY_MB):
         self.lock = threading.RLock()
+        self.driver_available = threading.Condition(self.lock)
         self.limiter = limiter
+        # Shared by the link tests of the job, so every link target is fetched once
+        self.link_targets = LinkTargetService(limiter)
         self.enable_tracker_blocking = enable_tracker_blocking
         self.enable_caching = enable_caching
+        self.max_tasks_per_driver = max_tasks_per_driver
+        self.max_driver_memory_mb = max_driver_memory_mb
         self.active_instances = list()
         self.free_instances = list()
+        self.tasks_served = dict()
+        self.prewarming = 0
 
-    def request(self) -> webdriver.Firefox:  # TODO: make a context manager out of `request()` and `release()` methods
+    def request(self, fresh: bool = False) -> webdriver.Firefox:  # TODO: make a context manager out of `request()` and `release()` methods
+        """
+        Takes a driver from the pool, `fresh` asks for a browser that has not run any task yet.
+        A used free driver is replaced by a fresh one when none is available.
+        """
         with self.lock:
-            if len(self.free_instances) > 0:
-                return self.free_instances.pop()
+            # Pre-launched browsers will be free soon, waiting is cheaper than starting another one
+            while self._find_free_instance(fresh) is None and self.prewarming > 0:
+                self.driver_available.wait()
+            driver = self._find_free_instance(fresh)
+            if driver is not None:
+                self.free_instances.remove(driver)
+                if fresh:
+                    self._replace_used_instance()
+                return driver
 
+            used_instance = self._find_free_instance(False) if fresh else None
+            if used_instance is not None:
+                self.free_instances.remove(used_instance)
             logger.info(f"No free webdriver available, starting webdriver №{len(self.active_instances) + 1}")
-            driver = self._try_to_run()
 
-            while driver is None:
-                logger.debug("Webdriver failed to start, retrying in 10 seconds...")
-                time.sleep(10)
-                driver = self._try_to_run()
-            logger.debug("Webdriver started, setting limiter and returning")
-            driver.limiter = self.limiter
+        if used_instance is not None:
+            self.discard(used_instance)
+        driver = self._launch()
+        with self.lock:
             self.active_instances.append(driver)
         return driver
 
+    def has_fresh_instance(self) -> bool:
+        with self.lock:
+            return self._find_free_instance(True) is not None
+
+    def prewarm(self, count: int) -> None:
+        """Starts browsers in parallel in the background until `count` instances are available"""
+        with self.lock:
+            missing = max(count - len(self.active_instances) - self.prewarming, 0)
+            self.prewarming += missing
+
+        for _ in range(missing):
+            threading.Thread(target=self._launch_into_pool, name="Webdriver Prewarm Thread", daemon=True).start()
+
+    def is_fresh(self, webdriver_instance: webdriver.Firefox) -> bool:
+        with self.lock:
+            return self.tasks_served.get(id(webdriver_instance), 0) == 0
+
+    def task_done(self, webdriver_instance: webdriver.Firefox) -> bool:
+        """
+        Counts a task run on the driver, which its runner keeps for the next task.
+        Returns False when the driver was discarded, because it broke or is due for recycling.
+        """
+        with self.lock:
+            if webdriver_instance not in self.active_instances:
+                logger.warning("Task of non-managed webdriver instance reported, ignoring")
+                return False
+            self.tasks_served[id(webdriver_instance)] = self.tasks_served.get(id(webdriver_instance), 0) + 1
+
+        if not self.is_healthy(webdriver_instance):
+            logger.warning("Webdriver failed the health check, discarding it")
+        elif not self._recycle_required(webdriver_instance):
+            return True
+        self.discard(webdriver_instance)
+        # * Not prewarm(), which starts nothing while other browsers are active, the warm pool would shrink
+        self._launch_replacement()
+        return False
+
     def release(self, webdriver_instance: webdriver.Firefox) -> None:
+        """Returns a driver to the pool in a clean state"""
         with self.lock:
             if webdriver_instance not in self.active_instances:
                 logger.warning("Release of non-managed webdriver instance requested, ignoring")
                 return
+
+        try:
+            self.reset_state(webdriver_instance)
+        except WebDriverException as e:
+            logger.warning(f"Failed to reset webdriver state, discarding it: {e}")
+            self.discard(webdriver_instance)
+            return
+
+        with self.lock:
             self.free_instances.append(webdriver_instance)
+            self.driver_available.notify_all()
+
+    def discard(self, webdriver_instance: webdriver.Firefox) -> None:
+        with self.lock:
+            if webdriver_instance in self.active_instances:
+                self.active_instances.remove(webdriver_instance)
+            if webdriver_instance in self.free_instances:
+                self.free_instances.remove(webdriver_instance)
+            self.tasks_served.pop(id(webdriver_instance), None)
+        self._quit(webdriver_instance)
+
+    @staticmethod
+    def is_healthy(webdriver_instance: webdriver.Firefox) -> bool:
+        try:
+            webdriver_instance.execute_script(JS_HEALTH_CHECK)
+            return True
+        except WebDriverException:
+            return False
+
+    @staticmethod
+    def reset_state(webdriver_instance: webdriver.Firefox) -> None:
+        """
+        Closes extra windows, removes the cookies of all domains, resets zoom and window geometry
+        and clears local and session storage of the loaded page. Storage of other origins is kept.
+        Without the chrome context only the cookies of the loaded page are removed.
+        """
+        handles = webdriver_instance.window_handles
+        for handle in handles[1:]:
+            webdriver_instance.switch_to.window(handle)
+            webdriver_instance.close()
+        webdriver_instance.switch_to.window(handles[0])
+
+        webdriver_instance.execute_script(JS_CLEAR_STORAGE)
+        webdriver_instance.delete_all_cookies()
+        try:
+            with webdriver_instance.context(webdriver_instance.CONTEXT_CHROME):
+                webdriver_instance.execute_script(JS_RESET_BROWSER)
+        except WebDriverException:
+            logger.debug("Chrome context is not available, other domains' cookies and zoom preferences are kept")
+        # Session cookies are gone, the next activity has to log in again
+        authentication.memorize_authentication(webdriver_instance, False)
+        webdriver_instance.get("about:blank")
+        webdriver_instance.set_window_size(*WINDOW_SIZE)
+
+    def clone(self, limiter=None) -> 'WebdriverManager':
+        """A manager with the same settings and no browsers, for use in a forked worker process"""
+        return WebdriverManager(
+            limiter if limiter is not None else self.limiter, self.enable_tracker_blocking, self.enable_caching,
+            self.max_tasks_per_driver, self.max_driver_memory_mb,
+        )
 
     def close_all(self) -> None:
         with self.lock:
-            for driver in self.active_instances:
-                driver.quit()
+            drivers = list(self.active_instances)
+            self.active_instances.clear()
+            self.free_instances.clear()
+            self.tasks_served.clear()
+        for driver in drivers:
+            self._quit(driver)
+        self.link_targets.close()
+
+    def _recycle_required(self, webdriver_instance: webdriver.Firefox) -> bool:
+        tasks_served = self.tasks_served.get(id(webdriver_instance), 0)
+        if tasks_served >= self.max_tasks_per_driver:
+            logger.info(f"Webdriver served {tasks_served} tasks, recycling")
+            return True
+
+        browser_pid = webdriver_instance.capabilities.get("moz:processID")
+        if browser_pid is not None:
+            memory = process_tree_memory_mb(browser_pid)
+            if memory > self.max_driver_memory_mb:
+                logger.info(f"Webdriver uses {memory:.0f}MB of memory, recycling")
+                return True
+        return False
+
+    def _find_free_instance(self, fresh: bool) -> Optional[webdriver.Firefox]:
+        for driver in reversed(self.free_instances):
+            if not fresh or self.tasks_served.get(id(driver), 0) == 0:
+                return driver
+        return None
+
+    def _replace_used_instance(self) -> None:
+        """Keeps a fresh spare starting in the background when a fresh browser is taken from the pool"""
+        used_instances = [driver for driver in self.free_instances if self.tasks_served.get(id(driver), 0) > 0]
+        if not used_instances:
+            return
+        used_instance = used_instances[0]
+        self.free_instances.remove(used_instance)
+        self.prewarming += 1
+
+        def _replace():
+            self.discard(used_instance)
+            self._launch_into_pool()
+
+        threading.Thread(target=_replace, name="Webdriver Replace Thread", daemon=True).start()
+
+    def _launch_replacement(self) -> None:
+        with self.lock:
+            self.prewarming += 1
+        threading.Thread(target=self._launch_into_pool, name="Webdriver Replace Thread", daemon=True).start()
+
+    def _launch_into_pool(self) -> None:
+        try:
+            driver = self._launch()
+        except WebDriverException:
+            driver = None
+
+        with self.lock:
+            self.prewarming -= 1
+            if driver is not None:
+                self.active_instances.append(driver)
+                self.free_instances.append(driver)
+            self.driver_available.notify_all()
+
+    def _launch(self) -> webdriver.Firefox:
+        for attempt in range(1, START_ATTEMPTS + 1):
+            driver = self._try_to_run()
+            if driver is not None:
+                logger.debug("Webdriver started, setting limiter and returning")
+                driver.limiter = self.limiter
+                driver.link_targets = self.link_targets
+                return driver
+            logger.debug(f"Webdriver failed to start ({attempt}/{START_ATTEMPTS}), retrying in {START_RETRY_DELAY} seconds...")
+            time.sleep(START_RETRY_DELAY)
+        raise WebDriverException(f"Firefox failed to start {START_ATTEMPTS} times")
+
+    @staticmethod
+    def _quit(webdriver_instance: webdriver.Firefox) -> None:
+        try:
+            webdriver_instance.quit()
+        except Exception as e:
+            logger.warning(f"Failed to quit webdriver: {e}")
 
     def _try_to_run(self) -> webdriver.Firefox:
         driver = None
@@ -72,7 +347,7 @@ class WebdriverManager:
                 profile.set_preference("browser.contentblocking.category", "strict")
             driver = webdriver.Firefox(profile)
             driver.set_page_load_timeout(180)
-            driver.set_window_size(1920, 1080)
+            driver.set_window_size(*WINDOW_SIZE)
             logger.debug("====>Firefox launched")
         except WebDriverException:
             logger.error("Failed to start firefox")
@@ -0,0 +1,110 @@
+import random
+import time
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from framework.xlsdata import cached_wcag_table_info, cached_wcag_test_matching
+from web_interface.apps.framework_data.models import TestResults, Test
+from web_interface.apps.issue.models import Example
+from web_interface.apps.report.models import (
+    ConformanceLevel, SuccessCriteriaLevel, Issue, ConformanceLevelIssue, Section508Chapters
+)
+from web_interface.backend.conformance import (
+    update_conformance_level, update_success_criteria_level, create_vpat_skeleton, VPAT_PRODUCT_TYPES
+)
+
+ISSUE_COUNT = 5000
+# Generous bound, so a slow CI runner does not fail the test
+MAX_SECONDS = 10
+
+
+class ConformanceCalculatorBenchmarkTestCase(TestCase):
+    """Synthetic test results with 5000 issues, levels have to be computed with a constant number of queries"""
+
+    def setUp(self) -> None:
+        rng = random.Random(0)
+        self.test_results = TestResults.objects.create()
+        wcag_numbers = list(cached_wcag_table_info)
+        test_names = sorted({name for tests in cached_wcag_test_matching.values() for name in tests})
+
+        tests = Test.objects.bulk_create(
+            Test(
+                name=name,
+                status=rng.choice(['PASS', 'FAIL', 'NOTRUN']),
+                support_status='TEST',
+                checked_elements='\n'.join(f'{number}) Selector: div' for number in range(rng.randint(0, 50))),
+                test_results=self.test_results,
+                problematic_pages='',
+            )
+            for name in test_names
+        )
+        issues = Issue.objects.bulk_create(
+            Issue(
+                err_id=f'err_{number}',
+                test_results=self.test_results,
+                priority=rng.choice(['Minor', 'Major', 'Critical', 'Blocker']),
+                wcag=', '.join(rng.sample(wcag_numbers, rng.randint(1, 3))),
+                is_best_practice=rng.random() < 0.2,
+            )
+            for number in range(ISSUE_COUNT)
+        )
+        Example.objects.bulk_create(
+            Example(err_id=issue.err_id, test=rng.choice(tests), issue=issue, test_results=self.test_results)
+            for issue in issues
+        )
+        ConformanceLevel.objects.bulk_create(
+            ConformanceLevel(WCAG=wcag_number, test_results=self.test_results, level='Supports')
+            for wcag_number in wcag_numbers
+        )
+        SuccessCriteriaLevel.objects.bulk_create(
+            SuccessCriteriaLevel(
+                criteria=wcag_number, product_type='Web', test_results=self.test_results, level='Supports'
+            )
+            for wcag_number in wcag_numbers
+        )
+
+    def test_levels_computed_with_constant_queries(self):
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            update_conformance_level(self.test_results)
+            update_success_criteria_level(self.test_results)
+        elapsed = time.perf_counter() - started
+
+        self.assertLess(len(queries), 30)
+        self.assertLess(elapsed, MAX_SECONDS)
+        for conformance_level in ConformanceLevel.objects.filter(issues__isnull=False).distinct():
+            self.assertIn(conformance_level.level, ('Does Not Support', 'Supports with Exceptions'))
+        self.assertTrue(ConformanceLevelIssue.objects.filter(issue__is_best_practice=False).exists())
+        self.assertFalse(ConformanceLevelIssue.objects.filter(issue__is_best_practice=True).exists())
+
+
+class VpatSkeletonTestCase(TestCase):
+    def setUp(self) -> None:
+        self.test_results = TestResults.objects.create()
+        self.wcag_number = next(iter(cached_wcag_table_info))
+        self.issue = Issue.objects.create(
+            err_id='err', test_results=self.test_results, wcag=self.wcag_number, is_best_practice=False
+        )
+
+    def test_skeleton_created_in_bulk(self):
+        with CaptureQueriesContext(connection) as queries:
+            create_vpat_skeleton(self.test_results)
+
+        self.assertLess(len(queries), 20)
+        self.assertEqual(
+            SuccessCriteriaLevel.objects.filter(test_results=self.test_results).count(),
+            len(cached_wcag_table_info) * len(VPAT_PRODUCT_TYPES)
+        )
+        self.assertEqual(
+            SuccessCriteriaLevel.objects.get(
+                test_results=self.test_results, criteria=self.wcag_number, product_type='Web'
+            ).level,
+            'Does Not Support'
+        )
+        self.assertTrue(Section508Chapters.objects.filter(test_results=self.test_results, report_type='EN').exists())
+        self.assertEqual(
+            list(ConformanceLevel.objects.get(test_results=self.test_results, WCAG=self.wcag_number).issues.all()),
+            [self.issue]
+        )
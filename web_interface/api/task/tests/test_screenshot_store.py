@@ -0,0 +1,44 @@
+import shutil
+import tempfile
+
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, override_settings
+
+from web_interface.apps.issue.models import ExampleScreenshot
+from web_interface.apps.task.task_functional import screenshot_store
+
+SCREENSHOT = b"\xff\xd8\xff\xe0 not really a jpeg"
+
+
+class ScreenshotStoreTestCase(SimpleTestCase):
+    def setUp(self) -> None:
+        self.media_root = tempfile.mkdtemp()
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+    def test_stored_screenshot_linked(self):
+        content_hash = screenshot_store.put(SCREENSHOT)
+        screenshot = ExampleScreenshot()
+
+        self.assertTrue(screenshot_store.link(screenshot.screenshot, content_hash))
+        self.assertEqual(screenshot.screenshot.name, screenshot_store.blob_name(content_hash))
+
+    @override_settings(SCREENSHOT_STORE_SHARED=False)
+    def test_screenshot_of_other_node_stored_from_message(self):
+        content_hash = screenshot_store.put(SCREENSHOT)
+        inlined = screenshot_store.inline(SCREENSHOT)
+        default_storage.delete(screenshot_store.blob_name(content_hash))
+        screenshot = ExampleScreenshot()
+
+        self.assertTrue(screenshot_store.link(screenshot.screenshot, content_hash, inlined))
+        with default_storage.open(screenshot.screenshot.name) as stored:
+            self.assertEqual(stored.read(), SCREENSHOT)
+
+    def test_missing_screenshot_not_linked(self):
+        screenshot = ExampleScreenshot()
+
+        self.assertIsNone(screenshot_store.inline(SCREENSHOT))
+        self.assertFalse(screenshot_store.link(screenshot.screenshot, "0" * 64))
+        self.assertFalse(screenshot_store.link(screenshot.screenshot, "0" * 64, "bm90IHRoZSBzY3JlZW5zaG90"))
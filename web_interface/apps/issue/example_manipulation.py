@@ -1,8 +1,11 @@
 from typing import Optional
 
+from django.db.models import Count, Prefetch, Q
+
 from framework import xlsdata
 from web_interface.apps.framework_data.models import Test, AvailableTest
 from web_interface.apps.issue.models import Example
+from web_interface.apps.page.models import Page
 from web_interface.apps.report.models import Issue, IssueLabel
 
 ORIG_DATA_TEMPLATE = {
@@ -29,73 +32,115 @@ def add_labels_to_issue(issue: Issue, labels: Optional[list]) -> None:
         issue.labels.add(issue_label)
 
 
-def group_and_annotate(test_results):
-    # print('Grouping and annotating')
-    examples = Example.objects.prefetch_related('pages').filter(test_results=test_results)
-    for example in examples:
-        pages = example.pages.all()
-
-        if example.steps is None:
-            if pages:
-                url = example.pages.first().url
-                example.steps = '1. Open the page <a href="' + url + '">' + url + '</a>'
-            if len(pages) == 2:
-                example.note = (
-                        'Also applicable to <a href="' +
-                        example.pages.last().url + '">' +
-                        example.pages.last().url + '</a>  page'
-                )
-            elif len(pages) > 2:
-                urls = []
-                for page in pages[1:]:
-                    urls.append('<a href="' + page.url + '">' + page.url + '</a>')
-                example.note = 'Also applicable to ' + ', '.join(urls) + ' pages'
-        # Don't count examples from passed tests
+def _annotate_steps(example, pages) -> bool:
+    """Sets steps and note from the example pages, returns True if the example changed"""
+    if not pages:
+        return False
+    url = pages[0].url
+    example.steps = '1. Open the page <a href="' + url + '">' + url + '</a>'
+    if len(pages) == 2:
+        example.note = (
+                'Also applicable to <a href="' +
+                pages[-1].url + '">' +
+                pages[-1].url + '</a>  page'
+        )
+    elif len(pages) > 2:
+        urls = []
+        for page in pages[1:]:
+            urls.append('<a href="' + page.url + '">' + page.url + '</a>')
+        example.note = 'Also applicable to ' + ', '.join(urls) + ' pages'
+    return True
+
+
+def _get_issue_data(err_id):
+    if 'empty_template' not in err_id and '_copy_' not in err_id:
+        return xlsdata.get_data_for_issue(err_id)
+    elif '_copy_' in err_id:
+        return xlsdata.get_data_for_issue('_'.join(err_id.split('_')[0:-2]))
+    return ORIG_DATA_TEMPLATE
+
+
+def _build_issue(err_id, test_results, force_best_practice):
+    orig_data = _get_issue_data(err_id)
+    references = ''
+    for paragraph in orig_data['WCAG'].split(', '):
         try:
-            if example.severity != 'FAIL':
-                example.save()
-                continue
-        except AttributeError:
+            references += '<p>' + xlsdata.cached_wcag_table_info[paragraph]['reference'] + '</p>'
+        except KeyError:
             pass
 
-        # If only WARN issues of this err_id exist, don't create an issue group
-        if not Example.objects.filter(test_results=test_results, err_id=example.err_id, severity='FAIL').exists():
-            continue
-        if 'empty_template' not in example.err_id and '_copy_' not in example.err_id:
-            orig_data = xlsdata.get_data_for_issue(example.err_id)
-        elif '_copy_' in example.err_id:
-            orig_data = xlsdata.get_data_for_issue('_'.join(example.err_id.split('_')[0:-2]))
-        else:
-            orig_data = ORIG_DATA_TEMPLATE
-        references = ''
-        for paragraph in orig_data['WCAG'].split(', '):
-            try:
-                references += '<p>' + xlsdata.cached_wcag_table_info[paragraph]['reference'] + '</p>'
-            except KeyError:
-                pass
-
-        issue, created = Issue.objects.get_or_create(
-            err_id=example.err_id,
-            test_results=test_results,
-            defaults={
-                'priority': orig_data['priority'],
-                'techniques': get_techniques_as_links(orig_data['techniques']),
-                'intro': orig_data['intro'],
-                'type_of_disability': orig_data['type_of_disability'],
-                'name': orig_data['issue_title'],
-                'references': references,
-                'recommendations': orig_data['recommendations'],
-                'wcag': orig_data['WCAG'],
-                'issue_type': orig_data['issue_type'],
-                'is_best_practice': orig_data['WCAG-BP'] == 'BP' if not example.force_best_practice else True
-            }
-        )
-        if created or not issue.labels.count():
-            add_labels_to_issue(issue=issue, labels=orig_data['labels'])
+    return Issue(
+        err_id=err_id,
+        test_results=test_results,
+        priority=orig_data['priority'],
+        techniques=get_techniques_as_links(orig_data['techniques']),
+        intro=orig_data['intro'],
+        type_of_disability=orig_data['type_of_disability'],
+        name=orig_data['issue_title'],
+        references=references,
+        recommendations=orig_data['recommendations'],
+        wcag=orig_data['WCAG'],
+        issue_type=orig_data['issue_type'],
+        is_best_practice=orig_data['WCAG-BP'] == 'BP' if not force_best_practice else True
+    )
+
+
+def _get_or_create_issues(test_results, fail_examples) -> dict:
+    """Issues of the test results by err_id, missing ones are created in bulk"""
+    issues = {}
+    unlabeled_err_ids = set()
+    existing_issues = Issue.objects.filter(
+        test_results=test_results, err_id__in={example.err_id for example in fail_examples}
+    ).annotate(label_count=Count('labels')).order_by('id')
+    for issue in existing_issues:
+        if issue.err_id not in issues:
+            issues[issue.err_id] = issue
+            if not issue.label_count:
+                unlabeled_err_ids.add(issue.err_id)
+
+    # * The first example of an err_id decides whether a new issue is a best practice
+    new_issues = {}
+    for example in fail_examples:
+        if example.err_id not in issues and example.err_id not in new_issues:
+            new_issues[example.err_id] = _build_issue(example.err_id, test_results, example.force_best_practice)
+    Issue.objects.bulk_create(new_issues.values())
+    issues.update(new_issues)
+
+    for err_id in unlabeled_err_ids.union(new_issues):
+        add_labels_to_issue(issue=issues[err_id], labels=_get_issue_data(err_id)['labels'])
+
+    return issues
+
+
+def group_and_annotate(test_results, test: Optional[Test] = None):
+    """
+    Annotates examples of the test results and groups failed ones into issues, only examples of test if given.
+    Examples that already have steps and an issue are not processed again.
+    """
+    examples = (
+        Example.objects.filter(test_results=test_results)
+        .filter(Q(steps__isnull=True) | Q(severity='FAIL', issue__isnull=True))
+        .prefetch_related(Prefetch('pages', queryset=Page.objects.order_by('id')))
+        .order_by('id')
+    )
+    if test is not None:
+        examples = examples.filter(test=test)
+
+    changed_examples = []
+    fail_examples = []
+    for example in examples:
+        changed = example.steps is None and _annotate_steps(example, list(example.pages.all()))
+        # Don't count examples from passed tests
+        if example.severity == 'FAIL' and example.issue_id is None:
+            fail_examples.append(example)
+        elif changed:
+            changed_examples.append(example)
 
-        example.issue = issue
+    issues = _get_or_create_issues(test_results, fail_examples) if fail_examples else {}
+    for example in fail_examples:
+        example.issue = issues[example.err_id]
 
-        example.save()
+    Example.objects.bulk_update(changed_examples + fail_examples, ['steps', 'note', 'issue'])
 
 
 def get_techniques_as_links(techniques):
@@ -1,7 +1,4 @@
-import base64
 import datetime
-import uuid
-from tempfile import TemporaryFile
 from socket import timeout
 from json import loads
 from dateutil.relativedelta import relativedelta, MO, TU, WE, TH, FR, SA, SU
@@ -9,11 +6,10 @@ from kombu import Queue, Connection
 from framework import xlsdata
 from web_interface.apps.issue import example_manipulation
 from web_interface.apps.issue.models import PageScreenshot, Example, ExampleScreenshot
-from web_interface.apps.report.models import Issue, SuccessCriteriaLevel, ConformanceLevel
 from web_interface.apps.framework_data.models import TestTiming, Test, TestResults
 from web_interface.apps.task_planner.models import PlannedTask
 from web_interface.backend.conformance import (
-    fill_508,
+    create_vpat_skeleton,
     update_conformance_level,
     update_success_criteria_level,
     update_level_for_section_chapter,
@@ -24,6 +20,7 @@ from web_interface.apps.page.models import Page
 from web_interface.apps.task.models import Task
 from web_interface.apps.task import api_token
 from web_interface.apps.task import tasks
+from web_interface.apps.task.task_functional import screenshot_store
 
 
 WEEKDAYS = {0: MO, 1: TU, 2: WE, 3: TH, 4: FR, 5: SA, 6: SU}
@@ -86,6 +83,10 @@ def request_test_for_job(job):
 
 
 class ReceiveCallbackTaskCapsule:
+    def __init__(self):
+        # * Page urls of running tasks resolved to page ids, filled on the first interim test result of a task
+        self.task_page_ids = {}
+
     def receive_callback(self, body, message):
         # TODO try decorator
         self.new_progress_callback = False
@@ -159,6 +160,7 @@ class ReceiveCallbackTaskCapsule:
             self.task.save()
 
             api_token.delete_worker_key(self.key)
+            self.task_page_ids.pop(self.task_id, None)
 
     @cancel_if_callback_occurred
     def __update_interim_test_result(self):
@@ -186,38 +188,51 @@ class ReceiveCallbackTaskCapsule:
         #     page_params = Page.objects.filter(url=run_time[0]).latest("id").page_size_data
         #     TestTiming.objects.create(name=test["name"], run_times=run_time[2], page_size_data=page_params)
 
-        for issue in test["issues"]:
-            err_id = issue["err_id"]
-            orig_data = xlsdata.get_data_for_issue(err_id)
-            issue_obj = Example.objects.create(
-                err_id=err_id,
-                code_snippet=issue["code_snippet"],
-                problematic_element_selector=issue["problematic_element_selector"],
-                problematic_element_position=issue["problematic_element_position"],
-                test=test_obj,
-                severity=issue["severity"],
-                expected_result=orig_data["expected_result"],
-                actual_result=orig_data["actual_result"],
-                test_results=test_results,
-                uuid=issue["uuid"],
-                important_example=issue["important_example"],
-                force_best_practice=issue["force_best_practice"],
-                affected_resolutions=issue["page_resolution"],
-            )
-            print(f"Created issue with uuid {issue['uuid']}")
-            issue_obj.pages.clear()
+        examples = [self.__build_example(issue, test_obj, test_results) for issue in test["issues"]]
+        Example.objects.bulk_create(examples)
+        print(f"Created {len(examples)} issues for test {test['name']}")
 
+        page_ids = self.__get_page_ids()
+        example_pages = []
+        for example, issue in zip(examples, test["issues"]):
             for page in issue["pages"]:
-                page_objects = Page.objects.filter(project=self.task.target_job.project, url=page)
-                if len(page_objects) != 1:
+                if page_ids.get(page) is None:
                     print(f"Multiple pages with the same url {page} - cannot assign page to issue")
                     break
-                # print(f"Adding page {page_obj.id} {page_obj.url}")
-                issue_obj.pages.add(page_objects[0])
-                print(f"Added page {page_objects[0].name}")
-            issue_obj.save()
+                example_pages.append(Example.pages.through(example_id=example.id, page_id=page_ids[page]))
+        Example.pages.through.objects.bulk_create(example_pages)
+
+        example_manipulation.group_and_annotate(test_results, test=test_obj)
+
+    @staticmethod
+    def __build_example(issue, test_obj, test_results):
+        err_id = issue["err_id"]
+        orig_data = xlsdata.get_data_for_issue(err_id)
+        return Example(
+            err_id=err_id,
+            code_snippet=issue["code_snippet"],
+            problematic_element_selector=issue["problematic_element_selector"],
+            problematic_element_position=issue["problematic_element_position"],
+            test=test_obj,
+            severity=issue["severity"],
+            expected_result=orig_data["expected_result"],
+            actual_result=orig_data["actual_result"],
+            test_results=test_results,
+            uuid=issue["uuid"],
+            important_example=issue["important_example"],
+            force_best_practice=issue["force_best_practice"],
+            affected_resolutions=issue["page_resolution"],
+        )
 
-        example_manipulation.group_and_annotate(test_results)
+    def __get_page_ids(self):
+        """Urls of the project pages mapped to page ids, None for urls shared by several pages"""
+        if self.task_id not in self.task_page_ids:
+            page_ids = {}
+            for page_id, url in Page.objects.filter(project=self.task.target_job.project).values_list("id", "url"):
+                page_ids[url] = None if url in page_ids else page_id
+            self.task_page_ids[self.task_id] = page_ids
+
+        return self.task_page_ids[self.task_id]
 
     @cancel_if_callback_occurred
     def __update_page_screenshot(self):
@@ -226,20 +241,19 @@ class ReceiveCallbackTaskCapsule:
 
             test_results = self.task.test_results
             page_url = self.body["url"]
-            image = self.body["image"]
+            image_hash = self.body["image_hash"]
 
             print(f"Received page screenshot for {page_url}")
-            page_objects = Page.objects.filter(project=self.task.target_job.project, url=page_url)
+            page_id = self.__get_page_ids().get(page_url)
 
-            if len(page_objects) != 1:
+            if page_id is None:
                 print(f"Multiple pages with the same url {page_url} - cannot assign page to issue")
                 return
-            page_screenshot = PageScreenshot.objects.create(page=page_objects[0], test_results=test_results)
-
-            with TemporaryFile() as screenshot_file:
-                screenshot_file.write(base64.b64decode(image.encode("ascii")))
-                screenshot_file.seek(0)
-                page_screenshot.screenshot.save(str(uuid.uuid1()), screenshot_file)
+            page_screenshot = PageScreenshot(page_id=page_id, test_results=test_results)
+            if not screenshot_store.link(page_screenshot.screenshot, image_hash, self.body.get("image")):
+                print(f"ERROR: Page screenshot {image_hash} is missing from the screenshot store!")
+                return
+            page_screenshot.save()
 
     @cancel_if_callback_occurred
     def __update_results(self):
@@ -285,11 +299,13 @@ class ReceiveCallbackTaskCapsule:
                 print("ERROR: Example does not exist!")
                 return
 
-            new_screenshot = ExampleScreenshot.objects.create(example=target_example)
-            with TemporaryFile() as screenshot_file:
-                screenshot_file.write(base64.b64decode(screenshot_data_loaded["screenshot"].encode("ascii")))
-                screenshot_file.seek(0)
-                new_screenshot.screenshot.save(str(uuid.uuid1()), screenshot_file)
+            new_screenshot = ExampleScreenshot(example=target_example)
+            screenshot_hash = screenshot_data_loaded["screenshot_hash"]
+            inlined_screenshot = screenshot_data_loaded.get("screenshot")
+            if not screenshot_store.link(new_screenshot.screenshot, screenshot_hash, inlined_screenshot):
+                print(f"ERROR: Screenshot {screenshot_hash} is missing from the screenshot store!")
+                return
+            new_screenshot.save()
 
     @cancel_if_callback_occurred
     def __update_finish(self):
@@ -301,6 +317,7 @@ class ReceiveCallbackTaskCapsule:
         test_results = self.task.test_results
         print(f"Task {self.task_id} finished")
         api_token.delete_worker_key(self.key)
+        self.task_page_ids.pop(self.task_id, None)
 
         if test_results is None:
             print(f"Cannot finish task {self.task_id}, test_results is missing!")
@@ -312,49 +329,7 @@ class ReceiveCallbackTaskCapsule:
         self.task.status = Task.SUCCESS
         self.task.save()
         example_manipulation.group_and_annotate(test_results)
-        problems = Issue.objects.filter(test_results=test_results)
-        wcag_table_info = xlsdata.cached_wcag_table_info
-        vpat_data = xlsdata.cached_vpat_data
-
-        # TODO: optimize by using from web
-        product_types = ["Web", "Electronic Docs", "Software", "Authoring Tool", "Closed"]
-        for wcag_number in list(wcag_table_info.keys()):
-            for product in product_types:
-                level = "Select support level"
-                remark = ""
-                if product == "Web":
-                    level = "Supports"
-                    remark = vpat_data["wcag"][wcag_number][product]["Supports"]
-                conformance_data_vpat = SuccessCriteriaLevel.objects.create(
-                    criteria=wcag_number,
-                    product_type=product,
-                    test_results=test_results,
-                    level=level,
-                    remark=remark,
-                )
-        applicable_508 = ["3", "4", "5", "6"]
-        applicable_en = ["4", "5", "6", "7", "8", "9", "10", "11", "12", "13"]
-        fill_508("508", test_results, "3", applicable_508, product_types)
-        fill_508("EN", test_results, "4", applicable_en, product_types)
-
-        for wcag_number in list(wcag_table_info.keys()):
-            conformance_data = ConformanceLevel.objects.create(
-                WCAG=wcag_number, test_results=test_results, level="Supports"
-            )
-            for problem in problems:
-                if wcag_number in problem.wcag:
-                    # conformance_data.level = 'Does not support'
-                    conformance_data.issues.add(problem)
-                    try:
-                        conformance_data_vpat = SuccessCriteriaLevel.objects.get(
-                            test_results=test_results, criteria=wcag_number, product_type="Web"
-                        )
-                        conformance_data_vpat.level = "Does Not Support"
-                        conformance_data_vpat.remark = vpat_data["wcag"][wcag_number][product]["Does Not Support"]
-                        conformance_data_vpat.save()
-                    except (Exception, SuccessCriteriaLevel.DoesNotExist) as e:
-                        print(e)
-            conformance_data.save()
+        create_vpat_skeleton(test_results)
         try:
             update_conformance_level(test_results)
             update_success_criteria_level(test_results)
@@ -0,0 +1,52 @@
+import base64
+import hashlib
+from typing import Optional
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+SCREENSHOT_STORE_PREFIX = "images/screenshots"
+
+
+def blob_name(content_hash: str) -> str:
+    # * Nested by hash prefix to keep directories small
+    return f"{SCREENSHOT_STORE_PREFIX}/{content_hash[:2]}/{content_hash}.jpg"
+
+
+def put(content: bytes) -> str:
+    """
+    Saves the screenshot to the shared storage under its content hash, identical screenshots are stored once.
+    Returns the hash.
+    """
+    content_hash = hashlib.sha256(content).hexdigest()
+    name = blob_name(content_hash)
+
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(content))
+
+    return content_hash
+
+
+def inline(content: bytes) -> Optional[str]:
+    """
+    The screenshot encoded for the message itself, when the storage of this node is not shared with the receiver.
+    """
+    if settings.SCREENSHOT_STORE_SHARED:
+        return None
+    return base64.b64encode(content).decode("ascii")
+
+
+def link(image_field, content_hash: str, inlined: Optional[str] = None) -> bool:
+    """
+    Points the image field to the stored screenshot instead of writing a copy of it.
+    A screenshot missing from the storage is stored from its `inline()` encoding, when the message carried one.
+    Returns False if the screenshot is missing from the storage.
+    """
+    name = blob_name(content_hash)
+    if not default_storage.exists(name):
+        if inlined is None or put(base64.b64decode(inlined.encode("ascii"))) != content_hash:
+            return False
+
+    image_field.name = name
+    return True
@@ -1,4 +1,3 @@
-import base64
 import logging
 import threading
 from copy import deepcopy
@@ -15,6 +14,7 @@ from kombu import Queue, Connection, Exchange
 
 from framework.main import discover_and_run
 from web_interface.apps.task.models import Task
+from web_interface.apps.task.task_functional import screenshot_store
 from web_interface.apps.task.task_functional.estimate_time import (
     calculate_job_tests_pages_and_its_timings,
     task_accepting_order_estimated_runtimes,
@@ -303,12 +303,13 @@ class ProgressStateCapsule:
         test_object = self.__get_test_object(test, checked_elements_source, issues, run_times)
         self.publish_with_producer(type_="interim_test_result", extended_info={"test": test_object})
 
-    def post_screenshot_images(self, url, image):
+    def post_screenshot_images(self, url, image: bytes):
         self.publish_with_producer(
             type_="page_screenshot",
             extended_info={
                 "url": url,
-                "image": image,
+                "image_hash": screenshot_store.put(image),
+                "image": screenshot_store.inline(image),
             },
         )
 
@@ -444,13 +445,18 @@ class ProgressStateCapsule:
     def __build_screenshots_to_upload(problematic_elements, test_name, screenshots_to_upload: List[dict]):
         for problematic_element in problematic_elements:
             if "screenshot" in problematic_element:
+                # * Only the hash is sent, the image itself goes to the shared screenshot store
                 with open(problematic_element["screenshot"], mode="rb") as screenshot:
-                    screenshot_to_upload = dict()
-                    screenshot_to_upload["uuid"] = problematic_element["uuid"]
-                    screenshot_to_upload["test_name"] = test_name
-                    screenshot_to_upload["screenshot"] = base64.b64encode(screenshot.read()).decode("ascii")
-
-                    screenshots_to_upload.append(screenshot_to_upload)
+                    content = screenshot.read()
+                screenshot_to_upload = dict()
+                screenshot_to_upload["uuid"] = problematic_element["uuid"]
+                screenshot_to_upload["test_name"] = test_name
+                screenshot_to_upload["screenshot_hash"] = screenshot_store.put(content)
+                screenshot_to_upload["screenshot"] = screenshot_store.inline(content)
+                screenshot_to_upload["screenshot_width"] = problematic_element.get("screenshot_width")
+                screenshot_to_upload["screenshot_height"] = problematic_element.get("screenshot_height")
+
+                screenshots_to_upload.append(screenshot_to_upload)
             else:
                 print(f"WARNING: Np screenshot for element {problematic_element['element'].source[:100]}")
 
@@ -546,7 +552,6 @@ class ProgressReportCaseUpdater:
     def page_screenshot(self):
         url = self.running_progress["page_screenshot"]["url"]
         image = self.running_progress["page_screenshot"]["image"]
-        image = base64.b64encode(image).decode("ascii")
         self.post_screenshot_images(url, image)
 
     def __set_test_queue_estimated_timings(self, running_thread_dict, running_thread_status):
@@ -340,8 +340,11 @@ def _process_sitemap(project_id, depth_level: Optional[int] = None):
     else:
         mode = "simple"
 
-    sitemap = SiteMap(project.url, mode, options=project.options, depth_level=depth_level)
+    sitemap = SiteMap(
+        project.url, mode, options=project.options, depth_level=depth_level, request_interval=project.request_interval
+    )
     sitemap.get_sitemap()
+    limiter = sitemap.limiter
     local_pages = []
 
     def retrieve_page_titles(sitemap, number_of_workers: int) -> None:
@@ -360,6 +363,7 @@ def _process_sitemap(project_id, depth_level: Optional[int] = None):
                         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:86.0) Gecko/20100101 Firefox/86.0",
                     }
                     try:
+                        limiter.delay_access(url=content["url"])
                         response = requests.get(content["url"], headers=headers)
                         response.encoding = "utf-8"
                         if response.status_code == 502:
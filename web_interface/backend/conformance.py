@@ -1,6 +1,9 @@
-from typing import Union, List, Optional, Iterable
+from collections import defaultdict
+from functools import lru_cache
+from typing import Union, List, Optional, Iterable, Dict, Tuple
 
-from django.db.models import QuerySet
+from django.db import transaction
+from django.db.models import QuerySet, Count
 
 from framework import xlsdata
 from framework.xlsdata import cached_wcag_test_matching, cached_wcag_table_info, cached_vpat_data
@@ -8,89 +11,171 @@ from wcag_information.levels_and_versions import SC_NOT_COVERED_BY_TESTS
 from wcag_information.section_dependency import DEPENDENCY_OF_SECTION_CHAPTER_WCAG
 from web_interface.apps.framework_data.models import Test, TestResults
 from web_interface.apps.report.models import (
-    ConformanceLevel, SuccessCriteriaLevel, Section508Criteria, Section508Chapters, Issue
+    ConformanceLevel, ConformanceLevelIssue, SuccessCriteriaLevel, Section508Criteria, Section508Chapters, Issue
 )
 
+VPAT_PRODUCT_TYPES = ('Web', 'Electronic Docs', 'Software', 'Authoring Tool', 'Closed')
+# Section type -> (chapter with criteria per product type, applicable chapters)
+APPLICABLE_SECTION_CHAPTERS = {
+    '508': ('3', ('3', '4', '5', '6')),
+    'EN': ('4', ('4', '5', '6', '7', '8', '9', '10', '11', '12', '13')),
+}
 
-def update_data_levels(data_set: Union[QuerySet, List[SuccessCriteriaLevel], List[ConformanceLevel]],
-                       all_issues: Union[QuerySet, List[Issue]], all_tests: Union[QuerySet, List[Test]]) -> None:
-    for data in data_set:
-        WCAG = data.WCAG if isinstance(data, ConformanceLevel) else data.criteria
-        if WCAG in SC_NOT_COVERED_BY_TESTS and not Issue.objects.filter(wcag__contains=WCAG).exists():
-            data.level = 'Not Identified' if isinstance(data, ConformanceLevel) else 'Select support level'
-            data.remark = 'Unable to evaluate SC using automated tests. Manual testing needed'
-            data.save()
-            continue
 
-        if WCAG not in cached_wcag_test_matching and not Issue.objects.filter(wcag__contains=WCAG).exists():
-            continue
+class ConformanceCalculator:
+    """
+    Computes conformance and success criteria levels of one test results set.
+    Issues and tests are loaded once and indexed by WCAG success criterion,
+    so every level is computed in memory and rows are written back in bulk.
+    """
 
-        affecting_issues = list()
+    def __init__(self, all_issues: Union[QuerySet, List[Issue]], all_tests: Union[QuerySet, List[Test]]) -> None:
+        self.all_issues = list(all_issues)
+        self.all_tests = list(all_tests)
 
-        for issue in all_issues:
-            if WCAG in issue.wcag.split(', ') and not issue.is_best_practice:
-                affecting_issues.append(issue)
+        self.affecting_issues: Dict[str, List[Issue]] = defaultdict(list)
+        for issue in self.all_issues:
+            if not issue.is_best_practice:
+                for wcag in set(issue.wcag.split(', ')):
+                    self.affecting_issues[wcag].append(issue)
+        self.issue_wcags = {issue.wcag for issue in self.all_issues}
+        self.has_blocker_issues = any(issue.priority == 'Blocker' for issue in self.all_issues)
+        self.tests_by_name: Dict[str, List[Test]] = defaultdict(list)
+        for test in self.all_tests:
+            self.tests_by_name[test.name].append(test)
 
-        names_tests_for_sc = cached_wcag_test_matching[WCAG].keys()
+        self.__mentioned_wcags: Dict[str, bool] = {}
+        self.__problem_percentages: Dict[int, float] = {}
 
-        tests_for_sc = all_tests.filter(name__in=names_tests_for_sc)
+    @classmethod
+    def for_test_results(cls, test_results: TestResults) -> 'ConformanceCalculator':
+        return cls(test_results.issues.all(), test_results.test_set.annotate(example_count=Count('example')))
 
-        if not tests_for_sc and not all_issues.filter(wcag__contains=WCAG).exists():
-            data.level = 'Not Identified' if isinstance(data, ConformanceLevel) else 'Select support level'
-            data.remark = 'Automated test was not run'
-            data.save()
-            continue
+    def update(self, data_set: Union[QuerySet, List[SuccessCriteriaLevel], List[ConformanceLevel]]) -> None:
+        changed_levels = []
+        conformance_issues = {}
+
+        for data in data_set:
+            affecting_issues = self.compute_level(data)
+            if affecting_issues is False:
+                continue
+            changed_levels.append(data)
+            if isinstance(data, ConformanceLevel) and affecting_issues is not None:
+                conformance_issues[data.id] = affecting_issues
+
+        for model in {type(data) for data in changed_levels}:
+            model.objects.bulk_update([data for data in changed_levels if type(data) is model], ['level', 'remark'])
+
+        ConformanceLevelIssue.objects.filter(conformance_level_id__in=conformance_issues).delete()
+        ConformanceLevelIssue.objects.bulk_create(
+            ConformanceLevelIssue(conformance_level_id=conformance_level_id, issue=issue)
+            for conformance_level_id, issues in conformance_issues.items()
+            for issue in issues
+        )
+
+    def compute_level(self, data: Union[SuccessCriteriaLevel, ConformanceLevel]) -> Union[bool, None, List[Issue]]:
+        """
+        Sets level and remark of the row.
+        Returns False if the row is left unchanged, the issues affecting a conformance level row
+        if they have to be linked to it and None otherwise.
+        """
+        is_conformance = isinstance(data, ConformanceLevel)
+        WCAG = data.WCAG if is_conformance else data.criteria
+        if WCAG in SC_NOT_COVERED_BY_TESTS and not self.__is_mentioned(WCAG):
+            data.level = 'Not Identified' if is_conformance else 'Select support level'
+            data.remark = 'Unable to evaluate SC using automated tests. Manual testing needed'
+            return None
 
-        if type(data) == ConformanceLevel:
-            data.issues.clear()
-            for affecting_issue in affecting_issues:
-                data.issues.add(affecting_issue)
+        if WCAG not in cached_wcag_test_matching and not self.__is_mentioned(WCAG):
+            return False
 
-        tests_with_fail_status = tests_for_sc.filter(status='FAIL')
-        tests_with_pass_status = tests_for_sc.filter(status='PASS')
+        affecting_issues = self.affecting_issues.get(WCAG, [])
+        names_tests_for_sc = cached_wcag_test_matching.get(WCAG, {}).keys()
+        tests_for_sc = [test for name in names_tests_for_sc for test in self.tests_by_name.get(name, [])]
+
+        if not tests_for_sc and not self.__is_mentioned(WCAG):
+            data.level = 'Not Identified' if is_conformance else 'Select support level'
+            data.remark = 'Automated test was not run'
+            return None
+
+        tests_with_fail_status = [test for test in tests_for_sc if test.status == 'FAIL']
+        tests_with_pass_status = [test for test in tests_for_sc if test.status == 'PASS']
 
         if affecting_issues:
-            if (any(test.test_results.issues.filter(priority='Blocker') for test in tests_with_fail_status)
-                    or weighted_error_percentage(tests_with_fail_status.union(tests_with_pass_status), WCAG) > 50):
+            if (tests_with_fail_status and self.has_blocker_issues
+                    or self.__weighted_error_percentage(tests_with_fail_status + tests_with_pass_status, WCAG) > 50):
                 data.level = 'Does Not Support'
-                if isinstance(data, ConformanceLevel):
-                    data.remark = ''
-                else:
-                    data.remark = cached_vpat_data['wcag'][WCAG][data.product_type]['Does Not Support']
             else:
-                data.level = 'Supports with Exceptions' if isinstance(data, ConformanceLevel) else 'Partially Supports'
-                if isinstance(data, ConformanceLevel):
-                    data.remark = ''
-                else:
-                    data.remark = cached_vpat_data['wcag'][WCAG][data.product_type]['Partially Supports']
+                data.level = 'Supports with Exceptions' if is_conformance else 'Partially Supports'
         elif tests_with_pass_status:
             data.level = 'Supports'
-            if isinstance(data, ConformanceLevel):
-                data.remark = ''
-            else:
-                data.remark = cached_vpat_data['wcag'][WCAG][data.product_type]['Supports']
         else:
             data.level = 'Not Applicable'
-            if isinstance(data, ConformanceLevel):
-                data.remark = ''
-            else:
-                data.remark = cached_vpat_data['wcag'][WCAG][data.product_type]['Not Applicable']
 
-        data.save()
+        if is_conformance:
+            data.remark = ''
+            return affecting_issues
+        data.remark = cached_vpat_data['wcag'][WCAG][data.product_type][data.level]
+        return None
+
+    def __is_mentioned(self, wcag: str) -> bool:
+        """Whether any issue mentions the criterion, same as an Issue wcag__contains lookup"""
+        if wcag not in self.__mentioned_wcags:
+            self.__mentioned_wcags[wcag] = any(wcag in issue_wcag for issue_wcag in self.issue_wcags)
+        return self.__mentioned_wcags[wcag]
+
+    def __problem_percentage(self, test: Test) -> float:
+        if test.id not in self.__problem_percentages:
+            self.__problem_percentages[test.id] = percentage_of_problem_elements(test)
+        return self.__problem_percentages[test.id]
+
+    def __weighted_error_percentage(self, tests: List[Test], wcag: str) -> float:
+        weights = [
+            cached_wcag_test_matching[wcag][test.name]['weight'] * cached_wcag_test_matching[wcag][test.name]['percent']
+            for test in tests
+        ]
+        try:
+            return sum(
+                weight * self.__problem_percentage(test) for weight, test in zip(weights, tests)
+            ) / sum(weights)
+        except ZeroDivisionError:
+            return 0.
+
+
+def update_data_levels(data_set: Union[QuerySet, List[SuccessCriteriaLevel], List[ConformanceLevel]],
+                       all_issues: Union[QuerySet, List[Issue]], all_tests: Union[QuerySet, List[Test]]) -> None:
+    ConformanceCalculator(all_issues, all_tests).update(data_set)
 
 
 def update_success_criteria_level(test_results: TestResults) -> None:
-    all_issues = test_results.issues.all()
-    all_tests = test_results.test_set.all()
     success_criteria_level_set = SuccessCriteriaLevel.objects.filter(test_results=test_results, product_type='Web')
-    update_data_levels(success_criteria_level_set, all_issues, all_tests)
+    ConformanceCalculator.for_test_results(test_results).update(success_criteria_level_set)
 
 
 def update_conformance_level(test_results: TestResults) -> None:
-    all_issues = test_results.issues.all()
-    all_tests = test_results.test_set.all()
     conformance_data_set = ConformanceLevel.objects.filter(test_results=test_results)
-    update_data_levels(conformance_data_set, all_issues, all_tests)
+    ConformanceCalculator.for_test_results(test_results).update(conformance_data_set)
+
+
+@lru_cache(maxsize=None)
+def _section_template(section_type: str, exclude_number: str, applicable_chapters: Tuple[str, ...],
+                      product_types: Tuple[str, ...]) -> tuple:
+    """Chapters of a 508/EN section with their criteria rows, built once from the VPAT data"""
+    vpat_data = xlsdata.cached_vpat_data
+    template = []
+    for chapter in vpat_data[section_type]:
+        criteria_products = product_types if chapter == exclude_number else ('',)
+        template.append((
+            chapter,
+            vpat_data[section_type][chapter]['name'],
+            chapter in applicable_chapters,
+            tuple(
+                (criteria, product)
+                for criteria in vpat_data[section_type][chapter]['criteria']
+                for product in criteria_products
+            )
+        ))
+    return tuple(template)
 
 
 def fill_508(section_type: str,
@@ -98,38 +183,80 @@ def fill_508(section_type: str,
              exclude_number: str,
              applicable_chapters: Iterable[str],
              product_types: Iterable[str]) -> None:
-    vpat_data = xlsdata.cached_vpat_data
-    for chapter in vpat_data[section_type]:
-        if chapter in applicable_chapters:
-            applicable = True
-        else:
-            applicable = False
-        chapter_model = Section508Chapters.objects.create(
+    template = _section_template(section_type, exclude_number, tuple(applicable_chapters), tuple(product_types))
+    chapter_models = Section508Chapters.objects.bulk_create(
+        Section508Chapters(
             test_results=test_results,
             report_type=section_type,
             chapter=chapter,
-            name=vpat_data[section_type][chapter]['name'],
+            name=name,
             applicable=applicable
         )
-        if chapter == exclude_number:
-            for criteria in vpat_data[section_type][chapter]['criteria']:
-                for product in product_types:
-                    Section508Criteria.objects.create(
-                        chapter=chapter_model,
-                        criteria=criteria,
-                        product_type=product,
-                        level='Select support level',
-                        remark=''
-                    )
-        else:
-            for criteria in vpat_data[section_type][chapter]['criteria']:
-                Section508Criteria.objects.create(
-                    chapter=chapter_model,
-                    criteria=criteria,
-                    product_type='',
-                    level='Select support level',
-                    remark=''
-                )
+        for chapter, name, applicable, _ in template
+    )
+    Section508Criteria.objects.bulk_create(
+        Section508Criteria(
+            chapter=chapter_model,
+            criteria=criteria,
+            product_type=product,
+            level='Select support level',
+            remark=''
+        )
+        for chapter_model, (_, _, _, criteria_rows) in zip(chapter_models, template)
+        for criteria, product in criteria_rows
+    )
+
+
+@lru_cache(maxsize=None)
+def _success_criteria_template() -> tuple:
+    """Default level and remark of every WCAG success criterion and product type"""
+    vpat_data = xlsdata.cached_vpat_data
+    return tuple(
+        (wcag_number, product, 'Supports', vpat_data['wcag'][wcag_number][product]['Supports'])
+        if product == 'Web' else (wcag_number, product, 'Select support level', '')
+        for wcag_number in cached_wcag_table_info
+        for product in VPAT_PRODUCT_TYPES
+    )
+
+
+def create_vpat_skeleton(test_results: TestResults) -> None:
+    """
+    Creates success criteria levels, 508 and EN chapters and conformance levels of finished test results.
+    Criteria mentioned by an issue start as not supported and their conformance levels are linked to the issues,
+    the levels are then refined by update_conformance_level and update_success_criteria_level.
+    """
+    issues_by_wcag = defaultdict(list)
+    for issue in test_results.issues.all():
+        issues_by_wcag[issue.wcag].append(issue)
+    # * Same substring match as Issue wcag__contains
+    mentioning_issues = {
+        wcag_number: [issue for wcag, issues in issues_by_wcag.items() if wcag_number in wcag for issue in issues]
+        for wcag_number in cached_wcag_table_info
+    }
+
+    with transaction.atomic():
+        success_criteria_levels = []
+        for wcag_number, product, level, remark in _success_criteria_template():
+            if product == 'Web' and mentioning_issues[wcag_number]:
+                level = 'Does Not Support'
+                remark = cached_vpat_data['wcag'][wcag_number][product].get('Does Not Support', remark)
+            success_criteria_levels.append(SuccessCriteriaLevel(
+                criteria=wcag_number, product_type=product, test_results=test_results, level=level, remark=remark
+            ))
+        SuccessCriteriaLevel.objects.bulk_create(success_criteria_levels)
+
+        for section_type, (exclude_number, applicable_chapters) in APPLICABLE_SECTION_CHAPTERS.items():
+            fill_508(section_type, test_results, exclude_number, applicable_chapters, VPAT_PRODUCT_TYPES)
+
+        conformance_levels = ConformanceLevel.objects.bulk_create(
+            ConformanceLevel(WCAG=wcag_number, test_results=test_results, level='Supports')
+            for wcag_number in cached_wcag_table_info
+        )
+        ConformanceLevelIssue.objects.bulk_create(
+            ConformanceLevelIssue(conformance_level=conformance_level, issue=issue)
+            for conformance_level in conformance_levels
+            for issue in mentioning_issues[conformance_level.WCAG]
+        )
 
 
 def update_level_for_section_chapter(
@@ -180,7 +307,9 @@ def update_level_for_section_chapter(
 
 def percentage_of_problem_elements(test: Test) -> float:
     number_of_checked_elements = len(list(filter(None, test.checked_elements.split('\n'))))
-    return 100 * test.example_set.count() / number_of_checked_elements if number_of_checked_elements else 0.
+    # * example_count is annotated by ConformanceCalculator.for_test_results
+    example_count = test.example_count if hasattr(test, 'example_count') else test.example_set.count()
+    return 100 * example_count / number_of_checked_elements if number_of_checked_elements else 0.
 
 
 def weighted_error_percentage(tests: Union[QuerySet, List[Test]], wcag: str) -> float:
@@ -260,6 +260,9 @@ USE_TZ = True
 STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.getenv('WEB_INTERFACE_MEDIA_ROOT', './media')
+# Screenshots are sent as hashes of the files in the media storage, which the framework workers share with the server.
+# Workers on nodes without the shared storage send the images in the messages as well
+SCREENSHOT_STORE_SHARED = os.getenv('SCREENSHOT_STORE_SHARED', 'true').lower() == 'true'
 STATIC_ROOT = os.getenv('WEB_INTERFACE_STATIC_ROOT', './static')
 
 LOGIN_URL = 'login'